@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
-from CodeLabTest.models import User, Post, Like, Comment
+from CodeLabTest.models import User, Post, Comment
 
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
@@ -68,18 +68,7 @@ class PostAdmin(admin.ModelAdmin):
         qs = super().get_queryset(request)
         return qs.select_related('author').prefetch_related('likes', 'comments')
 
-@admin.register(Like)
-class LikeAdmin(admin.ModelAdmin):
-    list_display = ['id', 'user', 'post', 'created_at']
-    list_filter = ['created_at']
-    search_fields = ['user__username', 'post__title']
-    ordering = ['-created_at']
-    raw_id_fields = ['user', 'post']
-    readonly_fields = ['created_at']
-    
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        return qs.select_related('user', 'post')
+# Like tem chave primária composta, que o admin não suporta (como Follow)
 
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
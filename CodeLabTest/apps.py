@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class CodelabtestConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'CodeLabTest'
+
+    def ready(self):
+        from CodeLabTest import signals  # noqa: F401
+        from CodeLabTest import dbpool  # noqa: F401
+        from CodeLabTest import checks  # noqa: F401
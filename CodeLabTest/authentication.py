@@ -0,0 +1,65 @@
+# CodeLabTest/authentication.py
+
+import copy
+import time
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from CodeLabTest.caching import LRUCache
+
+# Tokens já verificados (assinatura, expiração e tipo), indexados pelo token bruto
+token_cache = LRUCache(
+    max_entries=settings.JWT_AUTH_CACHE['TOKEN_MAX_ENTRIES'],
+    ttl=settings.JWT_AUTH_CACHE['TOKEN_TTL']
+)
+
+# Linhas de usuário por user_id. Invalidado em User.save()/delete() e nos
+# UPDATEs diretos (contadores, metadados do avatar); o TTL curto limita a
+# defasagem entre processos (o cache é local a cada worker)
+user_cache = LRUCache(
+    max_entries=settings.JWT_AUTH_CACHE['USER_MAX_ENTRIES'],
+    ttl=settings.JWT_AUTH_CACHE['USER_TTL']
+)
+
+
+def invalidate_user(user_id):
+    user_cache.delete(str(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication que evita decodificar o token e buscar o usuário a cada
+    requisição: os tokens verificados ficam num LRU (nunca além do exp) e os
+    usuários num cache curto por user_id. Na maioria das requisições
+    autenticadas não há nenhuma query de autenticação.
+    """
+
+    def get_validated_token(self, raw_token):
+        validated_token = token_cache.get(raw_token)
+        if validated_token is not None:
+            return validated_token
+
+        validated_token = super().get_validated_token(raw_token)
+        remaining = validated_token.get('exp', 0) - time.time()
+        if remaining > 0:
+            token_cache.set(raw_token, validated_token, ttl=min(token_cache.ttl, remaining))
+        return validated_token
+
+    def get_user(self, validated_token):
+        key = str(validated_token.get(api_settings.USER_ID_CLAIM))
+        user = user_cache.get(key)
+        if user is None:
+            # Busca no banco com as verificações padrão (usuário ativo, token revogado)
+            user = super().get_user(validated_token)
+            user_cache.set(key, user)
+        elif api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(
+                _("The user's password has been changed."), code='password_changed'
+            )
+        # Cópia por requisição: views podem alterar e salvar request.user
+        return copy.copy(user)
@@ -0,0 +1,23 @@
+# CodeLabTest/checks.py
+
+from django.conf import settings
+from django.core import checks
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_throttle_store(app_configs, **kwargs):
+    """
+    CacheThrottleStore sobre um cache local (LocMemCache) dá a cada worker os
+    próprios contadores: com N workers o limite efetivo é N vezes o configurado
+    """
+    backend = settings.THROTTLE_STORE['BACKEND']
+    if backend.rsplit('.', 1)[-1] != 'CacheThrottleStore':
+        return []
+    if settings.CACHES['default']['BACKEND'] not in settings.LOCAL_CACHE_BACKENDS:
+        return []
+    return [checks.Error(
+        'THROTTLE_STORE uses the default cache, which is local to each process.',
+        hint='Set CACHE_URL to a shared cache (Redis/Memcached) or use '
+             'THROTTLE_STORE_BACKEND=CodeLabTest.throttling.SQLiteThrottleStore.',
+        id='CodeLabTest.E001',
+    )]
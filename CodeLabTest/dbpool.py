@@ -0,0 +1,73 @@
+# CodeLabTest/dbpool.py
+
+import threading
+from collections import Counter
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+# Conexões físicas abertas por alias neste processo (com pool, só cresce
+# quando o pool abre conexões novas; sem pool, a cada conexão expirada)
+_opened = Counter()
+_opened_lock = threading.Lock()
+
+
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+    with _opened_lock:
+        _opened[connection.alias] += 1
+
+
+def pool_stats(alias):
+    """
+    Métricas de conexão de um alias neste processo. Com o pool nativo
+    (psycopg 3): tamanho, em uso, esperando e tempo de espera acumulado e
+    médio; sem pool: o modo (CONN_MAX_AGE) e as conexões abertas.
+    """
+    connection = connections[alias]
+    stats = {
+        'alias': alias,
+        'vendor': connection.vendor,
+        'connections_opened': _opened[alias],
+    }
+    pool = getattr(connection, 'pool', None)
+    if pool is None:
+        max_age = connection.settings_dict['CONN_MAX_AGE']
+        stats.update({
+            'mode': 'persistent' if max_age else 'per_request',
+            'conn_max_age': max_age,
+        })
+        return stats
+
+    raw = pool.get_stats()
+    requests = raw.get('requests_num', 0)
+    wait_ms = raw.get('requests_wait_ms', 0)
+    stats.update({
+        'mode': 'pool',
+        'min_size': raw.get('pool_min'),
+        'max_size': raw.get('pool_max'),
+        'size': raw.get('pool_size', 0),
+        'in_use': raw.get('pool_size', 0) - raw.get('pool_available', 0),
+        'waiting': raw.get('requests_waiting', 0),
+        'requests': requests,
+        'wait_ms_total': wait_ms,
+        'wait_ms_avg': round(wait_ms / requests, 2) if requests else 0,
+        'timeouts': raw.get('requests_errors', 0),
+    })
+    return stats
+
+
+class DatabasePoolStatsView(APIView):
+    """
+    Métricas de conexão com o banco deste processo (apenas admin), para
+    dimensionar workers x tamanho do pool
+    GET /api/internal/db-pool/
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({'databases': [pool_stats(alias) for alias in settings.DATABASES]})
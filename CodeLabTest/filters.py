@@ -1,6 +1,7 @@
 # CodeLabTest/filters.py
 from django_filters import rest_framework as filters
-from CodeLabTest.models import Post, Comment, User
+from CodeLabTest.models import Post, Like, Comment, User
+from CodeLabTest import fuzzy
 from django.db.models import Q
 
 class PostFilter(filters.FilterSet):
@@ -84,6 +85,17 @@ class CommentFilter(filters.FilterSet):
         model = Comment
         fields = ['post', 'user', 'is_reply']
 
+class LikeFilter(filters.FilterSet):
+    """
+    Filtros para likes (post pela chave primária, user pelo índice reverso)
+    """
+    post = filters.UUIDFilter(field_name='post')
+    user = filters.NumberFilter(field_name='user')
+
+    class Meta:
+        model = Like
+        fields = ['post', 'user']
+
 class UserFilter(filters.FilterSet):
     """
     Filtros para usuários
@@ -99,6 +111,10 @@ class UserFilter(filters.FilterSet):
             ('created_datetime', 'joined'),
             ('username', 'username'),
             ('last_login', 'last_login'),
+            ('post_count', 'posts'),
+            ('comment_count', 'comments'),
+            ('likes_received_count', 'likes_received'),
+            ('follower_count', 'followers'),
         )
     )
     
@@ -108,11 +124,7 @@ class UserFilter(filters.FilterSet):
     
     def filter_search(self, queryset, name, value):
         """
-        Busca em username, first_name, last_name e email
+        Busca aproximada em username, first_name, last_name e email
+        (tolerante a erros de digitação, ordenada por similaridade)
         """
-        return queryset.filter(
-            Q(username__icontains=value) |
-            Q(first_name__icontains=value) |
-            Q(last_name__icontains=value) |
-            Q(email__icontains=value)
-        )
\ No newline at end of file
+        return fuzzy.search_users(queryset, value)
\ No newline at end of file
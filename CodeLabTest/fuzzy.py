@@ -0,0 +1,328 @@
+# CodeLabTest/fuzzy.py
+
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, defaultdict
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q, Case, When, IntegerField, CharField, TextField
+from django.db.models.functions import Greatest
+from django.db.models.lookups import PostgresOperatorLookup
+
+WORD_RE = re.compile(r'\w+')
+
+
+@CharField.register_lookup
+@TextField.register_lookup
+class TrigramWordSimilar(PostgresOperatorLookup):
+    """
+    campo %> termo (pg_trgm): usa o índice GIN gin_trgm_ops.
+    Registrado aqui para não depender de django.contrib.postgres no SQLite.
+    """
+    lookup_name = 'fuzzy_word_similar'
+    postgres_operator = '%%>'
+
+
+def fold(text):
+    """Minúsculas e sem acentos: 'José' -> 'jose'"""
+    decomposed = unicodedata.normalize('NFKD', str(text or ''))
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def words(text):
+    return WORD_RE.findall(fold(text))
+
+
+def trigrams(word):
+    """Trigramas no estilo pg_trgm: palavra com dois espaços antes e um depois"""
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b):
+    """Distância de Damerau-Levenshtein restrita (transposição conta como 1 edição)"""
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            cost = 0 if ca == cb else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def term_score(word, term, word_grams, term_grams, common):
+    """Nota de 0 a 1 entre uma palavra da consulta e um termo indexado"""
+    edit = 1 - edit_distance(word, term) / max(len(word), len(term))
+    prefix = 0.5 + 0.5 * len(word) / len(term) if term.startswith(word) else 0
+    overlap = (common / word_grams + common / (word_grams + term_grams - common)) / 2
+    return max(edit, prefix, overlap)
+
+
+class IndexState:
+    """
+    Uma carga do NgramIndex (trigrama -> termos, termo -> ids). Buscas leem
+    a referência atual sem trava; atualizações incrementais trocam os
+    conjuntos de ids em vez de alterá-los, para não atrapalhar buscas em
+    andamento.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.terms = []
+        self.term_ids = {}
+        self.term_sizes = []
+        self.term_docs = []
+        self.doc_terms = {}
+
+    @classmethod
+    def load(cls, documents):
+        state = cls()
+        term_docs = defaultdict(set)
+        for pk, text in documents:
+            state.doc_terms[pk] = term_ids = []
+            for word in set(words(text)):
+                term_id = state.term_ids.get(word)
+                if term_id is None:
+                    term_id = state.add_term(word)
+                term_docs[term_id].add(pk)
+                term_ids.append(term_id)
+        state.term_docs = [frozenset(term_docs[term_id]) for term_id in range(len(state.terms))]
+        return state
+
+    def add_term(self, word):
+        term_id = self.term_ids[word] = len(self.terms)
+        grams = trigrams(word)
+        self.terms.append(word)
+        self.term_sizes.append(len(grams))
+        self.term_docs.append(frozenset())
+        for gram in grams:
+            self.postings.setdefault(gram, []).append(term_id)
+        return term_id
+
+    def update(self, pk, text):
+        for term_id in self.doc_terms.pop(pk, ()):
+            self.term_docs[term_id] = self.term_docs[term_id] - {pk}
+        if text is None:
+            return
+        self.doc_terms[pk] = term_ids = []
+        for word in set(words(text)):
+            term_id = self.term_ids.get(word)
+            if term_id is None:
+                term_id = self.add_term(word)
+            self.term_docs[term_id] = self.term_docs[term_id] | {pk}
+            term_ids.append(term_id)
+
+
+class NgramIndex:
+    """
+    Índice de trigramas em memória para SQLite/desenvolvimento local.
+
+    Cada termo distinto é indexado uma vez (trigrama -> termos, termo -> ids),
+    então a busca só pontua os termos que compartilham trigramas com a consulta.
+    Escritas atualizam só o documento alterado (update/remove); a carga
+    completa acontece na primeira busca e quando o TTL expira (para pegar
+    escritas que não passam pelo save, como .update()). A recarga roda fora
+    da trava, na busca que encontrou o índice vencido; as demais seguem com
+    a carga anterior até a nova ser trocada de uma vez (IndexState).
+    """
+
+    def __init__(self, loader, ttl=300):
+        self.loader = loader
+        self.ttl = ttl
+        self._lock = threading.Lock()  # atualizações incrementais e a troca
+        self._build_lock = threading.Lock()  # uma carga completa por vez
+        self._state = None
+        self._built_at = None
+        self._pending = None  # atualizações durante uma carga, reaplicadas na nova
+
+    def invalidate(self):
+        self._built_at = None
+
+    def _stale(self):
+        return self._built_at is None or time.monotonic() - self._built_at >= self.ttl
+
+    def _ensure_built(self):
+        """A carga atual; recarrega se vencida (só espera se ainda não há nenhuma)"""
+        if not self._stale():
+            return self._state
+        if not self._build_lock.acquire(blocking=self._state is None):
+            # Outra busca já está recarregando
+            return self._state
+        try:
+            if self._stale():
+                with self._lock:
+                    self._pending = []
+                try:
+                    state = IndexState.load(self.loader())
+                except BaseException:
+                    with self._lock:
+                        self._pending = None
+                    raise
+                with self._lock:
+                    # Escritas que chegaram durante a carga podem não estar nela
+                    for pk, text in self._pending:
+                        state.update(pk, text)
+                    self._pending = None
+                    self._state = state
+                    self._built_at = time.monotonic()
+        finally:
+            self._build_lock.release()
+        return self._state
+
+    def update(self, pk, text):
+        """
+        Reindexa um documento (text=None remove); termos que ficam sem
+        documentos só somem na próxima carga completa. Antes da primeira
+        carga não há o que atualizar.
+        """
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((pk, text))
+            if self._state is not None:
+                self._state.update(pk, text)
+
+    def remove(self, pk):
+        self.update(pk, None)
+
+    def search(self, query, limit, threshold):
+        """
+        Retorna até limit ids ordenados por similaridade. Os trigramas só
+        selecionam candidatos; cada termo candidato recebe a melhor nota entre
+        distância de edição, prefixo e sobreposição de trigramas. Para cada
+        palavra da consulta vale o melhor termo do documento.
+        """
+        state = self._ensure_built()
+        query_words = words(query)
+        if not query_words:
+            return []
+
+        scores = Counter()
+        for word in query_words:
+            grams = trigrams(word)
+            shared = Counter()
+            for gram in grams:
+                shared.update(state.postings.get(gram, ()))
+            best = {}
+            for term_id, common in shared.items():
+                score = term_score(
+                    word, state.terms[term_id], len(grams), state.term_sizes[term_id], common
+                )
+                if score < threshold:
+                    continue
+                for pk in state.term_docs[term_id]:
+                    if score > best.get(pk, 0):
+                        best[pk] = score
+            for pk, score in best.items():
+                scores[pk] += score / len(query_words)
+
+        ranked = sorted(
+            ((score, pk) for pk, score in scores.items() if score >= threshold),
+            key=lambda item: item[0],
+            reverse=True
+        )
+        return [pk for _, pk in ranked[:limit]]
+
+
+USER_FIELDS = ['username', 'first_name', 'last_name', 'email']
+POST_FIELDS = ['title', 'content']
+
+
+def _load_users():
+    from CodeLabTest.models import User
+    for pk, *fields in User.objects.filter(is_active=True).values_list(
+        'pk', *USER_FIELDS
+    ).iterator(chunk_size=2000):
+        yield pk, ' '.join(fields)
+
+
+def _load_posts():
+    from CodeLabTest.models import Post
+    for pk, *fields in Post.objects.values_list(
+        'pk', *POST_FIELDS
+    ).iterator(chunk_size=2000):
+        yield pk, ' '.join(fields)
+
+
+user_index = NgramIndex(_load_users, ttl=settings.FUZZY_SEARCH['INDEX_TTL'])
+post_index = NgramIndex(_load_posts, ttl=settings.FUZZY_SEARCH['INDEX_TTL'])
+
+
+def _document(instance, fields):
+    return ' '.join(str(getattr(instance, field) or '') for field in fields)
+
+
+def index_user(user):
+    """Reindexa um usuário salvo (inativos saem do índice)"""
+    user_index.update(user.pk, _document(user, USER_FIELDS) if user.is_active else None)
+
+
+def index_post(post):
+    post_index.update(post.pk, _document(post, POST_FIELDS))
+
+
+def order_by_ids(queryset, ids):
+    """Filtra o queryset pelos ids mantendo a ordem de ranking"""
+    if not ids:
+        return queryset.none()
+    ranking = Case(
+        *[When(pk=pk, then=position) for position, pk in enumerate(ids)],
+        output_field=IntegerField()
+    )
+    return queryset.filter(pk__in=ids).order_by(ranking)
+
+
+def postgres_search_ids(queryset, query, fields, limit, threshold):
+    """Ranking com word_similarity do pg_trgm, filtrado via índice GIN (%>)"""
+    from django.contrib.postgres.search import TrigramWordSimilarity
+
+    matches = Q()
+    for field in fields:
+        matches |= Q(**{f'{field}__fuzzy_word_similar': query})
+    similarities = [TrigramWordSimilarity(query, field) for field in fields]
+    similarity = Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+
+    # SET LOCAL: o limiar vale só nesta transação, não na conexão reaproveitada
+    with transaction.atomic(using=queryset.db):
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute('SET LOCAL pg_trgm.word_similarity_threshold = %s', [threshold])
+        return list(
+            queryset.filter(matches)
+            .annotate(fuzzy_similarity=similarity)
+            .order_by('-fuzzy_similarity')
+            .values_list('pk', flat=True)[:limit]
+        )
+
+
+def fuzzy_search(queryset, query, fields, index, limit=None):
+    """
+    Busca tolerante a erros de digitação: trigramas no PostgreSQL, índice
+    em memória nos demais bancos. Retorna o queryset restrito aos top-k
+    resultados, ordenado por similaridade.
+    """
+    limit = limit or settings.FUZZY_SEARCH['TOP_K']
+    if connections[queryset.db].vendor == 'postgresql':
+        ids = postgres_search_ids(
+            queryset, query, fields, limit, settings.FUZZY_SEARCH['PG_THRESHOLD']
+        )
+    else:
+        # Busca mais candidatos que o limite porque o queryset pode filtrar alguns
+        candidates = index.search(query, limit * 2, settings.FUZZY_SEARCH['INDEX_THRESHOLD'])
+        allowed = set(queryset.filter(pk__in=candidates).values_list('pk', flat=True))
+        ids = [pk for pk in candidates if pk in allowed][:limit]
+    return order_by_ids(queryset, ids)
+
+
+def search_users(queryset, query, limit=None):
+    return fuzzy_search(
+        queryset, query, USER_FIELDS, user_index, limit
+    )
+
+
+def search_posts(queryset, query, limit=None):
+    return fuzzy_search(queryset, query, POST_FIELDS, post_index, limit)
@@ -0,0 +1,150 @@
+# CodeLabTest/hashing.py
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+# Hashes em voo somando os workers que compartilham o cache padrão. A chave
+# expira sozinha: contagens de um worker que morreu no meio somem em PENDING_TTL
+PENDING_KEY = 'password-hashing:pending'
+PENDING_TTL = 60  # segundos
+
+# Executor usado por User.check_password/set_password dentro de offload()
+_offloaded = ContextVar('password_hashing_offloaded', default=None)
+
+
+def offloaded_hasher():
+    """O PasswordHashExecutor do offload() em andamento, ou None"""
+    return _offloaded.get()
+
+
+class PasswordHashingBusy(APIException):
+    """503 com Retry-After (o exception handler do DRF usa o atributo wait)"""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Servidor ocupado processando autenticações. Tente novamente em instantes.'
+    default_code = 'password_hashing_busy'
+
+    def __init__(self, wait, detail=None, code=None):
+        super().__init__(detail, code)
+        self.wait = wait
+
+
+class PasswordHashExecutor:
+    """
+    Executor dedicado e limitado para hashing de senhas (PBKDF2 libera o GIL,
+    então o trabalho roda em paralelo fora das threads da requisição).
+
+    No máximo `workers` hashes rodam ao mesmo tempo por processo e
+    `max_pending` ficam em voo (rodando + na fila) somando todos os workers:
+    a contagem fica no cache padrão, porque com workers síncronos cada
+    processo tem no máximo uma requisição e um limite local nunca encheria
+    (com LocMemCache ela volta a ser por processo). A fila é consultada antes
+    de enviar o hash: acima do limite a requisição é rejeitada na hora com
+    503, em vez de segurar o worker esperando; o mesmo vale se o resultado não
+    sair em `timeout` segundos. Dentro desse limite a thread da requisição
+    ainda espera o resultado (o servidor é síncrono), então `timeout` é o
+    máximo que um login segura o worker.
+    """
+
+    def __init__(self, workers, max_pending, timeout, retry_after):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+
+    def run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHashingBusy(self.retry_after)
+        if not self._enter_queue():
+            self._slots.release()
+            raise PasswordHashingBusy(self.retry_after)
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._leave_queue()
+            raise
+        future.add_done_callback(lambda _: self._leave_queue())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise PasswordHashingBusy(self.retry_after)
+
+    def _enter_queue(self):
+        """Reserva uma vaga na fila compartilhada; False se já há max_pending em voo"""
+        cache.add(PENDING_KEY, 0, PENDING_TTL)
+        try:
+            pending = cache.incr(PENDING_KEY)
+        except ValueError:
+            # A chave expirou entre o add e o incr: segue sem contar este hash
+            return True
+        if pending > self.max_pending:
+            self._leave_shared_queue()
+            return False
+        return True
+
+    def _leave_queue(self):
+        self._leave_shared_queue()
+        self._slots.release()
+
+    def _leave_shared_queue(self):
+        try:
+            cache.decr(PENDING_KEY)
+        except ValueError:
+            # Expirou com o hash em voo; a próxima reserva recria a chave
+            pass
+
+    @contextmanager
+    def offload(self):
+        """
+        Dentro do bloco, User.check_password e set_password usam o executor.
+        O login da API chama django.contrib.auth.authenticate aqui dentro:
+        AUTHENTICATION_BACKENDS e o sinal user_login_failed valem como em
+        qualquer login, e só o hash sai da thread da requisição. Fora dele
+        (admin, createsuperuser, changepassword) o hashing é o padrão e
+        nunca responde 503
+        """
+        token = _offloaded.set(self)
+        try:
+            yield
+        finally:
+            _offloaded.reset(token)
+
+    def make_password(self, raw_password):
+        return self.run(hashers.make_password, raw_password)
+
+    def verify_password(self, raw_password, encoded):
+        """Retorna (senha correta, hash precisa ser atualizado)"""
+        return self.run(hashers.verify_password, raw_password, encoded)
+
+    def set_password(self, user, raw_password):
+        """User.set_password com o hash no executor"""
+        user.password = self.make_password(raw_password)
+        user._password = raw_password
+
+    def check_password(self, user, raw_password):
+        """
+        User.check_password com a verificação no executor; a atualização do
+        hash (mudança de algoritmo ou de iterações) é salva na requisição
+        """
+        is_correct, must_update = self.verify_password(raw_password, user.password)
+        if is_correct and must_update:
+            self.set_password(user, raw_password)
+            user.save(update_fields=['password'])
+        return is_correct
+
+
+password_hasher = PasswordHashExecutor(
+    workers=settings.PASSWORD_HASHING['WORKERS'],
+    max_pending=settings.PASSWORD_HASHING['MAX_PENDING'],
+    timeout=settings.PASSWORD_HASHING['TIMEOUT'],
+    retry_after=settings.PASSWORD_HASHING['RETRY_AFTER']
+)
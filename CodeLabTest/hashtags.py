@@ -0,0 +1,145 @@
+# CodeLabTest/hashtags.py
+
+import re
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from django.utils.encoding import force_str
+from CodeLabTest.models import Hashtag, PostHashtag, HashtagBucket, HashtagTrend
+
+# "#tag" precedido de início/espaço/pontuação (não pega "a#b" nem "##tag" duplicado)
+HASHTAG_RE = re.compile(r'(?<![\w#&])#(\w{1,100})')
+
+# Limite de hashtags indexadas por post
+MAX_HASHTAGS_PER_POST = 30
+
+# Tamanho de cada bucket de contagem e janelas do ranking de trending
+BUCKET_SIZE = timedelta(minutes=5)
+TRENDING_WINDOWS = {
+    '1h': timedelta(hours=1),
+    '24h': timedelta(hours=24),
+    '7d': timedelta(days=7),
+}
+TRENDING_LIMIT = 50
+
+
+def normalize_tag(tag):
+    """Normaliza uma tag vinda da URL ou do texto: sem '#', minúscula"""
+    return force_str(tag).strip().lstrip('#').lower()
+
+
+def extract_hashtags(*texts):
+    """
+    Extrai hashtags únicas (na ordem em que aparecem) dos textos informados
+    """
+    tags = []
+    seen = set()
+    for text in texts:
+        if not text:
+            continue
+        for match in HASHTAG_RE.finditer(force_str(text)):
+            tag = match.group(1).lower()
+            if tag not in seen:
+                seen.add(tag)
+                tags.append(tag)
+    return tags[:MAX_HASHTAGS_PER_POST]
+
+
+def get_or_create_hashtags(names):
+    """
+    Retorna {nome: Hashtag} criando as que ainda não existem em lote
+    """
+    if not names:
+        return {}
+    existing = {h.name: h for h in Hashtag.objects.filter(name__in=names)}
+    missing = [name for name in names if name not in existing]
+    if missing:
+        Hashtag.objects.bulk_create(
+            [Hashtag(name=name) for name in missing],
+            ignore_conflicts=True
+        )
+        existing.update({h.name: h for h in Hashtag.objects.filter(name__in=missing)})
+    return existing
+
+
+def sync_post_hashtags(post):
+    """
+    Sincroniza a tabela PostHashtag com as hashtags atuais do post.
+    Retorna a lista de hashtags adicionadas.
+    """
+    tags = extract_hashtags(post.title, post.content)
+    current = dict(
+        PostHashtag.objects.filter(post=post).values_list('hashtag__name', 'id')
+    )
+
+    removed = [pk for name, pk in current.items() if name not in tags]
+    if removed:
+        PostHashtag.objects.filter(id__in=removed).delete()
+
+    new_tags = [tag for tag in tags if tag not in current]
+    if not new_tags:
+        return []
+
+    hashtags = get_or_create_hashtags(new_tags)
+    PostHashtag.objects.bulk_create(
+        [
+            PostHashtag(post=post, hashtag=hashtags[tag], created_at=post.created_at)
+            for tag in new_tags
+        ],
+        ignore_conflicts=True
+    )
+    return [hashtags[tag] for tag in new_tags]
+
+
+def bucket_start_for(when):
+    """Início do bucket de BUCKET_SIZE que contém o instante informado"""
+    size = int(BUCKET_SIZE.total_seconds())
+    timestamp = int(when.timestamp())
+    return when.__class__.fromtimestamp(timestamp - timestamp % size, tz=when.tzinfo)
+
+
+def record_hashtag_usage(hashtags, when=None):
+    """
+    Incrementa o bucket atual de cada hashtag (2 queries, independente da quantidade)
+    """
+    if not hashtags:
+        return
+    bucket_start = bucket_start_for(when or timezone.now())
+    HashtagBucket.objects.bulk_create(
+        [HashtagBucket(hashtag=h, bucket_start=bucket_start) for h in hashtags],
+        ignore_conflicts=True
+    )
+    HashtagBucket.objects.filter(
+        hashtag__in=hashtags,
+        bucket_start=bucket_start
+    ).update(count=F('count') + 1)
+
+
+def rollup_trending(now=None, limit=TRENDING_LIMIT):
+    """
+    Recalcula o ranking de cada janela a partir dos buckets e remove
+    buckets mais antigos que a maior janela
+    """
+    now = now or timezone.now()
+    for window, delta in TRENDING_WINDOWS.items():
+        totals = HashtagBucket.objects.filter(
+            bucket_start__gte=bucket_start_for(now - delta)
+        ).values('hashtag').annotate(
+            total=Sum('count')
+        ).order_by('-total')[:limit]
+
+        with transaction.atomic():
+            HashtagTrend.objects.filter(window=window).delete()
+            HashtagTrend.objects.bulk_create([
+                HashtagTrend(
+                    window=window,
+                    hashtag_id=row['hashtag'],
+                    count=row['total'],
+                    computed_at=now
+                )
+                for row in totals
+            ])
+
+    oldest = bucket_start_for(now - max(TRENDING_WINDOWS.values()))
+    HashtagBucket.objects.filter(bucket_start__lt=oldest).delete()
@@ -0,0 +1,42 @@
+# CodeLabTest/ids.py
+
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+# Últimos 48 bits de milissegundos + 74 bits aleatórios gerados neste processo
+_last = 0
+_last_lock = threading.Lock()
+
+
+def uuid7():
+    """
+    UUID versão 7 (RFC 9562): milissegundos Unix nos 48 bits mais altos e
+    bits aleatórios no resto, então ids novos caem sempre no fim do índice
+    (ao contrário do uuid4, que espalha inserções pela B-tree inteira).
+    Monotônico no processo: no mesmo milissegundo (ou se o relógio voltar)
+    usa o anterior + 1. Cabe no mesmo UUIDField dos ids uuid4 existentes.
+    """
+    global _last
+    value = (time.time_ns() // 1_000_000) << 74 | int.from_bytes(os.urandom(10), 'big') >> 6
+    with _last_lock:
+        if value <= _last:
+            value = _last + 1
+        _last = value
+    timestamp, rand = value >> 74, value & ((1 << 74) - 1)
+    return uuid.UUID(int=(
+        timestamp << 80
+        | 0x7 << 76
+        | (rand >> 62) << 64
+        | 0b10 << 62
+        | rand & ((1 << 62) - 1)
+    ))
+
+
+def uuid7_datetime(value):
+    """Instante de criação embutido num uuid7 (None para ids de outras versões)"""
+    if value.version != 7:
+        return None
+    return datetime.fromtimestamp((value.int >> 80) / 1000, tz=timezone.utc)
@@ -0,0 +1,217 @@
+# CodeLabTest/images.py
+
+import base64
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from CodeLabTest.sqlite_writer import serialized_write
+
+logger = logging.getLogger(__name__)
+
+# Larguras das versões geradas para cada campo de imagem
+RENDITION_WIDTHS = {
+    'image': (320, 640, 1280),
+    'avatar': (64, 128, 256),
+}
+
+# Formatos das versões: WebP para quem suporta, JPEG como fallback
+RENDITION_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# Largura do placeholder embutido (data URI) mostrado enquanto a imagem carrega
+PLACEHOLDER_WIDTH = 16
+
+# Metadados removidos no upload além do EXIF (Image.info do Pillow)
+METADATA_KEYS = {'exif', 'xmp', 'XML:com.adobe.xmp', 'comment'}
+
+
+def rendition_name(name, width, extension):
+    """'posts/<id>/abc.png' -> 'posts/<id>/abc_w320.webp'"""
+    base, _ = os.path.splitext(name)
+    return f'{base}_w{width}.{extension}'
+
+
+def _flatten(image):
+    """RGB para JPEG; transparência vira fundo branco"""
+    from PIL import Image
+
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB') if image.mode != 'RGB' else image
+
+
+def _save_atomic(image, path, image_format, **options):
+    """Grava num temporário e troca com os.replace: quem lê nunca vê arquivo pela metade"""
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        image.save(temp_path, image_format, **options)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def strip_metadata(path):
+    """
+    Regrava a imagem sem EXIF (localização, câmera etc.), com a orientação
+    aplicada, no mesmo formato. Roda no upload, antes do hash
+    (CodeLabTest.media): o original nunca é servido com os metadados e o
+    blob não muda depois de gravado. Retorna False se não havia o que
+    remover ou se o arquivo não é imagem (a validação do campo decide).
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        with Image.open(path) as source:
+            if not (source.getexif() or METADATA_KEYS & source.info.keys()):
+                return False
+            source_format = source.format or 'JPEG'
+            image = ImageOps.exif_transpose(source)
+            image.load()
+    except (UnidentifiedImageError, OSError):
+        return False
+
+    if source_format in ('JPEG', 'MPO'):
+        _save_atomic(_flatten(image), path, 'JPEG', quality=90, optimize=True)
+    else:
+        _save_atomic(image, path, source_format)
+    return True
+
+
+def process_image(media_root, name, widths):
+    """
+    Roda no processo worker (só Pillow e sistema de arquivos, sem ORM): gera
+    as versões em cada largura/formato e o placeholder. O original já chega
+    sem EXIF (strip_metadata no upload) e não é alterado. Retorna o
+    resultado para ser gravado no banco pelo processo principal.
+    """
+    from PIL import Image, ImageOps
+
+    path = os.path.join(media_root, name)
+    with Image.open(path) as source:
+        image = ImageOps.exif_transpose(source)
+        image.load()
+
+    width, height = image.size
+    targets = sorted({w for w in widths if w < width} | {min(width, max(widths))})
+    renditions = {extension: {} for extension in RENDITION_FORMATS}
+    for target in targets:
+        resized = image if target == width else image.resize(
+            (target, max(1, round(height * target / width))), Image.LANCZOS
+        )
+        for extension, (image_format, options) in RENDITION_FORMATS.items():
+            output = rendition_name(name, target, extension)
+            if image_format == 'JPEG':
+                frame = _flatten(resized)
+            else:
+                frame = resized if resized.mode in ('RGB', 'RGBA') else resized.convert('RGBA')
+            _save_atomic(frame, os.path.join(media_root, output), image_format, **options)
+            renditions[extension][str(target)] = output
+
+    tiny = (image if image.mode in ('RGB', 'RGBA') else image.convert('RGBA')).resize(
+        (PLACEHOLDER_WIDTH, max(1, round(height * PLACEHOLDER_WIDTH / width))), Image.BILINEAR
+    )
+    buffer = io.BytesIO()
+    tiny.save(buffer, 'WEBP', quality=30)
+    placeholder = 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode()
+
+    return {'width': width, 'height': height, 'placeholder': placeholder, 'renditions': renditions}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=settings.IMAGE_PROCESSING['WORKERS'])
+        return _pool
+
+
+def apply_result(model, pk, field, name, result):
+    """
+    Grava dimensões, placeholder e versões, desde que o arquivo do campo
+    ainda seja o processado (um novo upload no meio do caminho vence). O
+    resultado também fica no MediaBlob, para os próximos uploads do mesmo
+    conteúdo não precisarem processar de novo.
+    """
+    from CodeLabTest.models import MediaBlob, User
+
+    values = (result['width'], result['height'], result['placeholder'], result['renditions'])
+    model.objects.filter(pk=pk, **{field: name}).update(**dict(zip(metadata_fields(field), values)))
+    if model is User:
+        # UPDATE direto: a linha em cache da autenticação ainda tem o avatar sem metadados
+        from CodeLabTest.authentication import invalidate_user
+        invalidate_user(pk)
+    blob = MediaBlob.objects.filter(name=name).first()
+    if blob is not None:
+        blob.metadata[field] = result
+        MediaBlob.objects.filter(pk=blob.pk).update(metadata=blob.metadata)
+
+
+def _on_done(model, pk, field, name, future):
+    try:
+        serialized_write(apply_result, model, pk, field, name, future.result())
+    except Exception:
+        logger.exception('Falha ao processar %s de %s %s', field, model.__name__, pk)
+    finally:
+        close_old_connections()
+
+
+def schedule_processing(instance, field):
+    """
+    Agenda o processamento da imagem após o commit. Com
+    IMAGE_PROCESSING['SYNC'] (testes/desenvolvimento) roda no próprio processo.
+    """
+    from CodeLabTest.models import MediaBlob
+
+    model, pk, name = instance.__class__, instance.pk, getattr(instance, field).name
+    metadata = MediaBlob.objects.filter(name=name).values_list('metadata', flat=True).first() or {}
+    args = (settings.MEDIA_ROOT, name, RENDITION_WIDTHS[field])
+
+    def run():
+        if field in metadata:
+            # Mesmo conteúdo já processado para este campo: só copia o resultado
+            apply_result(model, pk, field, name, metadata[field])
+            return
+        if settings.IMAGE_PROCESSING['SYNC']:
+            apply_result(model, pk, field, name, process_image(*args))
+            return
+        future = get_pool().submit(process_image, *args)
+        future.add_done_callback(lambda f: _on_done(model, pk, field, name, f))
+
+    transaction.on_commit(run)
+
+
+def metadata_fields(field):
+    return [f'{field}_width', f'{field}_height', f'{field}_placeholder', f'{field}_renditions']
+
+
+def srcset(file, renditions, request):
+    """{'webp': 'url 320w, url 640w', 'jpeg': ...} para o cliente escolher a menor adequada"""
+    if not file or not renditions:
+        return None
+    from django.core.files.storage import default_storage
+
+    def url(name):
+        value = default_storage.url(name)
+        return request.build_absolute_uri(value) if request else value
+
+    return {
+        extension: ', '.join(
+            f'{url(name)} {width}w'
+            for width, name in sorted(sizes.items(), key=lambda item: int(item[0]))
+        )
+        for extension, sizes in renditions.items()
+    }
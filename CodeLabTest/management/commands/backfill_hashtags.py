@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from CodeLabTest.models import Post
+from CodeLabTest.hashtags import sync_post_hashtags
+
+
+class Command(BaseCommand):
+    help = 'Extracts hashtags from existing posts into the Hashtag/PostHashtag tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = Post.objects.only('id', 'title', 'content', 'created_at').order_by()
+
+        total = 0
+        for post in queryset.iterator(chunk_size=batch_size):
+            sync_post_hashtags(post)
+            total += 1
+            if total % batch_size == 0:
+                self.stdout.write(f'{total} posts processed...')
+
+        self.stdout.write(self.style.SUCCESS(f'Hashtags backfilled for {total} posts'))
@@ -0,0 +1,81 @@
+import os
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from CodeLabTest.media import orphaned_files, purge_blob, still_referenced, unreferenced_blobs
+from CodeLabTest.uploads import expired_sessions
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes media files that no row references (queryset/cascade deletes, failed uploads), '
+        'streaming the media tree and the database in sorted order, and purges content blobs '
+        'left without references for longer than the grace period'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=float, default=24,
+                            help='Only delete files not modified (and blobs not referenced) for this long')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        cutoff = time.time() - options['grace_hours'] * 3600
+        released_after = timezone.now() - timedelta(hours=options['grace_hours'])
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        found = deleted = freed = 0
+        batch = []
+
+        # Sessões de upload abandonadas: os arquivos .part deixam de ser referenciados
+        if not dry_run:
+            expired_sessions().delete()
+
+        # Blobs sem referências há mais que a carência (purge após o commit
+        # que não rodou, falha ao apagar): a linha e os arquivos, com a trava
+        # de purge_blob contra um upload do mesmo conteúdo
+        blobs = list(unreferenced_blobs(released_after).values_list('name', flat=True))
+        # Contagem divergente de um campo que ainda aponta para o blob: a linha fica
+        in_fields = still_referenced(blobs, released_after)
+        blobs = [name for name in blobs if name not in in_fields]
+        for name in blobs:
+            if dry_run:
+                self.stdout.write(name)
+            else:
+                purge_blob(name)
+
+        def flush():
+            nonlocal deleted, freed
+            # Uploads concluídos depois que o merge passou pelo nome não são apagados
+            referenced = still_referenced((name for name, _ in batch), released_after)
+            for name, entry in batch:
+                if name in referenced:
+                    continue
+                size = entry.stat(follow_symlinks=False).st_size
+                if dry_run:
+                    self.stdout.write(name)
+                else:
+                    try:
+                        os.remove(entry.path)
+                    except FileNotFoundError:
+                        continue
+                deleted += 1
+                freed += size
+            batch.clear()
+
+        for name, entry in orphaned_files(settings.MEDIA_ROOT, chunk_size=batch_size, released_after=released_after):
+            found += 1
+            if entry.stat(follow_symlinks=False).st_mtime > cutoff:
+                continue
+            batch.append((name, entry))
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+
+        action = 'would be deleted' if dry_run else 'deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(blobs)} unreferenced blobs {action}; '
+            f'{found} unreferenced files found, {deleted} {action} ({freed / 1024 / 1024:.1f} MB)'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from CodeLabTest.recommendations import refresh_suggestions, SUGGESTIONS_PER_USER
+
+
+class Command(BaseCommand):
+    help = 'Computes "who to follow" suggestions from likes and comments (incremental by default)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recompute every user instead of only the recently active ones')
+        parser.add_argument('--limit', type=int, default=SUGGESTIONS_PER_USER)
+
+    def handle(self, *args, **options):
+        total = refresh_suggestions(full=options['full'], limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(f'Suggestions computed for {total} users'))
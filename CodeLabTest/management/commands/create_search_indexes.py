@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from CodeLabTest.models import User, Post
+
+# (tabela, coluna) com índice GIN de trigramas usado pela busca aproximada
+TRIGRAM_COLUMNS = [
+    (User._meta.db_table, 'username'),
+    (User._meta.db_table, 'first_name'),
+    (User._meta.db_table, 'last_name'),
+    (User._meta.db_table, 'email'),
+    (Post._meta.db_table, 'title'),
+    (Post._meta.db_table, 'content'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Creates the pg_trgm extension and GIN trigram indexes used by fuzzy search (PostgreSQL only)'
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Trigram indexes are only available on PostgreSQL')
+
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            for table, column in TRIGRAM_COLUMNS:
+                index_name = f'{table}_{column}_trgm'.lower()
+                self.stdout.write(f'Creating {index_name}...')
+                # CONCURRENTLY não bloqueia escritas durante a criação
+                cursor.execute(
+                    f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {quote(index_name)} '
+                    f'ON {quote(table)} USING gin ({quote(column)} gin_trgm_ops)'
+                )
+
+        self.stdout.write(self.style.SUCCESS('Search indexes created'))
@@ -0,0 +1,58 @@
+import time
+from django.core.management.base import BaseCommand
+from CodeLabTest.media import BLOB_DIR, FLAT_BLOB_REGEX, adopt_legacy_file, media_fields, shard_blob
+from CodeLabTest.models import MediaBlob
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves media files to the sharded content-addressed layout (blobs/ab/cd/<sha256>) '
+        'in batches; safe to interrupt and re-run while the site is up'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--sleep', type=float, default=0,
+                            help='Seconds to pause between batches to limit I/O')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        sleep = options['sleep']
+
+        # Cada lote só seleciona o que ainda não foi migrado, então uma
+        # execução interrompida continua de onde parou
+        sharded = 0
+        flat = MediaBlob.objects.filter(name__regex=FLAT_BLOB_REGEX).order_by('pk')
+        last = ''
+        while True:
+            ids = list(flat.filter(pk__gt=last).values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            sharded += sum(shard_blob(sha256) for sha256 in ids)
+            last = ids[-1]
+            self.stdout.write(f'{sharded} blobs sharded...')
+            time.sleep(sleep)
+
+        adopted = skipped = 0
+        for model, field in media_fields():
+            legacy = model._base_manager.filter(**{f'{field}__isnull': False}).exclude(
+                **{field: ''}
+            ).exclude(**{f'{field}__startswith': f'{BLOB_DIR}/'}).order_by('pk')
+            last = None
+            while True:
+                batch = legacy if last is None else legacy.filter(pk__gt=last)
+                rows = list(batch.values_list('pk', field)[:batch_size])
+                if not rows:
+                    break
+                for pk, name in rows:
+                    if adopt_legacy_file(model, pk, field, name):
+                        adopted += 1
+                    else:
+                        skipped += 1
+                last = rows[-1][0]
+                self.stdout.write(f'{adopted} {model.__name__} files moved...')
+                time.sleep(sleep)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{sharded} blobs sharded, {adopted} legacy files moved, {skipped} skipped (missing or changed)'
+        ))
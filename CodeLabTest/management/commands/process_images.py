@@ -0,0 +1,38 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from CodeLabTest.models import User, Post
+from CodeLabTest.images import process_image, apply_result, RENDITION_WIDTHS
+
+
+class Command(BaseCommand):
+    help = 'Generates renditions, dimensions and placeholders for images uploaded before the pipeline existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.IMAGE_PROCESSING['WORKERS'])
+
+    def handle(self, *args, **options):
+        pending = [
+            (model, pk, field, name)
+            for model, field in ((Post, 'image'), (User, 'avatar'))
+            for pk, name in model.objects.exclude(**{field: ''}).filter(
+                **{f'{field}__isnull': False, f'{field}_width__isnull': True}
+            ).values_list('pk', field).iterator()
+        ]
+
+        total = failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            futures = {
+                pool.submit(process_image, settings.MEDIA_ROOT, name, RENDITION_WIDTHS[field]): (model, pk, field, name)
+                for model, pk, field, name in pending
+            }
+            for future in as_completed(futures):
+                model, pk, field, name = futures[future]
+                try:
+                    apply_result(model, pk, field, name, future.result())
+                    total += 1
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f'{model.__name__} {pk}: {exc}')
+
+        self.stdout.write(self.style.SUCCESS(f'{total} images processed, {failed} failed'))
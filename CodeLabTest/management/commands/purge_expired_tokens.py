@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+
+class Command(BaseCommand):
+    help = 'Deletes expired outstanding tokens (and their blacklist entries) in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        now = timezone.now()
+        expired = OutstandingToken.objects.filter(expires_at__lte=now).order_by('pk')
+        total = 0
+
+        while True:
+            ids = list(expired.values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            # BlacklistedToken aponta para OutstandingToken com CASCADE
+            OutstandingToken.objects.filter(pk__in=ids).delete()
+            total += len(ids)
+            self.stdout.write(f'{total} tokens deleted...')
+
+        self.stdout.write(self.style.SUCCESS(f'{total} expired tokens purged'))
@@ -0,0 +1,245 @@
+import copy
+import time
+from contextlib import contextmanager
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from CodeLabTest.models import Like
+
+TABLE = Like._meta.db_table
+SHADOW_TABLE = f'{TABLE}_new'
+OLD_TABLE = f'{TABLE}_old'
+# Pares inseridos ou removidos na tabela antiga durante a cópia, gravados por triggers
+CHANGE_LOG_TABLE = f'{TABLE}_changes'
+CHANGE_TRIGGER = f'{TABLE}_log_change'
+FOREIGN_KEYS = ['post', 'user']
+
+
+@contextmanager
+def shadow_model():
+    """
+    O próprio modelo Like apontando para a tabela nova e sem as FKs no
+    banco: enquanto a cópia roda, posts e usuários continuam sendo apagados
+    (com os likes na tabela antiga) e uma FK na cópia barraria o DELETE
+    """
+    fields = [Like._meta.get_field(name) for name in FOREIGN_KEYS]
+    Like._meta.db_table = SHADOW_TABLE
+    for field in fields:
+        field.db_constraint = False
+    try:
+        yield Like
+    finally:
+        Like._meta.db_table = TABLE
+        for field in fields:
+            field.db_constraint = True
+
+
+def columns(table):
+    with connection.cursor() as cursor:
+        return {column.name for column in connection.introspection.get_table_description(cursor, table)}
+
+
+def foreign_key_columns(table):
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    return {column for constraint in constraints.values() if constraint['foreign_key'] for column in constraint['columns']}
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuilds the likes table around the (post, user) composite primary key: copies rows '
+        'from the old table (surrogate id) into a new one in batches while the site is up, '
+        'then swaps them in a short transaction that only replays the rows inserted or deleted '
+        'since the copy (logged by triggers). Safe to interrupt and re-run'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--sleep', type=float, default=0,
+                            help='Seconds to pause between batches to limit I/O')
+        parser.add_argument('--keep-old', action='store_true',
+                            help=f'Keep the old table as {OLD_TABLE} after the swap')
+
+    def handle(self, *args, **options):
+        quote = connection.ops.quote_name
+        self.table, self.shadow, self.old = quote(TABLE), quote(SHADOW_TABLE), quote(OLD_TABLE)
+        self.log, self.trigger = quote(CHANGE_LOG_TABLE), quote(CHANGE_TRIGGER)
+        self.insert_trigger, self.delete_trigger = quote(f'{CHANGE_TRIGGER}_insert'), quote(f'{CHANGE_TRIGGER}_delete')
+        self.post, self.user, self.created_at = (
+            quote(Like._meta.get_field(name).column) for name in ('post', 'user', 'created_at')
+        )
+
+        if 'id' in columns(TABLE):
+            # Antes da cópia: todo INSERT/DELETE a partir daqui fica registrado
+            self.capture_changes()
+            if SHADOW_TABLE not in connection.introspection.table_names():
+                with shadow_model() as model, connection.schema_editor() as schema_editor:
+                    schema_editor.create_model(model)
+            self.backfill(options['batch_size'], options['sleep'])
+            self.swap(options['batch_size'])
+        else:
+            self.stdout.write(f'{TABLE} already uses the composite primary key')
+
+        self.add_foreign_keys()
+        if not options['keep_old'] and OLD_TABLE in connection.introspection.table_names():
+            with connection.cursor() as cursor:
+                cursor.execute(f'DROP TABLE {self.old}')
+        self.stdout.write(self.style.SUCCESS(f'{TABLE} rebuilt with the (post, user) primary key'))
+
+    def capture_changes(self):
+        """
+        Log de pares tocados na tabela antiga. No PostgreSQL o CREATE TRIGGER
+        espera as transações que já estão escrevendo na tabela: tudo o que
+        não estiver commitado quando a cópia começa passa pelo log
+        """
+        post_type, user_type = (
+            Like._meta.get_field(name).db_type(connection) for name in ('post', 'user')
+        )
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    f'CREATE TABLE IF NOT EXISTS {self.log} (id bigint GENERATED BY DEFAULT AS IDENTITY '
+                    f'PRIMARY KEY, {self.post} {post_type} NOT NULL, {self.user} {user_type} NOT NULL)'
+                )
+                cursor.execute(
+                    f'CREATE OR REPLACE FUNCTION {self.trigger}() RETURNS trigger AS $$ BEGIN '
+                    f"IF TG_OP = 'DELETE' THEN "
+                    f'INSERT INTO {self.log} ({self.post}, {self.user}) VALUES (OLD.{self.post}, OLD.{self.user}); '
+                    f'ELSE '
+                    f'INSERT INTO {self.log} ({self.post}, {self.user}) VALUES (NEW.{self.post}, NEW.{self.user}); '
+                    f'END IF; RETURN NULL; END $$ LANGUAGE plpgsql'
+                )
+                cursor.execute(f'DROP TRIGGER IF EXISTS {self.trigger} ON {self.table}')
+                cursor.execute(
+                    f'CREATE TRIGGER {self.trigger} AFTER INSERT OR DELETE ON {self.table} '
+                    f'FOR EACH ROW EXECUTE FUNCTION {self.trigger}()'
+                )
+            else:
+                cursor.execute(
+                    f'CREATE TABLE IF NOT EXISTS {self.log} (id integer PRIMARY KEY AUTOINCREMENT, '
+                    f'{self.post} {post_type} NOT NULL, {self.user} {user_type} NOT NULL)'
+                )
+                for trigger, event, row in ((self.insert_trigger, 'INSERT', 'NEW'), (self.delete_trigger, 'DELETE', 'OLD')):
+                    cursor.execute(
+                        f'CREATE TRIGGER IF NOT EXISTS {trigger} AFTER {event} ON {self.table} BEGIN '
+                        f'INSERT INTO {self.log} ({self.post}, {self.user}) VALUES ({row}.{self.post}, {row}.{self.user}); END'
+                    )
+
+    def drop_change_capture(self, cursor):
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'DROP TRIGGER IF EXISTS {self.trigger} ON {self.old}')
+            cursor.execute(f'DROP FUNCTION IF EXISTS {self.trigger}()')
+        else:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {self.insert_trigger}')
+            cursor.execute(f'DROP TRIGGER IF EXISTS {self.delete_trigger}')
+        cursor.execute(f'DROP TABLE {self.log}')
+
+    def copy_rows(self, cursor, lower, upper):
+        # A cópia pode se repetir (retomada): pares já copiados são ignorados
+        cursor.execute(
+            f'INSERT INTO {self.shadow} ({self.post}, {self.user}, {self.created_at}) '
+            f'SELECT {self.post}, {self.user}, {self.created_at} FROM {self.table} '
+            f'WHERE id > %s AND id <= %s ON CONFLICT DO NOTHING',
+            [lower, upper]
+        )
+
+    def prune_rows(self, cursor):
+        # Likes removidos da tabela antiga antes de o trigger existir (execução anterior interrompida)
+        cursor.execute(
+            f'DELETE FROM {self.shadow} WHERE NOT EXISTS ('
+            f'SELECT 1 FROM {self.table} WHERE {self.table}.{self.post} = {self.shadow}.{self.post} '
+            f'AND {self.table}.{self.user} = {self.shadow}.{self.user})'
+        )
+
+    def replay_changes(self, cursor, batch_size):
+        """
+        Aplica um lote do log: cada par registrado fica na cópia exatamente
+        como está agora na tabela antiga (removido ou copiado), e as entradas
+        aplicadas saem do log. Não usa marca de id: uma entrada com id menor
+        que chegue depois (commit atrasado) continua no log e entra no
+        próximo lote. Custo proporcional ao lote, pelas chaves das duas
+        tabelas. Retorna quantas entradas aplicou.
+        """
+        cursor.execute(f'SELECT id FROM {self.log} ORDER BY id LIMIT %s', [batch_size])
+        ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            return 0
+        placeholders = ', '.join(['%s'] * len(ids))
+        touched = f'SELECT {self.post}, {self.user} FROM {self.log} WHERE id IN ({placeholders})'
+        cursor.execute(
+            f'DELETE FROM {self.shadow} WHERE ({self.post}, {self.user}) IN ({touched}) '
+            f'AND NOT EXISTS (SELECT 1 FROM {self.table} WHERE {self.table}.{self.post} = {self.shadow}.{self.post} '
+            f'AND {self.table}.{self.user} = {self.shadow}.{self.user})',
+            ids
+        )
+        cursor.execute(
+            f'INSERT INTO {self.shadow} ({self.post}, {self.user}, {self.created_at}) '
+            f'SELECT {self.post}, {self.user}, {self.created_at} FROM {self.table} '
+            f'WHERE ({self.post}, {self.user}) IN ({touched}) ON CONFLICT DO NOTHING',
+            ids
+        )
+        cursor.execute(f'DELETE FROM {self.log} WHERE id IN ({placeholders})', ids)
+        return len(ids)
+
+    def backfill(self, batch_size, sleep):
+        """
+        Copia em lotes e esvazia o log sem travar nada, para a passada final
+        (com escritas bloqueadas) só encontrar o que mudou nos últimos instantes
+        """
+        batch_size = min(batch_size, 900)  # parâmetros por query no SQLite
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT MAX(id) FROM {self.table}')
+            max_id = cursor.fetchone()[0] or 0
+            # Um commit por lote (autocommit): a tabela antiga segue aceitando escritas.
+            # Linhas com id até max_id que ainda não estavam commitadas passam pelo log
+            last = 0
+            while last < max_id:
+                self.copy_rows(cursor, last, min(last + batch_size, max_id))
+                last += batch_size
+                self.stdout.write(f'{min(last, max_id)}/{max_id} ids copied...')
+                time.sleep(sleep)
+            self.prune_rows(cursor)
+            while self.replay_changes(cursor, batch_size) == batch_size:
+                time.sleep(sleep)
+
+    def swap(self, batch_size):
+        batch_size = min(batch_size, 900)
+        with transaction.atomic(), connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # Bloqueia escritas nos likes até o commit; leituras continuam
+                cursor.execute(f'LOCK TABLE {self.table} IN SHARE ROW EXCLUSIVE MODE')
+            # Com escritas bloqueadas o log está completo: aplica o que sobrou nele
+            while self.replay_changes(cursor, batch_size):
+                pass
+            cursor.execute(f'ALTER TABLE {self.table} RENAME TO {self.old}')
+            cursor.execute(f'ALTER TABLE {self.shadow} RENAME TO {self.table}')
+            self.drop_change_capture(cursor)
+        self.stdout.write(f'{SHADOW_TABLE} swapped in as {TABLE}')
+
+    def add_foreign_keys(self):
+        existing = foreign_key_columns(TABLE)
+        missing = [name for name in FOREIGN_KEYS if Like._meta.get_field(name).column not in existing]
+        if not missing:
+            return
+        if connection.vendor == 'postgresql':
+            # NOT VALID não varre a tabela; o VALIDATE varre sem bloquear escritas
+            quote = connection.ops.quote_name
+            with connection.cursor() as cursor:
+                for name in missing:
+                    field = Like._meta.get_field(name)
+                    constraint = quote(f'{TABLE}_{field.column}_fk'.lower())
+                    cursor.execute(
+                        f'ALTER TABLE {self.table} ADD CONSTRAINT {constraint} '
+                        f'FOREIGN KEY ({quote(field.column)}) '
+                        f'REFERENCES {quote(field.related_model._meta.db_table)} '
+                        f'({quote(field.target_field.column)}) DEFERRABLE INITIALLY DEFERRED NOT VALID'
+                    )
+                    cursor.execute(f'ALTER TABLE {self.table} VALIDATE CONSTRAINT {constraint}')
+        else:
+            # SQLite não adiciona FK em tabela existente: o schema editor a recria
+            with connection.schema_editor() as schema_editor:
+                for name in missing:
+                    field = Like._meta.get_field(name)
+                    old_field = copy.copy(field)
+                    old_field.db_constraint = False
+                    schema_editor.alter_field(Like, old_field, field)
+        self.stdout.write(f'Foreign keys added on {", ".join(missing)}')
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from CodeLabTest.models import User, Follow, Post, Comment, Like
+
+
+def count_subquery(queryset, field):
+    """COUNT(*) correlacionado com o usuário da linha sendo atualizada"""
+    counts = queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(
+        total=Count('*')
+    ).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the stored per-user activity counters from the posts, comments, likes and follows tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        total = 0
+
+        while True:
+            ids = list(
+                User.objects.filter(pk__gt=last_id).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+
+            User.objects.filter(pk__in=ids).update(
+                post_count=count_subquery(Post.objects.all(), 'author'),
+                comment_count=count_subquery(Comment.objects.all(), 'user'),
+                likes_given_count=count_subquery(Like.objects.all(), 'user'),
+                likes_received_count=count_subquery(Like.objects.all(), 'post__author'),
+                follower_count=count_subquery(Follow.objects.all(), 'following'),
+                following_count=count_subquery(Follow.objects.all(), 'follower'),
+            )
+
+            last_id = ids[-1]
+            total += len(ids)
+            self.stdout.write(f'{total} users recounted...')
+
+        self.stdout.write(self.style.SUCCESS(f'Activity counters recomputed for {total} users'))
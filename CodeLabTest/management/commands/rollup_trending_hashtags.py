@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from CodeLabTest.hashtags import rollup_trending, TRENDING_LIMIT
+
+
+class Command(BaseCommand):
+    help = 'Rolls up hashtag time buckets into the trending rankings (run periodically, e.g. every minute)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=TRENDING_LIMIT)
+
+    def handle(self, *args, **options):
+        rollup_trending(limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS('Trending hashtags updated'))
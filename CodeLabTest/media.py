@@ -0,0 +1,618 @@
+# CodeLabTest/media.py
+
+import hashlib
+import heapq
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+import stat
+import tempfile
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Collate
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.deconstruct import deconstructible
+from django.utils.http import http_date, parse_etags
+from django.views.decorators.http import require_safe
+from CodeLabTest.sqlite_writer import serialized_write
+
+# Diretório dos arquivos endereçados por conteúdo (sha256 do upload)
+BLOB_DIR = 'blobs'
+
+# Blobs gravados antes da divisão em subdiretórios: blobs/<sha256>.<ext>
+FLAT_BLOB_REGEX = rf'^{BLOB_DIR}/[^/]+$'
+
+
+def blob_name(digest, extension):
+    """
+    blobs/ab/cd/abcd...<ext>: dois níveis pelo prefixo do hash (65536
+    diretórios) para nenhum diretório acumular milhões de entradas
+    """
+    return f'{BLOB_DIR}/{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+
+# Diretórios do MEDIA_ROOT gerenciados aqui (varridos pela coleta de órfãos)
+MEDIA_DIRS = ('avatars', BLOB_DIR, 'posts', 'tmp')
+
+
+# Diretórios servidos por serve_media (tmp/ tem uploads em andamento)
+SERVED_DIRS = ('avatars', BLOB_DIR, 'posts')
+
+# Nomes por conteúdo nunca mudam de conteúdo: cache de um ano, sem revalidar
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def media_fields():
+    """Campos de arquivo gravados no content_storage"""
+    from CodeLabTest.models import Post, User
+    return [(Post, 'image'), (User, 'avatar')]
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Storage que grava cada upload pelo sha256 do conteúdo, calculado enquanto
+    o arquivo é copiado para um temporário. Uploads iguais viram o mesmo
+    arquivo; cada save() soma uma referência no MediaBlob correspondente.
+    O nome gerado pelo upload_to só contribui com a extensão. Imagens com
+    EXIF são regravadas sem ele antes do hash (CodeLabTest.images), então o
+    blob já nasce limpo e nunca é reescrito.
+    """
+
+    def _save(self, name, content):
+        from CodeLabTest.images import strip_metadata
+
+        extension = os.path.splitext(name)[1].lower()
+        temp_dir = os.path.join(self.location, 'tmp')
+        os.makedirs(temp_dir, exist_ok=True)
+
+        digest = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=temp_dir, suffix=extension)
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+                    size += len(chunk)
+            if strip_metadata(temp_path):
+                digest, size = file_digest(temp_path)
+            return acquire_blob(self, digest.hexdigest(), extension, size, temp_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+content_storage = ContentAddressedStorage()
+
+
+def file_digest(path, chunk_size=64 * 1024):
+    """(sha256, tamanho) de um arquivo, lido em blocos"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest, size
+
+
+def acquire_blob(storage, digest, extension, size, temp_path):
+    """
+    Soma uma referência ao blob (criando a linha se preciso) e, com a linha
+    travada, coloca o arquivo no lugar se ainda não existir. A mesma trava é
+    usada ao apagar blobs sem referências, então um upload concorrente nunca
+    fica apontando para um arquivo removido.
+    """
+    from CodeLabTest.models import MediaBlob
+
+    while True:
+        with transaction.atomic():
+            MediaBlob.objects.bulk_create(
+                [MediaBlob(sha256=digest, name=blob_name(digest, extension), size=size, refcount=0)],
+                ignore_conflicts=True
+            )
+            blob = MediaBlob.objects.select_for_update().filter(sha256=digest).first()
+            if blob is None:
+                # purge_blob apagou a linha entre o INSERT e a trava: tenta de novo
+                continue
+            path = storage.path(blob.name)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(temp_path, path)
+            else:
+                # Arquivo reaproveitado volta a ficar dentro da carência da coleta de órfãos
+                os.utime(path)
+            MediaBlob.objects.filter(pk=digest).update(refcount=F('refcount') + 1, released_at=None)
+        return blob.name
+
+
+def rendition_names(renditions):
+    return [name for sizes in (renditions or {}).values() for name in sizes.values()]
+
+
+def release(name, renditions=None):
+    """
+    Tira uma referência do arquivo. Sem referências, o blob e suas versões são
+    apagados após o commit. Arquivos anteriores ao armazenamento por conteúdo
+    (sem MediaBlob) são apagados direto, como antes.
+    """
+    from CodeLabTest.models import MediaBlob
+
+    if not name:
+        return
+    updated = MediaBlob.objects.filter(name=name, refcount__gt=0).update(
+        refcount=F('refcount') - 1, released_at=timezone.now()
+    )
+    if updated:
+        transaction.on_commit(lambda: serialized_write(purge_blob, name))
+        return
+
+    names = [name, *rendition_names(renditions)]
+    transaction.on_commit(lambda: [content_storage.delete(n) for n in names])
+
+
+def purge_blob(name):
+    """
+    Apaga a linha do blob, se ainda estiver sem referências, e depois do
+    commit os arquivos (o blob e as versões de todos os campos)
+    """
+    from CodeLabTest.models import MediaBlob
+
+    with transaction.atomic():
+        blob = MediaBlob.objects.select_for_update().filter(name=name, refcount=0).first()
+        if blob is None:
+            return
+        names = {blob.name}
+        for result in blob.metadata.values():
+            names.update(rendition_names(result['renditions']))
+        digest, size = blob.sha256, blob.size
+        blob.delete()
+        transaction.on_commit(lambda: delete_blob_files(digest, name, size, names))
+
+
+def delete_blob_files(digest, name, size, names):
+    """
+    Apaga os arquivos de um blob já removido do banco. Recria a linha (sem
+    referências) só para travá-la enquanto apaga: um acquire_blob do mesmo
+    conteúdo espera a trava e, sem a linha, tenta de novo e recoloca o
+    arquivo. Se um upload chegou antes e a linha já tem referência, os
+    arquivos ficam. Se este commit falhar sobra só uma linha sem referências
+    e sem metadados, e o próximo upload recoloca o arquivo.
+    """
+    from CodeLabTest.models import MediaBlob
+
+    with transaction.atomic():
+        MediaBlob.objects.bulk_create(
+            [MediaBlob(sha256=digest, name=name, size=size, refcount=0)],
+            ignore_conflicts=True
+        )
+        current = MediaBlob.objects.select_for_update().filter(sha256=digest).first()
+        if current is None or current.refcount:
+            return
+        for file_name in names:
+            content_storage.delete(file_name)
+        current.delete()
+
+
+def stored_name(instance, field):
+    """Nome do arquivo gravado no banco (None para instâncias novas)"""
+    if instance._state.adding:
+        return None
+    return type(instance)._base_manager.filter(pk=instance.pk).values_list(field, flat=True).first() or None
+
+
+def media_changes(instance, field, kwargs):
+    """
+    Chamado no save() antes de gravar. Se o arquivo do campo foi trocado ou
+    removido, zera os metadados de imagem e devolve o que precisa ser feito
+    depois do save: (arquivo novo a processar?, nome antigo a liberar,
+    versões antigas). Sem mudança devolve None.
+
+    O nome antigo vem do banco e não da instância: request.user, por exemplo,
+    sai do cache de autenticação e pode estar defasado.
+    """
+    from CodeLabTest.images import metadata_fields
+
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and field not in update_fields:
+        return None
+
+    file = getattr(instance, field)
+    uploaded = bool(file) and not file._committed
+    if file and not uploaded:
+        return None
+    old_name = stored_name(instance, field)
+    if not uploaded and old_name is None:
+        return None
+
+    old_renditions = getattr(instance, f'{field}_renditions')
+    for name, empty in zip(metadata_fields(field), (None, None, '', {})):
+        setattr(instance, name, empty)
+    if update_fields is not None:
+        kwargs['update_fields'] = {*update_fields, *metadata_fields(field)}
+    return uploaded, old_name, old_renditions
+
+
+def release_field(instance, field):
+    """Libera o arquivo do campo de uma instância removida (sinais post_delete)"""
+    release(getattr(instance, field).name or None, getattr(instance, f'{field}_renditions'))
+
+
+def apply_media_changes(instance, field, changes):
+    """Chamado após o save(): libera o arquivo antigo e agenda o processamento do novo"""
+    from CodeLabTest.images import schedule_processing
+
+    if changes is None:
+        return
+    uploaded, old_name, old_renditions = changes
+    release(old_name, old_renditions)
+    if uploaded:
+        schedule_processing(instance, field)
+
+
+def _link_or_copy(source, destination):
+    """Hard link quando possível (mesmo sistema de arquivos), cópia senão"""
+    if os.path.exists(destination):
+        return
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+def _rebase(name, old, new):
+    """Versão de `old` renomeada para `new`: 'a/x_w320.webp' -> 'b/y_w320.webp'"""
+    return os.path.splitext(new)[0] + name[len(os.path.splitext(old)[0]):]
+
+
+def _rebase_renditions(renditions, old, new):
+    return {
+        extension: {width: _rebase(name, old, new) for width, name in sizes.items()}
+        for extension, sizes in (renditions or {}).items()
+    }
+
+
+def _link_renditions(renditions, old, new):
+    for name in rendition_names(renditions):
+        source = content_storage.path(name)
+        if os.path.exists(source):
+            _link_or_copy(source, content_storage.path(_rebase(name, old, new)))
+
+
+def _delete_after_commit(names):
+    transaction.on_commit(lambda: [content_storage.delete(name) for name in names])
+
+
+def shard_blob(sha256):
+    """
+    Move um blob gravado em blobs/<sha256>.<ext> (e suas versões) para o
+    layout em subdiretórios e reescreve os campos que apontam para ele.
+    Os arquivos novos são criados antes da troca no banco e os antigos só
+    saem após o commit, então leituras nunca encontram o arquivo ausente.
+    Retorna False se o blob já foi movido ou removido.
+    """
+    from CodeLabTest.models import MediaBlob
+
+    with transaction.atomic():
+        blob = MediaBlob.objects.select_for_update().filter(pk=sha256, name__regex=FLAT_BLOB_REGEX).first()
+        if blob is None:
+            return False
+        old = blob.name
+        new = blob_name(blob.sha256, os.path.splitext(old)[1])
+        old_names = [old]
+        if os.path.exists(content_storage.path(old)):
+            _link_or_copy(content_storage.path(old), content_storage.path(new))
+        for result in blob.metadata.values():
+            _link_renditions(result['renditions'], old, new)
+            old_names += rendition_names(result['renditions'])
+            result['renditions'] = _rebase_renditions(result['renditions'], old, new)
+        blob.name = new
+        blob.save(update_fields=['name', 'metadata'])
+
+        for model, field in media_fields():
+            rows = model._base_manager.filter(**{field: old}).values_list('pk', f'{field}_renditions')
+            for pk, renditions in rows:
+                model._base_manager.filter(pk=pk).update(**{
+                    field: new, f'{field}_renditions': _rebase_renditions(renditions, old, new)
+                })
+        _delete_after_commit(old_names)
+    return True
+
+
+def adopt_legacy_file(model, pk, field, name):
+    """
+    Passa um arquivo do layout antigo (posts/<id>/<uuid>.<ext>,
+    avatars/user_<id>/...) para o armazenamento por conteúdo: soma uma
+    referência ao blob do mesmo conteúdo (ou cria) e reescreve o campo só se
+    ele ainda aponta para o arquivo antigo. Retorna False se o arquivo não
+    existe ou o campo mudou no meio do caminho.
+    """
+    from django.core.files import File
+    from CodeLabTest.images import metadata_fields
+    from CodeLabTest.models import MediaBlob
+
+    path = content_storage.path(name)
+    if not os.path.exists(path):
+        return False
+
+    with transaction.atomic():
+        with open(path, 'rb') as source:
+            new = content_storage.save(os.path.basename(name), File(source))
+
+        row = model._base_manager.select_for_update().filter(
+            pk=pk, **{field: name}
+        ).values(*metadata_fields(field)).first()
+        if row is None:
+            release(new)
+            return False
+
+        blob = MediaBlob.objects.select_for_update().get(name=new)
+        old_renditions = row[f'{field}_renditions']
+        values = {field: new}
+        if field in blob.metadata:
+            # Mesmo conteúdo já processado: as versões do blob valem
+            result = blob.metadata[field]
+            values.update(zip(metadata_fields(field), (
+                result['width'], result['height'], result['placeholder'], result['renditions']
+            )))
+        elif row[f'{field}_width'] is not None:
+            _link_renditions(old_renditions, name, new)
+            renditions = _rebase_renditions(old_renditions, name, new)
+            values[f'{field}_renditions'] = renditions
+            blob.metadata[field] = {
+                'width': row[f'{field}_width'], 'height': row[f'{field}_height'],
+                'placeholder': row[f'{field}_placeholder'], 'renditions': renditions,
+            }
+            blob.save(update_fields=['metadata'])
+
+        model._base_manager.filter(pk=pk).update(**values)
+        _delete_after_commit([name, *rendition_names(old_renditions)])
+    return True
+
+
+def walk_media(root, directories=MEDIA_DIRS):
+    """
+    Percorre os arquivos em ordem lexicográfica do caminho relativo sem
+    carregar a árvore: cada diretório é listado e ordenado sozinho, com
+    subdiretórios ordenados como 'nome/' (a mesma ordem do caminho completo).
+    Gera (nome relativo, os.DirEntry).
+    """
+    def scan(relative):
+        try:
+            with os.scandir(os.path.join(root, relative)) as entries:
+                entries = [(entry.name + '/' if entry.is_dir(follow_symlinks=False) else entry.name, entry)
+                           for entry in entries]
+        except FileNotFoundError:
+            return
+        for key, entry in sorted(entries, key=lambda item: item[0]):
+            name = posixpath.join(relative, entry.name)
+            if key.endswith('/'):
+                yield from scan(name)
+            else:
+                yield name, entry
+
+    for directory in sorted(directories, key=lambda d: d + '/'):
+        yield from scan(directory)
+
+
+def _ordered(field):
+    """ORDER BY na mesma ordem das strings em Python (byte a byte)"""
+    return Collate(field, 'C') if connection.vendor == 'postgresql' else field
+
+
+def _with_renditions(rows):
+    """
+    (nome, [versões]) em ordem de nome -> todos os nomes em ordem. As versões
+    ficam no mesmo diretório do original, então um heap com o diretório atual
+    basta: ao passar para a linha seguinte, tudo que é menor que o diretório
+    dela já pode sair.
+    """
+    heap = []
+    for name, renditions in rows:
+        watermark = posixpath.dirname(name) + '/'
+        while heap and heap[0] < watermark:
+            yield heapq.heappop(heap)
+        for item in (name, *renditions):
+            heapq.heappush(heap, item)
+    while heap:
+        yield heapq.heappop(heap)
+
+
+def upload_part_names():
+    """Temporários das sessões de upload existentes (poucas: sessões expiram)"""
+    from CodeLabTest.models import UploadSession
+    from CodeLabTest.uploads import part_name
+
+    return sorted(part_name(pk) for pk in UploadSession.objects.values_list('pk', flat=True))
+
+
+def live_blobs(released_after=None):
+    """
+    Blobs com referências. Com `released_after`, também os que ficaram sem
+    referências depois dessa data: dentro da carência eles só são apagados
+    por purge_blob, que trava a linha contra um upload do mesmo conteúdo
+    """
+    from CodeLabTest.models import MediaBlob
+
+    live = Q(refcount__gt=0)
+    if released_after is not None:
+        live |= Q(released_at__gte=released_after)
+    return MediaBlob.objects.filter(live)
+
+
+def unreferenced_blobs(released_before):
+    """Blobs sem referências desde antes de `released_before` (ou sem data: sobras de falhas)"""
+    from CodeLabTest.models import MediaBlob
+
+    return MediaBlob.objects.filter(refcount=0).filter(
+        Q(released_at__lt=released_before) | Q(released_at__isnull=True)
+    )
+
+
+def referenced_names(chunk_size=5000, released_after=None):
+    """
+    Nomes referenciados pelo banco (blobs com referências, campos de arquivo
+    e versões, e os temporários de uploads em andamento), em ordem
+    """
+    blobs = (
+        (name, [n for result in metadata.values() for n in rendition_names(result['renditions'])])
+        for name, metadata in live_blobs(released_after).order_by(_ordered('name')).values_list(
+            'name', 'metadata'
+        ).iterator(chunk_size=chunk_size)
+    )
+    streams = [_with_renditions(blobs), iter(upload_part_names())]
+    for model, field in media_fields():
+        rows = model._base_manager.filter(**{f'{field}__isnull': False}).exclude(
+            **{field: ''}
+        ).order_by(_ordered(field)).values_list(field, f'{field}_renditions').iterator(chunk_size=chunk_size)
+        streams.append(_with_renditions(
+            (name, rendition_names(renditions)) for name, renditions in rows
+        ))
+    return heapq.merge(*streams)
+
+
+def orphaned_files(root, chunk_size=5000, released_after=None):
+    """
+    Arquivos sem referência no banco: merge-join entre a árvore e os nomes
+    do banco, os dois em ordem, com memória limitada ao maior diretório.
+    Gera (nome relativo, os.DirEntry).
+    """
+    references = referenced_names(chunk_size, released_after)
+    reference = next(references, None)
+    for name, entry in walk_media(root):
+        while reference is not None and reference < name:
+            reference = next(references, None)
+        if reference != name:
+            yield name, entry
+
+
+def still_referenced(names, released_after=None):
+    """Dos nomes dados, os que passaram a ser referenciados (conferência antes de apagar)"""
+    names = list(names)
+    found = set(live_blobs(released_after).filter(name__in=names).values_list('name', flat=True))
+    for model, field in media_fields():
+        found.update(model._base_manager.filter(**{f'{field}__in': names}).values_list(field, flat=True))
+    found.update(set(names) & set(upload_part_names()))
+    return found
+
+
+def _etag(st):
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def _byte_range(header, size):
+    """
+    'bytes=0-99', 'bytes=100-' ou 'bytes=-100' -> (início, fim inclusivo).
+    None para ignorar o cabeçalho (múltiplos intervalos ou sintaxe inválida:
+    responde o arquivo inteiro); ValueError se o intervalo não cabe no arquivo.
+    """
+    match = re.fullmatch(r'bytes=(\d*)-(\d*)', header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if start == '':
+        length = int(end)
+        if length == 0:
+            raise ValueError(header)
+        return max(0, size - length), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def _read_range(path, start, end, chunk_size=64 * 1024):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = file.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+@require_safe
+def serve_media(request, path):
+    """
+    Serve arquivos do MEDIA_ROOT com ETag/Last-Modified (304), Range (206) e
+    Cache-Control imutável para blobs. Com MEDIA_SERVING['SENDFILE'] a
+    transferência fica com o proxy na frente (X-Accel-Redirect do nginx ou
+    X-Sendfile do Apache/lighttpd); sem proxy, FileResponse usa o
+    wsgi.file_wrapper do servidor (sendfile, sem copiar pelo Python).
+    """
+    if path.split('/', 1)[0] not in SERVED_DIRS:
+        raise Http404
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        st = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404
+    if not stat.S_ISREG(st.st_mode):
+        raise Http404
+
+    etag = _etag(st)
+    content_type, encoding = mimetypes.guess_type(full_path)
+    headers = {
+        'Content-Type': content_type or 'application/octet-stream',
+        'ETag': etag,
+        'Last-Modified': http_date(st.st_mtime),
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': (
+            IMMUTABLE_CACHE_CONTROL if path.startswith(f'{BLOB_DIR}/')
+            else f"public, max-age={settings.MEDIA_SERVING['MAX_AGE']}"
+        ),
+    }
+    if encoding:
+        headers['Content-Encoding'] = encoding
+
+    not_modified = get_conditional_response(
+        request, etag=etag, last_modified=int(st.st_mtime), response=HttpResponse(headers=headers)
+    )
+    if not_modified.status_code != 200:
+        return not_modified
+
+    sendfile = settings.MEDIA_SERVING['SENDFILE']
+    if sendfile == 'x-accel-redirect':
+        # O nginx trata Range e condicionais sozinho a partir daqui
+        response = HttpResponse(headers=headers)
+        response['X-Accel-Redirect'] = settings.MEDIA_SERVING['ACCEL_PREFIX'] + path
+        return response
+    if sendfile == 'x-sendfile':
+        response = HttpResponse(headers=headers)
+        response['X-Sendfile'] = full_path
+        return response
+
+    range_header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    if range_header and (if_range is None or etag in parse_etags(if_range)):
+        try:
+            byte_range = _byte_range(range_header, st.st_size)
+        except ValueError:
+            response = HttpResponse(status=416, headers=headers)
+            response['Content-Range'] = f'bytes */{st.st_size}'
+            return response
+        if byte_range is not None:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                _read_range(full_path, start, end), status=206, headers=headers
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{st.st_size}'
+            response['Content-Length'] = str(end - start + 1)
+            return response
+
+    return FileResponse(open(full_path, 'rb'), headers=headers)
@@ -0,0 +1,65 @@
+# CodeLabTest/mentions.py
+
+import re
+from django.utils.encoding import force_str
+from CodeLabTest.models import User, Mention, Notification
+
+# "@username" precedido de início/espaço/pontuação (não pega e-mails como a@b.com)
+MENTION_RE = re.compile(r'(?<![\w@.])@([\w.+-]{1,100})')
+
+# Limite de usuários notificados por post/comentário
+MAX_MENTIONS_PER_POST = 20
+
+
+def extract_mentions(*texts):
+    """
+    Extrai usernames mencionados (sem '@', sem pontuação final, sem duplicatas)
+    """
+    names = []
+    seen = set()
+    for text in texts:
+        if not text:
+            continue
+        for match in MENTION_RE.finditer(force_str(text)):
+            name = match.group(1).rstrip('.')
+            if name and name not in seen:
+                seen.add(name)
+                names.append(name)
+    return names[:MAX_MENTIONS_PER_POST]
+
+
+def process_mentions(author, post, *texts, comment=None, adding=True):
+    """
+    Resolve as menções em uma única query, grava Mention e cria as
+    notificações com bulk_create. Em edições, só notifica menções novas e
+    apaga as que saíram do texto.
+    """
+    names = extract_mentions(*texts)
+    if not adding:
+        Mention.objects.filter(post=post, comment=comment).exclude(
+            mentioned_user__username__in=names
+        ).delete()
+    if not names:
+        return []
+
+    users = list(
+        User.objects.filter(username__in=names, is_active=True)
+        .exclude(pk=author.pk)
+        .only('id', 'username')
+    )
+    if not adding:
+        already = set(
+            Mention.objects.filter(post=post, comment=comment, mentioned_user__in=users)
+            .values_list('mentioned_user_id', flat=True)
+        )
+        users = [user for user in users if user.pk not in already]
+    if not users:
+        return []
+
+    mentions = [
+        Mention(post=post, comment=comment, mentioned_user=user, author=author)
+        for user in users
+    ]
+    Mention.objects.bulk_create(mentions, ignore_conflicts=True)
+    Notification.create_mention_notifications(mentions)
+    return mentions
@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 import uuid
 import os
+from CodeLabTest.ids import uuid7
+from CodeLabTest.media import content_storage
 
 def user_avatar_path(instance, filename):
     """
@@ -21,7 +23,30 @@ def post_image_path(instance, filename):
     filename = f'{uuid.uuid4()}.{ext}'
     return os.path.join('posts', str(instance.id), filename)
 
-class UserManager(BaseUserManager):
+class CountedQuerySet(models.QuerySet):
+    """
+    delete() dentro de CodeLabTest.signals.grouped_counters: os contadores de
+    atividade dos usuários são ajustados com UPDATEs agrupados no fim, e
+    likes e follows continuam no fast-delete (sem sinais por linha)
+    """
+
+    def delete(self):
+        from CodeLabTest.signals import grouped_counters
+        with grouped_counters(queryset=self):
+            return super().delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+class CountedDeleteMixin:
+    """O mesmo do CountedQuerySet para Model.delete()"""
+
+    def delete(self, *args, **kwargs):
+        from CodeLabTest.signals import grouped_counters
+        with grouped_counters(instance=self):
+            return super().delete(*args, **kwargs)
+
+class UserManager(BaseUserManager.from_queryset(CountedQuerySet)):
     """
     Manager customizado para o modelo User
     """
@@ -49,7 +74,7 @@ class UserManager(BaseUserManager):
         
         return self.create_user(username, email, password, **extra_fields)
 
-class User(AbstractBaseUser, PermissionsMixin):
+class User(CountedDeleteMixin, AbstractBaseUser, PermissionsMixin):
     """
     Modelo de usuário customizado com suporte a JWT e avatar
     """
@@ -59,7 +84,13 @@ class User(AbstractBaseUser, PermissionsMixin):
     first_name = models.CharField(max_length=100, blank=True)
     last_name = models.CharField(max_length=100, blank=True)
     bio = models.TextField(max_length=500, blank=True)
-    avatar = models.ImageField(upload_to=user_avatar_path, null=True, blank=True)
+    # Gravado por conteúdo (CodeLabTest.media); do upload_to só vale a extensão
+    avatar = models.ImageField(upload_to=user_avatar_path, storage=content_storage, null=True, blank=True)
+    # Preenchidos pelo processamento em background (CodeLabTest.images)
+    avatar_width = models.PositiveIntegerField(null=True, blank=True)
+    avatar_height = models.PositiveIntegerField(null=True, blank=True)
+    avatar_placeholder = models.TextField(blank=True, default='')
+    avatar_renditions = models.JSONField(default=dict, blank=True)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
     is_superuser = models.BooleanField(default=False)
@@ -67,15 +98,32 @@ class User(AbstractBaseUser, PermissionsMixin):
     updated_datetime = models.DateTimeField(auto_now=True)
     last_login = models.DateTimeField(null=True, blank=True)
     
+    # Contadores de atividade mantidos por CodeLabTest/signals.py
+    post_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    likes_given_count = models.PositiveIntegerField(default=0)
+    likes_received_count = models.PositiveIntegerField(default=0)
+    follower_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    
     objects = UserManager()
     
     USERNAME_FIELD = 'username'
     REQUIRED_FIELDS = ['email']
     
+    # Campos usados pela busca aproximada (ver CodeLabTest/fuzzy.py)
+    SEARCH_FIELDS = {'username', 'first_name', 'last_name', 'email', 'is_active'}
+    
     class Meta:
         verbose_name = 'Usuário'
         verbose_name_plural = 'Usuários'
         ordering = ['-created_datetime']
+        indexes = [
+            models.Index(fields=['-post_count']),
+            models.Index(fields=['-comment_count']),
+            models.Index(fields=['-likes_received_count']),
+            models.Index(fields=['-follower_count']),
+        ]
     
     def __str__(self):
         return self.username
@@ -86,27 +134,133 @@ class User(AbstractBaseUser, PermissionsMixin):
     def get_short_name(self):
         return self.first_name or self.username
     
+    def set_password(self, raw_password):
+        """
+        Dentro de password_hasher.offload() (login da API) o hash roda no
+        executor limitado; fora dele, o hashing padrão
+        """
+        from CodeLabTest.hashing import offloaded_hasher
+        hasher = offloaded_hasher()
+        if hasher:
+            hasher.set_password(self, raw_password)
+        else:
+            super().set_password(raw_password)
+    
+    def check_password(self, raw_password):
+        from CodeLabTest.hashing import offloaded_hasher
+        hasher = offloaded_hasher()
+        if hasher:
+            return hasher.check_password(self, raw_password)
+        return super().check_password(raw_password)
+    
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        from CodeLabTest.media import media_changes, apply_media_changes
+        changes = media_changes(self, 'avatar', kwargs)
+        super().save(*args, **kwargs)
+        apply_media_changes(self, 'avatar', changes)
+        from CodeLabTest.authentication import invalidate_user
+        invalidate_user(self.pk)
+        if update_fields is None or self.SEARCH_FIELDS & set(update_fields):
+            from CodeLabTest.fuzzy import index_user
+            index_user(self)
+    
     def delete(self, *args, **kwargs):
         """
-        Delete avatar quando usuário é deletado
+        O avatar é liberado pelo sinal post_delete (CodeLabTest.signals)
+        """
+        from CodeLabTest.authentication import invalidate_user
+        invalidate_user(self.pk)
+        return super().delete(*args, **kwargs)
+
+class Follow(CountedDeleteMixin, models.Model):
+    """
+    Relação "follower segue following". A chave primária composta
+    (follower, following) atende "quem eu sigo"; o índice reverso
+    (following, follower) atende "quem me segue". Ambos cobrem as consultas.
+    """
+    pk = models.CompositePrimaryKey('follower', 'following')
+    follower = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='following',
+        db_index=False
+    )
+    following = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='followers',
+        db_index=False
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = CountedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['following', 'follower']),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=~models.Q(follower=models.F('following')),
+                name='follow_not_self'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.follower_id} segue {self.following_id}'
+
+    @staticmethod
+    def followed_ids(follower, user_ids):
+        """Dos user_ids informados, quais o follower segue (uma query pela PK)"""
+        if not follower or not follower.is_authenticated or not user_ids:
+            return set()
+        return set(
+            Follow.objects.filter(follower=follower, following__in=user_ids)
+            .values_list('following_id', flat=True)
+        )
+
+    @staticmethod
+    def mutual(user):
+        """
+        Usuários que seguem e são seguidos por user. Percorre o lado menor
+        (seguidores ou seguidos) e verifica o outro lado pelo índice, então
+        contas com milhões de seguidores não são varridas.
         """
-        if self.avatar:
-            if os.path.isfile(self.avatar.path):
-                os.remove(self.avatar.path)
-        super().delete(*args, **kwargs)
+        if user.following_count <= user.follower_count:
+            ids = Follow.objects.filter(follower=user).filter(
+                models.Exists(Follow.objects.filter(
+                    follower=models.OuterRef('following'), following=user
+                ))
+            ).values('following')
+        else:
+            ids = Follow.objects.filter(following=user).filter(
+                models.Exists(Follow.objects.filter(
+                    follower=user, following=models.OuterRef('follower')
+                ))
+            ).values('follower')
+        return User.objects.filter(pk__in=ids)
 
-class Post(models.Model):
+class Post(CountedDeleteMixin, models.Model):
     """
     Modelo de Post com suporte a imagem
     """
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='posts')
     title = models.CharField(max_length=255)
     content = models.TextField()
-    image = models.ImageField(upload_to=post_image_path, null=True, blank=True)
+    # Gravado por conteúdo (CodeLabTest.media); do upload_to só vale a extensão
+    image = models.ImageField(upload_to=post_image_path, storage=content_storage, null=True, blank=True)
+    # Preenchidos pelo processamento em background (CodeLabTest.images)
+    image_width = models.PositiveIntegerField(null=True, blank=True)
+    image_height = models.PositiveIntegerField(null=True, blank=True)
+    image_placeholder = models.TextField(blank=True, default='')
+    image_renditions = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CountedQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
@@ -117,35 +271,175 @@ class Post(models.Model):
     def __str__(self):
         return self.title
     
-    def delete(self, *args, **kwargs):
-        """
-        Delete imagem quando post é deletado
-        """
-        if self.image:
-            if os.path.isfile(self.image.path):
-                os.remove(self.image.path)
-        super().delete(*args, **kwargs)
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        update_fields = kwargs.get('update_fields')
+        from CodeLabTest.media import media_changes, apply_media_changes
+        changes = media_changes(self, 'image', kwargs)
+        super().save(*args, **kwargs)
+        apply_media_changes(self, 'image', changes)
+        if update_fields is None or {'title', 'content'} & set(update_fields):
+            from CodeLabTest.hashtags import sync_post_hashtags, record_hashtag_usage
+            from CodeLabTest.fuzzy import index_post
+            from CodeLabTest.mentions import process_mentions
+            added = sync_post_hashtags(self)
+            if adding:
+                record_hashtag_usage(added, self.created_at)
+            process_mentions(self.author, self, self.title, self.content, adding=adding)
+            index_post(self)
 
-class Like(models.Model):
+
+class MediaBlob(models.Model):
     """
-    Modelo de Like
+    Arquivo de mídia endereçado por conteúdo (CodeLabTest.media): um arquivo
+    por sha256, com contagem de referências dos campos que apontam para ele
     """
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='likes')
-    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='likes')
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    name = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    # Resultado do processamento (CodeLabTest.images) por campo: {'image': {...}}
+    metadata = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    released_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
-        unique_together = ('user', 'post')
-        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['refcount']),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.refcount} refs)'
+
+class UploadSession(models.Model):
+    """
+    Upload em partes (CodeLabTest.uploads): os bytes vão para um arquivo
+    temporário em tmp/uploads/ e o campo só é preenchido na finalização
+    """
+    TARGETS = (
+        ('post_image', 'Imagem de Post'),
+        ('avatar', 'Avatar'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    target = models.CharField(max_length=20, choices=TARGETS)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, null=True, blank=True, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.target} {self.offset}/{self.size}'
+
+class Hashtag(models.Model):
+    """
+    Hashtag extraída do título/conteúdo dos posts (sempre em minúsculas, sem '#')
+    """
+    name = models.CharField(max_length=100, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return f'#{self.name}'
+
+class PostHashtag(models.Model):
+    """
+    Associação post <-> hashtag, mantida em sincronia por Post.save
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='post_hashtags')
+    hashtag = models.ForeignKey(Hashtag, on_delete=models.CASCADE, related_name='post_hashtags')
+    # Cópia de post.created_at para paginar por tag sem tocar na tabela de posts
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('post', 'hashtag')
+        indexes = [
+            models.Index(fields=['hashtag', '-created_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.hashtag} em {self.post_id}'
+
+class HashtagBucket(models.Model):
+    """
+    Contador de uso de uma hashtag em um intervalo fixo de tempo (ex: 5 minutos)
+    """
+    hashtag = models.ForeignKey(Hashtag, on_delete=models.CASCADE, related_name='buckets')
+    bucket_start = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('hashtag', 'bucket_start')
+        indexes = [
+            models.Index(fields=['bucket_start']),
+        ]
+
+    def __str__(self):
+        return f'{self.hashtag} @ {self.bucket_start:%Y-%m-%d %H:%M}: {self.count}'
+
+class HashtagTrend(models.Model):
+    """
+    Ranking pré-calculado de hashtags por janela (gerado por rollup_trending_hashtags)
+    """
+    WINDOW_CHOICES = (
+        ('1h', 'Última hora'),
+        ('24h', 'Últimas 24 horas'),
+        ('7d', 'Últimos 7 dias'),
+    )
+
+    window = models.CharField(max_length=3, choices=WINDOW_CHOICES)
+    hashtag = models.ForeignKey(Hashtag, on_delete=models.CASCADE, related_name='trends')
+    count = models.PositiveIntegerField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('window', 'hashtag')
+        ordering = ['window', '-count']
+        indexes = [
+            models.Index(fields=['window', '-count']),
+        ]
+
+    def __str__(self):
+        return f'{self.hashtag} ({self.window}): {self.count}'
+
+class Like(CountedDeleteMixin, models.Model):
+    """
+    Like de um usuário em um post. A chave primária composta (post, user)
+    atende "likes do post" e "este usuário curtiu?"; o índice reverso
+    (user, post) atende "likes do usuário". Sem id nem índices por FK: duas
+    B-trees por like. Tabelas antigas (com id) são convertidas com
+    `manage.py rebuild_like_table`.
+    """
+    pk = models.CompositePrimaryKey('post', 'user')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='likes', db_index=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='likes', db_index=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = CountedQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'post']),
+        ]
     
     def __str__(self):
         return f'{self.user.username} likes {self.post.title}'
 
-class Comment(models.Model):
+class Comment(CountedDeleteMixin, models.Model):
     """
     Modelo de Comentário com suporte a respostas
     """
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='comments')
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
     parent = models.ForeignKey(
@@ -160,6 +454,8 @@ class Comment(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_edited = models.BooleanField(default=False)
 
+    objects = CountedQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
@@ -173,14 +469,20 @@ class Comment(models.Model):
         return f'{self.user.username} commented on {self.post.title}'
     
     def save(self, *args, **kwargs):
+        content_changed = self._state.adding
         if self.pk:
             try:
                 old_comment = Comment.objects.get(pk=self.pk)
                 if old_comment.content != self.content:
                     self.is_edited = True
+                    content_changed = True
             except Comment.DoesNotExist:
                 pass
+        adding = self._state.adding
         super().save(*args, **kwargs)
+        if content_changed:
+            from CodeLabTest.mentions import process_mentions
+            process_mentions(self.user, self.post, self.content, comment=self, adding=adding)
     
     @property
     def reply_count(self):
@@ -190,6 +492,74 @@ class Comment(models.Model):
     def is_reply(self):
         return self.parent is not None
     
+class Mention(models.Model):
+    """
+    Menção @username em um post ou comentário (comment nulo = menção no post)
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='mentions')
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='mentions'
+    )
+    mentioned_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='mentions')
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='mentions_made')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['mentioned_user', '-created_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'mentioned_user'],
+                condition=models.Q(comment__isnull=True),
+                name='unique_post_mention'
+            ),
+            models.UniqueConstraint(
+                fields=['comment', 'mentioned_user'],
+                condition=models.Q(comment__isnull=False),
+                name='unique_comment_mention'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.author_id} mencionou {self.mentioned_user_id}'
+
+class UserSuggestion(models.Model):
+    """
+    Sugestão "quem seguir" pré-calculada (gerada por compute_user_suggestions)
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='suggestions')
+    suggested = models.ForeignKey(User, on_delete=models.CASCADE, related_name='suggested_to')
+    score = models.FloatField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'suggested')
+        ordering = ['user', '-score']
+        indexes = [
+            models.Index(fields=['user', '-score']),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id} -> {self.suggested_id} ({self.score:.3f})'
+
+class SuggestionRefresh(models.Model):
+    """
+    Usuário cujas interações diminuíram (like ou comentário apagado) desde a
+    última execução: a execução incremental recalcula e remove a marca.
+    Sem FK: a marca é gravada no meio do delete em cascata do próprio usuário
+    """
+    user_id = models.BigIntegerField(primary_key=True)
+    requested_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.user_id} ({self.requested_at})'
+
 class Notification(models.Model):
     """
     Sistema de notificações
@@ -202,7 +572,7 @@ class Notification(models.Model):
         ('follow', 'Novo Seguidor'),
     )
     
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     recipient = models.ForeignKey(
         'User', 
         on_delete=models.CASCADE, 
@@ -295,4 +665,34 @@ class Notification(models.Model):
                 post=reply.post,
                 comment=reply,
                 message=message
-            )
\ No newline at end of file
+            )
+    
+    @staticmethod
+    def create_mention_notifications(mentions):
+        """Cria as notificações de menção em um único INSERT"""
+        notifications = []
+        for mention in mentions:
+            if mention.comment_id:
+                message = f'{mention.author.username} mencionou você em um comentário'
+            else:
+                message = f'{mention.author.username} mencionou você no post "{mention.post.title}"'
+            notifications.append(Notification(
+                recipient_id=mention.mentioned_user_id,
+                sender_id=mention.author_id,
+                notification_type='mention',
+                post_id=mention.post_id,
+                comment_id=mention.comment_id,
+                message=message
+            ))
+        Notification.objects.bulk_create(notifications)
+    
+    @staticmethod
+    def create_follow_notification(follow):
+        """Cria notificação quando alguém passa a seguir o usuário"""
+        message = f'{follow.follower.username} começou a seguir você'
+        Notification.objects.create(
+            recipient=follow.following,
+            sender=follow.follower,
+            notification_type='follow',
+            message=message
+        )
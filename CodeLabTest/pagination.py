@@ -30,4 +30,36 @@ class PostCursorPagination(CursorPagination):
     page_size_query_param = 'page_size'
     max_page_size = 100
     ordering = '-created_at'
-    cursor_query_param = 'cursor'
\ No newline at end of file
+    cursor_query_param = 'cursor'
+
+class HashtagCursorPagination(PostCursorPagination):
+    """
+    Cursor pagination para posts de uma hashtag, ordenada pela data copiada
+    em PostHashtag (usa o índice (hashtag, -created_at))
+    """
+    ordering = '-tagged_at'
+
+
+class FollowerCursorPagination(CursorPagination):
+    """
+    Keyset pagination dos seguidores de um usuário pelo índice (following, follower)
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = 'follower_id'
+    cursor_query_param = 'cursor'
+
+
+class FollowingCursorPagination(FollowerCursorPagination):
+    """
+    Keyset pagination de quem o usuário segue pela chave primária (follower, following)
+    """
+    ordering = 'following_id'
+
+
+class UserCursorPagination(FollowerCursorPagination):
+    """
+    Keyset pagination de usuários pela chave primária
+    """
+    ordering = 'id'
@@ -0,0 +1,230 @@
+# CodeLabTest/recommendations.py
+
+import heapq
+import math
+from collections import defaultdict
+from django.db import transaction
+from django.db.models import Count, F, Max
+from django.utils import timezone
+from CodeLabTest.models import Follow, Like, Comment, UserSuggestion, SuggestionRefresh
+
+# Peso de cada tipo de interação com um autor (comentar vale mais que curtir)
+LIKE_WEIGHT = 1.0
+COMMENT_WEIGHT = 2.0
+
+# Sugestões guardadas por usuário e autores semelhantes mantidos por autor
+SUGGESTIONS_PER_USER = 20
+NEIGHBOURS_PER_AUTHOR = 50
+
+# Autores considerados por usuário (os de maior peso), para limitar o custo
+# de usuários que interagem com praticamente todo mundo
+MAX_AUTHORS_PER_USER = 200
+
+# Tamanho das listas IN nas consultas restritas (limite de parâmetros do SQLite)
+IN_BATCH_SIZE = 500
+
+
+def _batches(ids):
+    ids = sorted(ids)
+    for start in range(0, len(ids), IN_BATCH_SIZE):
+        yield ids[start:start + IN_BATCH_SIZE]
+
+
+def interaction_counts(users=None, authors=None):
+    """
+    Interações ponderadas {usuário: {autor: total}}, de todos ou só das
+    linhas (users) ou colunas (authors) informadas. Interações com os
+    próprios posts e com autores inativos são ignoradas. Uma query agregada
+    por tabela (e por lote de ids).
+    """
+    if users is not None:
+        restrictions = [{'user__in': batch} for batch in _batches(users)]
+    elif authors is not None:
+        restrictions = [{'post__author__in': batch} for batch in _batches(authors)]
+    else:
+        restrictions = [{}]
+
+    counts = defaultdict(lambda: defaultdict(float))
+    for queryset, weight in ((Like.objects.all(), LIKE_WEIGHT), (Comment.objects.all(), COMMENT_WEIGHT)):
+        for restriction in restrictions:
+            rows = queryset.filter(
+                post__author__is_active=True, **restriction
+            ).exclude(
+                post__author=F('user')
+            ).order_by().values_list('user', 'post__author').annotate(total=Count('*'))
+            for user_id, author_id, total in rows.iterator(chunk_size=5000):
+                counts[user_id][author_id] += weight * total
+    return counts
+
+
+def interaction_matrix(users=None, authors=None):
+    """
+    Matriz esparsa usuário × autor: {usuário: {autor: peso}}.
+
+    O peso é log(1 + interações ponderadas), para que poucos usuários muito
+    ativos não dominem a similaridade.
+    """
+    matrix = {}
+    for user_id, row in interaction_counts(users, authors).items():
+        if len(row) > MAX_AUTHORS_PER_USER:
+            row = dict(heapq.nlargest(MAX_AUTHORS_PER_USER, row.items(), key=lambda item: item[1]))
+        matrix[user_id] = {author_id: math.log1p(value) for author_id, value in row.items()}
+    return matrix
+
+
+def column_norms(columns):
+    return {
+        author_id: math.sqrt(sum(value * value for value in column.values()))
+        for author_id, column in columns.items()
+    }
+
+
+def neighbourhood(user_ids):
+    """
+    Submatriz suficiente para pontuar os usuários informados sem varrer as
+    tabelas inteiras: as linhas deles, as linhas de todos que interagiram
+    com os mesmos autores (o co-engajamento desses autores fica completo) e
+    as colunas dos autores alcançados, só para as normas. Retorna
+    (matriz, normas).
+    """
+    authors = {author_id for row in interaction_matrix(users=user_ids).values() for author_id in row}
+    neighbours = set(interaction_counts(authors=authors)) | set(user_ids)
+    matrix = interaction_matrix(users=neighbours)
+    reached = {author_id for row in matrix.values() for author_id in row}
+    # O corte de MAX_AUTHORS_PER_USER aqui só vê os autores alcançados
+    # (aproximação que só afeta usuários com mais de 200 autores)
+    norms = column_norms(transpose(interaction_matrix(authors=reached)))
+    return matrix, norms
+
+
+def transpose(matrix):
+    """{linha: {coluna: v}} -> {coluna: {linha: v}}"""
+    columns = defaultdict(dict)
+    for row_id, row in matrix.items():
+        for column_id, value in row.items():
+            columns[column_id][row_id] = value
+    return columns
+
+
+def author_similarities(matrix, columns, authors, norms=None):
+    """
+    Similaridade de cosseno entre autores pelo co-engajamento (Rᵀ·R normalizado),
+    calculada só para as colunas informadas e podada aos NEIGHBOURS_PER_AUTHOR
+    vizinhos mais próximos de cada autor.
+    """
+    if norms is None:
+        norms = column_norms(columns)
+    similarities = {}
+    for author_id in authors:
+        column = columns.get(author_id)
+        if not column:
+            continue
+        co_engagement = defaultdict(float)
+        for user_id, weight in column.items():
+            for other_id, other_weight in matrix[user_id].items():
+                if other_id != author_id:
+                    co_engagement[other_id] += weight * other_weight
+        norm = norms[author_id]
+        scored = (
+            (other_id, value / (norm * norms[other_id]))
+            for other_id, value in co_engagement.items()
+        )
+        similarities[author_id] = heapq.nlargest(
+            NEIGHBOURS_PER_AUTHOR, scored, key=lambda item: item[1]
+        )
+    return similarities
+
+
+def score_user(user_id, row, similarities, excluded, limit):
+    """
+    Nota de cada autor candidato: Σ peso(usuário, a) · sim(a, candidato)
+    sobre os autores a com quem o usuário já interagiu
+    """
+    scores = defaultdict(float)
+    for author_id, weight in row.items():
+        for candidate_id, similarity in similarities.get(author_id, ()):
+            scores[candidate_id] += weight * similarity
+    candidates = (
+        item for item in scores.items()
+        if item[0] != user_id and item[0] not in excluded
+    )
+    return heapq.nlargest(limit, candidates, key=lambda item: item[1])
+
+
+def last_run():
+    return UserSuggestion.objects.aggregate(last=Max('computed_at'))['last']
+
+
+def active_user_ids(since):
+    """
+    Usuários que curtiram, comentaram ou seguiram alguém desde o instante
+    informado, mais os marcados por remoções (SuggestionRefresh)
+    """
+    user_ids = set(Like.objects.filter(created_at__gte=since).values_list('user', flat=True))
+    user_ids.update(Comment.objects.filter(created_at__gte=since).values_list('user', flat=True))
+    user_ids.update(Follow.objects.filter(created_at__gte=since).values_list('follower', flat=True))
+    user_ids.update(SuggestionRefresh.objects.values_list('user_id', flat=True))
+    return user_ids
+
+
+def compute_suggestions(user_ids=None, limit=SUGGESTIONS_PER_USER, batch_size=500):
+    """
+    Recalcula as sugestões dos usuários informados (todos com interações
+    quando user_ids é None). Para uma lista de usuários só a vizinhança
+    deles é carregada (ver neighbourhood); sem lista, a matriz inteira.
+    Retorna o número de usuários processados.
+    """
+    now = timezone.now()
+    if user_ids is None:
+        matrix, norms = interaction_matrix(), None
+        targets = sorted(matrix)
+    else:
+        user_ids = set(user_ids)
+        matrix, norms = neighbourhood(user_ids) if user_ids else ({}, {})
+        # Usuários sem interações restantes perdem as sugestões antigas
+        for batch in _batches(pk for pk in user_ids if pk not in matrix):
+            UserSuggestion.objects.filter(user__in=batch).delete()
+        targets = sorted(pk for pk in user_ids if pk in matrix)
+
+    columns = transpose(matrix)
+    needed = {author_id for user_id in targets for author_id in matrix[user_id]}
+    similarities = author_similarities(matrix, columns, needed, norms)
+
+    for start in range(0, len(targets), batch_size):
+        batch = targets[start:start + batch_size]
+        followed = defaultdict(set)
+        for follower_id, following_id in Follow.objects.filter(
+            follower__in=batch
+        ).values_list('follower', 'following'):
+            followed[follower_id].add(following_id)
+
+        suggestions = [
+            UserSuggestion(user_id=user_id, suggested_id=suggested_id, score=score, computed_at=now)
+            for user_id in batch
+            for suggested_id, score in score_user(
+                user_id, matrix[user_id], similarities, followed[user_id], limit
+            )
+        ]
+        with transaction.atomic():
+            UserSuggestion.objects.filter(user__in=batch).delete()
+            UserSuggestion.objects.bulk_create(suggestions, batch_size=1000)
+
+    if user_ids is None:
+        # Execução completa: remove sugestões de usuários que saíram da matriz
+        UserSuggestion.objects.filter(computed_at__lt=now).delete()
+        SuggestionRefresh.objects.filter(requested_at__lt=now).delete()
+    else:
+        for batch in _batches(user_ids):
+            SuggestionRefresh.objects.filter(user_id__in=batch, requested_at__lt=now).delete()
+    return len(targets)
+
+
+def refresh_suggestions(full=False, limit=SUGGESTIONS_PER_USER):
+    """
+    Execução incremental: só os usuários ativos desde a última execução.
+    Sem execução anterior (ou com full=True) recalcula todos.
+    """
+    since = None if full else last_run()
+    if since is None:
+        return compute_suggestions(limit=limit)
+    return compute_suggestions(active_user_ids(since), limit=limit)
@@ -0,0 +1,197 @@
+# CodeLabTest/routers.py
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core import signing
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils.functional import SimpleLazyObject, empty
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Estado da requisição atual (definido pelo ReplicaRoutingMiddleware). Threads
+# que leem em nome da requisição precisam rodar em contextvars.copy_context()
+_request_state = ContextVar('replica_routing_state', default=None)
+
+# Cookie assinado com o id do usuário que acabou de escrever: vale em
+# qualquer worker ou servidor, sem estado compartilhado
+STICKY_COOKIE = 'db_sticky'
+
+
+def _resolved_user(request):
+    """
+    Usuário da requisição sem forçar a carga: o do Django é preguiçoso
+    (avaliá-lo faria uma query de sessão, que passaria pelo roteador de novo);
+    o do DRF é atribuído já resolvido depois da autenticação JWT
+    """
+    user = getattr(request, 'user', None)
+    if isinstance(user, SimpleLazyObject):
+        user = None if user._wrapped is empty else user._wrapped
+    return user if user is not None and user.is_authenticated else None
+
+
+class RoutingState:
+    """Decide se as leituras da requisição podem ir para uma réplica"""
+
+    def __init__(self, request):
+        self.request = request
+        self.wrote = request.method not in SAFE_METHODS
+        self.sticky = None
+
+    def use_primary(self):
+        if self.wrote:
+            return True
+        if self.sticky is None:
+            user = _resolved_user(self.request)
+            if user is None:
+                # Ainda não autenticado (ou anônimo): confere de novo na próxima leitura
+                return False
+            self.sticky = self.sticky_user() == str(user.pk)
+        return self.sticky
+
+    def sticky_user(self):
+        try:
+            return self.request.get_signed_cookie(
+                STICKY_COOKIE, salt=STICKY_COOKIE, max_age=settings.DATABASE_ROUTING['STICKY_SECONDS']
+            )
+        except (KeyError, signing.BadSignature):
+            return None
+
+
+class PinnedState:
+    """Leituras fixadas em um banco (ver pinned_reads)"""
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.wrote = False
+
+
+@contextmanager
+def pinned_reads(alias):
+    """
+    Fixa as leituras do contexto atual em `alias`, para que todas as queries
+    caiam na conexão em que foi aberta a transação (ex.: SET LOCAL da busca)
+    """
+    token = _request_state.set(PinnedState(alias))
+    try:
+        yield
+    finally:
+        _request_state.reset(token)
+
+
+class ReplicaHealth:
+    """
+    Saúde de cada réplica, conferida no máximo a cada HEALTH_CHECK_INTERVAL
+    segundos por processo: conexão respondendo e atraso de replicação até
+    MAX_LAG_SECONDS (PostgreSQL; outros bancos só verificam a conexão)
+    """
+
+    LAG_SQL = (
+        'SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 '
+        'ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END'
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._status = {}
+
+    def lag(self, alias):
+        connection = connections[alias]
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(self.LAG_SQL)
+                return float(cursor.fetchone()[0] or 0)
+            cursor.execute('SELECT 1')
+        return 0.0
+
+    def check(self, alias):
+        try:
+            return self.lag(alias) <= settings.DATABASE_ROUTING['MAX_LAG_SECONDS']
+        except DatabaseError:
+            connections[alias].close()
+            return False
+
+    def is_healthy(self, alias):
+        now = time.monotonic()
+        with self._lock:
+            healthy, checked_at = self._status.get(alias, (None, None))
+        if checked_at is not None and now - checked_at < settings.DATABASE_ROUTING['HEALTH_CHECK_INTERVAL']:
+            return healthy
+        healthy = self.check(alias)
+        with self._lock:
+            self._status[alias] = (healthy, now)
+        return healthy
+
+    def status(self):
+        with self._lock:
+            return {alias: healthy for alias, (healthy, _) in self._status.items()}
+
+
+replica_health = ReplicaHealth()
+
+
+class ReplicaRouter:
+    """
+    Escritas no primário; leituras de requisições GET/HEAD/OPTIONS em uma
+    réplica saudável. Ficam no primário: requisições que escrevem (a partir
+    da primeira escrita, ou desde o início se o método não for seguro),
+    leituras dentro de transação e, por STICKY_SECONDS, as requisições de um
+    usuário que acabou de escrever (para ele ver o que gravou). Fora de
+    requisições (comandos, workers) tudo vai para o primário.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_ROUTING['REPLICAS']
+        state = _request_state.get()
+        if isinstance(state, PinnedState):
+            return state.alias
+        if not replicas or state is None or state.use_primary():
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        healthy = [alias for alias in replicas if replica_health.is_healthy(alias)]
+        return random.choice(healthy) if healthy else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplicas têm os mesmos dados do primário
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Guarda a requisição para o ReplicaRouter e, se ela escreveu, fixa as
+    leituras do usuário no primário por STICKY_SECONDS (cookie assinado, que
+    o cliente devolve a qualquer worker)
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RoutingState(request)
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+
+        user = _resolved_user(request)
+        if state.wrote and user is not None and settings.DATABASE_ROUTING['REPLICAS']:
+            response.set_signed_cookie(
+                STICKY_COOKIE, str(user.pk), salt=STICKY_COOKIE,
+                max_age=settings.DATABASE_ROUTING['STICKY_SECONDS'],
+                secure=settings.SESSION_COOKIE_SECURE, httponly=True, samesite='Lax'
+            )
+        return response
@@ -1,20 +1,153 @@
 # CodeLabTest/search.py
 
-from django.db.models import Q, Count
+import contextvars
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlparse
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from django.conf import settings
+from django.db import connection, connections, router, transaction, DatabaseError
+from django.db.models import Q, Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 from rest_framework import generics, status
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAdminUser
 from rest_framework.views import APIView
-from CodeLabTest.models import Post, User, Comment
+from rest_framework.utils.urls import replace_query_param
+from CodeLabTest.models import Post, User, Comment, Like, HashtagTrend
 from CodeLabTest.serializers import PostSerializer, UserSerializer, CommentSerializer
-from CodeLabTest.pagination import StandardResultsSetPagination
+from CodeLabTest.pagination import StandardResultsSetPagination, HashtagCursorPagination
+from CodeLabTest.hashtags import normalize_tag, TRENDING_WINDOWS
+from CodeLabTest.caching import LRUCache
+from CodeLabTest.routers import pinned_reads
+from CodeLabTest import fuzzy
+
+search_cache = LRUCache(
+    max_entries=settings.SEARCH_CACHE['MAX_ENTRIES'],
+    ttl=settings.SEARCH_CACHE['TTL']
+)
+
+# Parâmetros que não mudam o conjunto de resultados
+PAGINATION_PARAMS = {'page', 'page_size', 'cursor'}
+
+
+def normalize_query(value):
+    """
+    Normaliza um termo para a chave de cache: forma Unicode NFKC, caixa
+    dobrada e espaços colapsados. Acentos são mantidos porque as buscas
+    no banco (icontains) diferenciam "cafe" de "café".
+    """
+    return ' '.join(unicodedata.normalize('NFKC', str(value)).casefold().split())
+
+
+def make_cache_key(endpoint, params, exclude=PAGINATION_PARAMS):
+    """Chave estável: endpoint + parâmetros normalizados em ordem alfabética"""
+    items = sorted(
+        (key, normalize_query(value))
+        for key, value in params.items()
+        if key not in exclude
+    )
+    return (endpoint, tuple(items))
+
+
+def hydrate(queryset, ids):
+    """Carrega os objetos pelos ids mantendo a ordem da busca"""
+    objects = queryset.in_bulk(ids)
+    return [objects[pk] for pk in ids if pk in objects]
+
+
+def cursor_value(link, param):
+    """Valor do cursor de um link de paginação (None sem link)"""
+    if link is None:
+        return None
+    return parse_qs(urlparse(link).query)[param][0]
+
+
+def cursor_link(request, param, value):
+    """Link absoluto para a requisição atual com outro cursor"""
+    if value is None:
+        return None
+    return replace_query_param(request.build_absolute_uri(), param, value)
+
+
+def post_count_subquery(model):
+    """
+    COUNT(*) das linhas de model do post, como subquery correlacionada: dois
+    Count() sobre JOINs (likes e comentários) multiplicam um pelo outro
+    """
+    counts = model.objects.filter(post=OuterRef('pk')).order_by().values('post').annotate(
+        total=Count('*')
+    ).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def capped_count(queryset, cap):
+    """
+    Conta no máximo cap + 1 linhas (COUNT sobre subquery com LIMIT).
+    Retorna (contagem limitada a cap, True se havia mais que cap)
+    """
+    count = queryset.order_by()[:cap + 1].count()
+    return min(count, cap), count > cap
+
+
+class SectionRun:
+    """
+    Sub-busca enviada ao pool. O orçamento de tempo conta a partir de quando
+    ela começa a rodar: a espera na fila (pool ocupado por outras
+    requisições) tem limite próprio, `queue_deadline`, e não consome o tempo
+    da busca. Quem sai da fila depois do limite não roda.
+    """
+
+    def __init__(self, executor, queue_deadline, fn, *args):
+        self.queue_deadline = queue_deadline
+        self.started = threading.Event()
+        self.started_at = None
+        self.future = executor.submit(self._run, fn, *args)
+
+    def _run(self, fn, *args):
+        self.started_at = time.monotonic()
+        self.started.set()
+        if self.started_at > self.queue_deadline:
+            raise FutureTimeoutError
+        return fn(*args)
+
+    def result(self, budget):
+        """Resultado em até `budget` segundos do início; TimeoutError se não começou a tempo"""
+        queued = max(0, self.queue_deadline - time.monotonic())
+        if not self.started.wait(timeout=queued) and self.future.cancel():
+            raise FutureTimeoutError
+        # cancel() falhou: começou a rodar agora
+        self.started.wait()
+        return self.future.result(timeout=max(0, self.started_at + budget - time.monotonic()))
+
 
 class GlobalSearchView(APIView):
     """
     Busca global em posts, usuários e comentários
     GET /api/search/?q=termo&type=all
+    
+    As buscas rodam em paralelo (cada thread com sua própria conexão),
+    com contagem limitada e orçamento de tempo por sub-busca, contado a
+    partir do início de cada uma (SectionRun).
     """
     permission_classes = [IsAuthenticatedOrReadOnly]
+    throttle_cost = 6  # até seis queries de busca por requisição
+    result_limit = 10
+    count_cap = 1000
+    time_budget = 2.0  # segundos para cada sub-busca, depois que ela começa
+    queue_timeout = settings.GLOBAL_SEARCH['QUEUE_TIMEOUT']
+    executor = ThreadPoolExecutor(
+        max_workers=settings.GLOBAL_SEARCH['MAX_WORKERS'], thread_name_prefix='global-search'
+    )
+    
+    # nome -> (método de busca, queryset para carregar os ids, serializer)
+    sections = {
+        'posts': ('search_posts', Post.objects.select_related('author'), PostSerializer),
+        'users': ('search_users', User.objects.all(), UserSerializer),
+        'comments': ('search_comments', Comment.objects.select_related('user', 'post'), CommentSerializer),
+    }
     
     def get(self, request):
         query = request.query_params.get('q', '').strip()
@@ -25,28 +158,21 @@ class GlobalSearchView(APIView):
                 'error': 'Query deve ter pelo menos 2 caracteres'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        results = {}
+        section_names = [name for name in self.sections if search_type in ['all', name]]
         
-        if search_type in ['all', 'posts']:
-            posts = self.search_posts(query)
-            results['posts'] = {
-                'count': posts.count(),
-                'results': PostSerializer(posts[:10], many=True, context={'request': request}).data
-            }
-        
-        if search_type in ['all', 'users']:
-            users = self.search_users(query)
-            results['users'] = {
-                'count': users.count(),
-                'results': UserSerializer(users[:10], many=True, context={'request': request}).data
-            }
+        # Cache guarda apenas ids e contagens; campos por usuário (is_liked)
+        # são preenchidos na serialização de cada requisição
+        cache_key = make_cache_key('global', {'q': query, 'type': search_type})
+        found = search_cache.get(cache_key)
+        if found is None:
+            found = self.run_sections(query, section_names)
+            if not any(section['timed_out'] for section in found.values()):
+                search_cache.set(cache_key, found)
         
-        if search_type in ['all', 'comments']:
-            comments = self.search_comments(query)
-            results['comments'] = {
-                'count': comments.count(),
-                'results': CommentSerializer(comments[:10], many=True).data
-            }
+        results = {
+            name: self.render_section(request, name, found[name])
+            for name in section_names
+        }
         
         # Total de resultados
         total = sum(r['count'] for r in results.values())
@@ -54,26 +180,92 @@ class GlobalSearchView(APIView):
         return Response({
             'query': query,
             'total_results': total,
+            'total_capped': any(r['count_capped'] for r in results.values()),
             'results': results
         })
     
+    def run_sections(self, query, section_names):
+        """
+        Executa as sub-buscas concorrentemente. Dentro de uma transação aberta
+        (ex: testes) roda em série, pois outras conexões não veriam os dados.
+        """
+        if connection.in_atomic_block or len(section_names) == 1:
+            return {name: self.run_section(name, query) for name in section_names}
+        
+        # Cada thread roda numa cópia do contexto: o roteamento de leituras
+        # (réplicas, leitura do primário após escrita) segue o da requisição
+        queue_deadline = time.monotonic() + self.queue_timeout
+        runs = {
+            name: SectionRun(
+                self.executor, queue_deadline, contextvars.copy_context().run, self.run_section_in_thread, name, query
+            )
+            for name in section_names
+        }
+        
+        results = {}
+        for name, run in runs.items():
+            try:
+                results[name] = run.result(self.time_budget)
+            except FutureTimeoutError:
+                results[name] = self.empty_section(timed_out=True)
+            except DatabaseError:
+                # statement_timeout estourado (PostgreSQL) ou falha isolada da sub-busca
+                results[name] = self.empty_section(timed_out=True)
+        return results
+    
+    def run_section_in_thread(self, name, query):
+        try:
+            alias = router.db_for_read(Post)
+            if connections[alias].vendor != 'postgresql':
+                return self.run_section(name, query)
+            # SET LOCAL vale só até o fim da transação: a conexão volta ao
+            # pool (ou fica persistente) sem herdar o timeout. As leituras
+            # ficam fixadas no banco escolhido, onde a transação está aberta
+            with pinned_reads(alias), transaction.atomic(using=alias):
+                with connections[alias].cursor() as cursor:
+                    cursor.execute(
+                        'SET LOCAL statement_timeout = %s', [int(self.time_budget * 1000)]
+                    )
+                return self.run_section(name, query)
+        finally:
+            connections.close_all()
+    
+    def run_section(self, name, query):
+        search_method, _, _ = self.sections[name]
+        queryset = getattr(self, search_method)(query)
+        count, count_capped = capped_count(queryset, self.count_cap)
+        return {
+            'count': count,
+            'count_capped': count_capped,
+            'timed_out': False,
+            'ids': list(queryset.values_list('pk', flat=True)[:self.result_limit])
+        }
+    
+    def render_section(self, request, name, found):
+        _, queryset, serializer_class = self.sections[name]
+        objects = hydrate(queryset, found['ids'])
+        return {
+            'count': found['count'],
+            'count_capped': found['count_capped'],
+            'timed_out': found['timed_out'],
+            'results': serializer_class(objects, many=True, context={'request': request}).data
+        }
+    
+    def empty_section(self, timed_out=False):
+        return {
+            'count': 0,
+            'count_capped': False,
+            'timed_out': timed_out,
+            'ids': []
+        }
+    
     def search_posts(self, query):
-        """Busca em posts (título e conteúdo)"""
-        return Post.objects.filter(
-            Q(title__icontains=query) | Q(content__icontains=query)
-        ).annotate(
-            like_count=Count('likes'),
-            comment_count=Count('comments')
-        ).select_related('author').order_by('-created_at')
+        """Busca aproximada em posts (título e conteúdo), ordenada por similaridade"""
+        return fuzzy.search_posts(Post.objects.select_related('author'), query)
     
     def search_users(self, query):
-        """Busca em usuários (username, nome, email)"""
-        return User.objects.filter(
-            Q(username__icontains=query) |
-            Q(first_name__icontains=query) |
-            Q(last_name__icontains=query) |
-            Q(email__icontains=query)
-        ).filter(is_active=True).order_by('-created_datetime')
+        """Busca aproximada em usuários (username, nome, email), ordenada por similaridade"""
+        return fuzzy.search_users(User.objects.filter(is_active=True), query)
     
     def search_comments(self, query):
         """Busca em comentários"""
@@ -90,6 +282,8 @@ class AdvancedPostSearchView(generics.ListAPIView):
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     pagination_class = StandardResultsSetPagination
+    throttle_cost = 3
+    max_results = 1000
     
     def get_queryset(self):
         query = self.request.query_params.get('q', '').strip()
@@ -101,8 +295,8 @@ class AdvancedPostSearchView(generics.ListAPIView):
         queryset = Post.objects.filter(
             Q(title__icontains=query) | Q(content__icontains=query)
         ).annotate(
-            like_count=Count('likes'),
-            comment_count=Count('comments')
+            like_count=post_count_subquery(Like),
+            comment_count=post_count_subquery(Comment)
         ).select_related('author')
         
         # Filtros adicionais
@@ -126,40 +320,106 @@ class AdvancedPostSearchView(generics.ListAPIView):
         
         return queryset
     
+    def list(self, request, *args, **kwargs):
+        """
+        Pagina sobre a lista de ids em cache (até max_results) e carrega
+        apenas os posts da página atual. count_capped indica que havia mais
+        resultados que max_results (count e páginas param no limite)
+        """
+        cache_key = make_cache_key('posts', request.query_params)
+        found = search_cache.get(cache_key)
+        if found is None:
+            ids = list(self.get_queryset().values_list('id', flat=True)[:self.max_results + 1])
+            found = {
+                'ids': ids[:self.max_results],
+                'count_capped': len(ids) > self.max_results,
+            }
+            search_cache.set(cache_key, found)
+        
+        page_ids = self.paginate_queryset(found['ids'])
+        posts = hydrate(Post.objects.select_related('author'), page_ids)
+        serializer = self.get_serializer(posts, many=True)
+        response = self.get_paginated_response(serializer.data)
+        response.data['count_capped'] = found['count_capped']
+        return response
+    
     def get_serializer_context(self):
         return {'request': self.request}
 
 
 class HashtagSearchView(APIView):
     """
-    Busca por hashtags em posts
+    Busca por hashtags em posts (via índice PostHashtag, paginação por cursor)
     GET /api/search/hashtags/?tag=python
     """
     permission_classes = [IsAuthenticatedOrReadOnly]
     
     def get(self, request):
-        tag = request.query_params.get('tag', '').strip().lower()
+        tag = normalize_tag(request.query_params.get('tag', ''))
         
         if not tag:
             return Response({
                 'error': 'Tag é obrigatória'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Buscar posts que contenham #tag
-        hashtag = f'#{tag}'
-        posts = Post.objects.filter(
-            Q(title__icontains=hashtag) | Q(content__icontains=hashtag)
-        ).annotate(
-            like_count=Count('likes'),
-            comment_count=Count('comments')
-        ).select_related('author').order_by('-created_at')
+        paginator = HashtagCursorPagination()
+        cache_key = make_cache_key('hashtags', request.query_params, exclude=())
+        page = search_cache.get(cache_key)
+        if page is None:
+            # Join indexado: Hashtag.name (unique) -> PostHashtag (hashtag, -created_at)
+            posts = Post.objects.filter(
+                post_hashtags__hashtag__name=tag
+            ).annotate(
+                tagged_at=F('post_hashtags__created_at')
+            ).select_related('author')
+            
+            paginated_posts = paginator.paginate_queryset(posts, request, view=self)
+            # Só os cursores: os links são montados por requisição (host/esquema variam)
+            param = paginator.cursor_query_param
+            page = {
+                'ids': [post.pk for post in paginated_posts],
+                'next': cursor_value(paginator.get_next_link(), param),
+                'previous': cursor_value(paginator.get_previous_link(), param),
+            }
+            search_cache.set(cache_key, page)
         
-        paginator = StandardResultsSetPagination()
-        paginated_posts = paginator.paginate_queryset(posts, request)
+        posts = hydrate(Post.objects.select_related('author'), page['ids'])
+        serializer = PostSerializer(posts, many=True, context={'request': request})
         
-        serializer = PostSerializer(paginated_posts, many=True, context={'request': request})
+        return Response(OrderedDict([
+            ('next', cursor_link(request, paginator.cursor_query_param, page['next'])),
+            ('previous', cursor_link(request, paginator.cursor_query_param, page['previous'])),
+            ('results', serializer.data)
+        ]))
+
+
+class TrendingHashtagsView(APIView):
+    """
+    Hashtags em alta, servidas do ranking pré-calculado
+    GET /api/search/hashtags/trending/?window=1h|24h|7d
+    """
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    
+    def get(self, request):
+        window = request.query_params.get('window', '24h')
         
-        return paginator.get_paginated_response(serializer.data)
+        if window not in TRENDING_WINDOWS:
+            return Response({
+                'error': f'Janela inválida. Use: {", ".join(TRENDING_WINDOWS)}'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        trends = list(
+            HashtagTrend.objects.filter(window=window).select_related('hashtag')
+        )
+        
+        return Response({
+            'window': window,
+            'computed_at': trends[0].computed_at if trends else None,
+            'results': [
+                {'tag': trend.hashtag.name, 'count': trend.count}
+                for trend in trends
+            ]
+        })
 
 
 class SuggestionsView(APIView):
@@ -175,21 +435,36 @@ class SuggestionsView(APIView):
         if not query or len(query) < 2:
             return Response({'suggestions': []})
         
-        # Buscar títulos de posts que começam com o termo
-        post_titles = Post.objects.filter(
-            title__istartswith=query
-        ).values_list('title', flat=True)[:5]
-        
-        # Buscar usernames que começam com o termo
-        usernames = User.objects.filter(
-            username__istartswith=query,
-            is_active=True
-        ).values_list('username', flat=True)[:5]
-        
-        # Combinar sugestões
-        suggestions = list(set(list(post_titles) + [f'@{u}' for u in usernames]))
+        cache_key = make_cache_key('suggestions', {'q': query})
+        suggestions = search_cache.get(cache_key)
+        if suggestions is None:
+            # Buscar títulos de posts que começam com o termo
+            post_titles = Post.objects.filter(
+                title__istartswith=query
+            ).values_list('title', flat=True)[:5]
+            
+            # Buscar usernames que começam com o termo
+            usernames = User.objects.filter(
+                username__istartswith=query,
+                is_active=True
+            ).values_list('username', flat=True)[:5]
+            
+            # Combinar sugestões
+            suggestions = list(set(list(post_titles) + [f'@{u}' for u in usernames]))[:10]
+            search_cache.set(cache_key, suggestions)
         
         return Response({
             'query': query,
-            'suggestions': suggestions[:10]
-        })
\ No newline at end of file
+            'suggestions': suggestions
+        })
+
+
+class SearchCacheStatsView(APIView):
+    """
+    Estatísticas do cache de busca deste processo (apenas admin)
+    GET /api/search/cache-stats/
+    """
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        return Response(search_cache.stats())
@@ -1,6 +1,10 @@
-from rest_framework import serializers
+import os
 from django.contrib.auth import authenticate
-from CodeLabTest.models import User, Post, Like, Comment, Notification
+from rest_framework import serializers
+from CodeLabTest.models import User, Follow, Post, Like, Comment, Notification, UploadSession
+from CodeLabTest.images import srcset
+from CodeLabTest.hashing import password_hasher
+from CodeLabTest.uploads import TARGET_MAX_SIZE
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=8, style={'input_type': 'password'})
@@ -21,7 +25,12 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         validated_data.pop('password_confirm')
-        user = User.objects.create_user(**validated_data)
+        password = validated_data.pop('password')
+        validated_data['email'] = User.objects.normalize_email(validated_data['email'])
+        user = User(**validated_data)
+        # Hash no executor limitado (503 com Retry-After quando saturado)
+        password_hasher.set_password(user, password)
+        user.save()
         return user
 
 class UserLoginSerializer(serializers.Serializer):
@@ -33,7 +42,9 @@ class UserLoginSerializer(serializers.Serializer):
         password = data.get('password')
         
         if username and password:
-            user = authenticate(username=username, password=password)
+            # Backends configurados e sinal user_login_failed; só o hash vai para o executor
+            with password_hasher.offload():
+                user = authenticate(self.context.get('request'), username=username, password=password)
             
             if not user:
                 raise serializers.ValidationError('Credenciais inválidas')
@@ -47,17 +58,44 @@ class UserLoginSerializer(serializers.Serializer):
         
         return data
 
+class UserListSerializer(serializers.ListSerializer):
+    """
+    Resolve "quem da lista eu sigo" em uma única query antes de serializar
+    """
+    def to_representation(self, data):
+        users = list(data.all() if hasattr(data, 'all') else data)
+        request = self.context.get('request')
+        user = getattr(request, 'user', None)
+        self.context['followed_ids'] = Follow.followed_ids(user, [u.pk for u in users])
+        return super().to_representation(users)
+
 class UserSerializer(serializers.ModelSerializer):
     full_name = serializers.CharField(source='get_full_name', read_only=True)
-    post_count = serializers.IntegerField(source='posts.count', read_only=True)
-    comment_count = serializers.IntegerField(source='comments.count', read_only=True)
     avatar_url = serializers.SerializerMethodField()
+    avatar_srcset = serializers.SerializerMethodField()
+    is_following = serializers.SerializerMethodField()
     
     class Meta:
         model = User
+        list_serializer_class = UserListSerializer
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'full_name', 'bio',
-                  'avatar', 'avatar_url', 'created_datetime', 'post_count', 'comment_count']
-        read_only_fields = ['id', 'created_datetime']
+                  'avatar', 'avatar_url', 'avatar_srcset', 'avatar_width', 'avatar_height',
+                  'avatar_placeholder', 'created_datetime', 'post_count', 'comment_count',
+                  'likes_given_count', 'likes_received_count', 'follower_count',
+                  'following_count', 'is_following']
+        read_only_fields = ['id', 'created_datetime', 'post_count', 'comment_count',
+                            'likes_given_count', 'likes_received_count', 'follower_count',
+                            'following_count', 'avatar_width', 'avatar_height',
+                            'avatar_placeholder']
+    
+    def get_is_following(self, obj):
+        followed_ids = self.context.get('followed_ids')
+        if followed_ids is not None:
+            return obj.pk in followed_ids
+        request = self.context.get('request')
+        if request and request.user.is_authenticated and request.user.pk != obj.pk:
+            return obj.pk in Follow.followed_ids(request.user, [obj.pk])
+        return False
     
     def get_avatar_url(self, obj):
         if obj.avatar:
@@ -65,8 +103,24 @@ class UserSerializer(serializers.ModelSerializer):
             if request:
                 return request.build_absolute_uri(obj.avatar.url)
         return None
+    
+    def get_avatar_srcset(self, obj):
+        return srcset(obj.avatar, obj.avatar_renditions, self.context.get('request'))
+
+class UpdateFieldsMixin:
+    """
+    Grava só os campos enviados (save(update_fields=...)). A instância é o
+    request.user, que pode vir do cache da autenticação: um save() completo
+    sobrescreveria os contadores atualizados por F() desde então.
+    """
+
+    def update(self, instance, validated_data):
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=list(validated_data))
+        return instance
 
-class UserUpdateSerializer(serializers.ModelSerializer):
+class UserUpdateSerializer(UpdateFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['first_name', 'last_name', 'email', 'bio']
@@ -74,7 +128,7 @@ class UserUpdateSerializer(serializers.ModelSerializer):
             'email': {'required': False},
         }
 
-class AvatarUploadSerializer(serializers.ModelSerializer):
+class AvatarUploadSerializer(UpdateFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['avatar']
@@ -103,7 +157,7 @@ class ChangePasswordSerializer(serializers.Serializer):
     
     def validate_old_password(self, value):
         user = self.context['request'].user
-        if not user.check_password(value):
+        if not password_hasher.check_password(user, value):
             raise serializers.ValidationError('Senha atual incorreta')
         return value
 
@@ -113,14 +167,17 @@ class PostSerializer(serializers.ModelSerializer):
     is_liked = serializers.SerializerMethodField()
     author_name = serializers.CharField(source='author.username', read_only=True)
     image_url = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
     
     class Meta:
         model = Post
         fields = [
             'id', 'author', 'author_name', 'title', 'content', 'image', 'image_url',
+            'image_srcset', 'image_width', 'image_height', 'image_placeholder',
             'created_at', 'updated_at', 'like_count', 'comment_count', 'is_liked'
         ]
-        read_only_fields = ['author', 'created_at', 'updated_at']
+        read_only_fields = ['author', 'created_at', 'updated_at', 'image_width',
+                            'image_height', 'image_placeholder']
 
     def get_is_liked(self, obj):
         request = self.context.get('request')
@@ -135,6 +192,9 @@ class PostSerializer(serializers.ModelSerializer):
                 return request.build_absolute_uri(obj.image.url)
         return None
     
+    def get_image_srcset(self, obj):
+        return srcset(obj.image, obj.image_renditions, self.context.get('request'))
+    
     def validate_image(self, value):
         if value:
             # Validar tamanho do arquivo (máximo 5MB)
@@ -148,6 +208,37 @@ class PostSerializer(serializers.ModelSerializer):
         
         return value
 
+class UploadSessionSerializer(serializers.ModelSerializer):
+    """
+    Sessão de upload em partes: criada com destino, nome e tamanho total;
+    o offset mostra de onde o cliente deve continuar
+    """
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'target', 'post', 'filename', 'size', 'offset', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'offset', 'created_at', 'updated_at']
+
+    def validate_filename(self, value):
+        if os.path.splitext(value)[1].lower() not in ('.jpg', '.jpeg', '.png', '.webp'):
+            raise serializers.ValidationError('Apenas arquivos JPEG, PNG e WebP são permitidos')
+        return value
+
+    def validate(self, attrs):
+        target, post = attrs['target'], attrs.get('post')
+        if target == 'post_image':
+            if post is None:
+                raise serializers.ValidationError({'post': 'Informe o post que receberá a imagem'})
+            if post.author_id != self.context['request'].user.id:
+                raise serializers.ValidationError({'post': 'Você não pode editar posts de outros usuários'})
+        elif post is not None:
+            raise serializers.ValidationError({'post': 'Avatares não pertencem a um post'})
+
+        limit = TARGET_MAX_SIZE[target]
+        if not 0 < attrs['size'] <= limit:
+            raise serializers.ValidationError({'size': f'O arquivo deve ter até {limit // (1024 * 1024)}MB'})
+        return attrs
+
 class CommentSerializer(serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.username', read_only=True)
     reply_count = serializers.IntegerField(read_only=True)
@@ -186,7 +277,7 @@ class LikeSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Like
-        fields = ['id', 'user', 'user_name', 'post', 'post_title', 'created_at']
+        fields = ['user', 'user_name', 'post', 'post_title', 'created_at']
         read_only_fields = ['user', 'created_at']
 
 class NotificationSerializer(serializers.ModelSerializer):
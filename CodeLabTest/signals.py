@@ -0,0 +1,193 @@
+# CodeLabTest/signals.py
+
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from CodeLabTest.models import User, Follow, Post, Comment, Like, SuggestionRefresh
+from CodeLabTest.media import release_field
+from CodeLabTest.authentication import invalidate_user
+from CodeLabTest.fuzzy import post_index, user_index
+
+# Sinais (e não save/delete dos modelos) porque também disparam em deletes
+# em cascata, por exemplo os comentários de um post removido. Likes e
+# follows não têm sinais de delete: ficam no fast-delete do Django e são
+# contados por grouped_counters
+
+_deletion = threading.local()
+
+
+def adjust_counter(users, field, delta):
+    """
+    Soma delta ao contador de atividade dos usuários com um UPDATE atômico,
+    sem deixar o contador negativo. O UPDATE não passa por User.save(), então
+    as linhas em cache da autenticação são invalidadas aqui.
+    """
+    user_ids = list(users.values_list('pk', flat=True))
+    if delta < 0:
+        users = users.filter(**{f'{field}__gte': -delta})
+    users.update(**{field: F(field) + delta})
+    # Só depois do commit: antes disso outra requisição recarregaria a linha antiga
+    transaction.on_commit(lambda: [invalidate_user(pk) for pk in user_ids])
+
+
+class CounterDeltas:
+    """Variações dos contadores de atividade de um delete, por contador e usuário"""
+
+    def __init__(self):
+        self.deltas = defaultdict(lambda: defaultdict(int))
+        # Usuários com likes ou comentários removidos (SuggestionRefresh)
+        self.refresh = set()
+
+    def add(self, field, user_id, delta):
+        self.deltas[field][user_id] += delta
+
+    def add_grouped(self, rows, group, field):
+        """Desconta de cada usuário as linhas de `rows` dele (um GROUP BY); retorna os usuários"""
+        counts = rows.order_by().values_list(group).annotate(n=Count('*'))
+        for user_id, n in counts:
+            self.add(field, user_id, -n)
+        return {user_id for user_id, _ in counts}
+
+    def apply(self):
+        """Um UPDATE por contador e valor da variação, sem deixar o contador negativo"""
+        user_ids = set()
+        for field, per_user in self.deltas.items():
+            by_delta = defaultdict(list)
+            for user_id, delta in per_user.items():
+                if delta:
+                    by_delta[delta].append(user_id)
+            for delta, ids in by_delta.items():
+                User.objects.filter(pk__in=ids).update(**{field: Greatest(F(field) + delta, 0)})
+                user_ids.update(ids)
+        if self.refresh:
+            # A execução incremental só enxerga interações novas; remoções ficam marcadas
+            SuggestionRefresh.objects.bulk_create(
+                [SuggestionRefresh(user_id=pk) for pk in self.refresh], ignore_conflicts=True
+            )
+        transaction.on_commit(lambda: [invalidate_user(pk) for pk in user_ids])
+
+
+@contextmanager
+def grouped_counters(queryset=None, instance=None):
+    """
+    Envolve um delete (QuerySet.delete e Model.delete de CodeLabTest.models)
+    e aplica as variações dos contadores no fim, na mesma transação. O que a
+    cascata apaga sem carregar (likes, follows) é contado antes com GROUP BY;
+    posts e comentários já são carregados pela cascata e anotam a sua parte
+    em pre_delete, sem query. Deletes aninhados usam o acumulador do externo.
+    """
+    deltas = getattr(_deletion, 'deltas', None)
+    if deltas is not None:
+        count_cascade(deltas, queryset, instance)
+        yield deltas
+        return
+
+    _deletion.deltas = deltas = CounterDeltas()
+    try:
+        with transaction.atomic():
+            count_cascade(deltas, queryset, instance)
+            yield deltas
+            deltas.apply()
+    finally:
+        _deletion.deltas = None
+
+
+def count_cascade(deltas, queryset, instance):
+    """Conta os likes e follows que o delete de `queryset` ou `instance` vai apagar"""
+    if instance is not None:
+        model, rows = type(instance), Q(pk=instance.pk)
+    elif queryset is not None:
+        model, rows = queryset.model, Q(pk__in=queryset.values('pk'))
+    else:
+        return
+
+    if model is Like and instance is not None:
+        deltas.add('likes_given_count', instance.user_id, -1)
+        deltas.add('likes_received_count', instance.post.author_id, -1)
+        deltas.refresh.add(instance.user_id)
+        return
+    if model is Follow and instance is not None:
+        deltas.add('following_count', instance.follower_id, -1)
+        deltas.add('follower_count', instance.following_id, -1)
+        return
+
+    if model is Like:
+        likes = queryset
+    elif model is Post:
+        likes = Like.objects.filter(post__in=Post.objects.filter(rows))
+    elif model is User:
+        users = User.objects.filter(rows)
+        likes = Like.objects.filter(Q(user__in=users) | Q(post__author__in=users))
+        follows = Follow.objects.filter(Q(follower__in=users) | Q(following__in=users))
+    if model is Follow:
+        follows = queryset
+    if model in (Like, Post, User):
+        deltas.refresh |= deltas.add_grouped(likes, 'user', 'likes_given_count')
+        deltas.add_grouped(likes, 'post__author', 'likes_received_count')
+    if model in (Follow, User):
+        deltas.add_grouped(follows, 'follower', 'following_count')
+        deltas.add_grouped(follows, 'following', 'follower_count')
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance, created, **kwargs):
+    if created:
+        adjust_counter(User.objects.filter(pk=instance.author_id), 'post_count', 1)
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    with grouped_counters() as deltas:
+        deltas.add('post_count', instance.author_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        adjust_counter(User.objects.filter(pk=instance.user_id), 'comment_count', 1)
+
+
+@receiver(pre_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    with grouped_counters() as deltas:
+        deltas.add('comment_count', instance.user_id, -1)
+        deltas.refresh.add(instance.user_id)
+
+
+@receiver(post_save, sender=Like)
+def like_created(sender, instance, created, **kwargs):
+    if created:
+        adjust_counter(User.objects.filter(pk=instance.user_id), 'likes_given_count', 1)
+        adjust_counter(User.objects.filter(posts=instance.post_id), 'likes_received_count', 1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        adjust_counter(User.objects.filter(pk=instance.follower_id), 'following_count', 1)
+        adjust_counter(User.objects.filter(pk=instance.following_id), 'follower_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def post_image_released(sender, instance, **kwargs):
+    release_field(instance, 'image')
+
+
+@receiver(post_delete, sender=User)
+def user_avatar_released(sender, instance, **kwargs):
+    release_field(instance, 'avatar')
+
+
+@receiver(post_delete, sender=Post)
+def post_unindexed(sender, instance, **kwargs):
+    post_index.remove(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def user_unindexed(sender, instance, **kwargs):
+    user_index.remove(instance.pk)
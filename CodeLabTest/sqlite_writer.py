@@ -0,0 +1,104 @@
+# CodeLabTest/sqlite_writer.py
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+
+class SingleWriter:
+    """
+    Uma thread com conexão própria executa as escritas enviadas pelas demais:
+    no SQLite só um escritor avança por vez, então em vez de várias threads
+    disputando o lock (e esperando o busy_timeout), as operações entram numa
+    fila e são gravadas em lotes, um commit (um fsync do WAL) por lote.
+
+    Cada operação roda num savepoint: se uma falhar, só ela recebe a exceção
+    e o resto do lote é gravado. Os resultados só são entregues após o commit.
+
+    A fila é do processo: com vários workers cada um tem a sua e elas ainda
+    disputam o lock entre si (benchmarks/sqlite_write_benchmark.py --processes).
+    """
+
+    def __init__(self, batch_size, max_wait):
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.batches = 0
+        self.operations = 0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name='sqlite-writer', daemon=True)
+                self._thread.start()
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        self._ensure_thread()
+        self._queue.put((fn, args, kwargs, future))
+        return future
+
+    def run(self, fn, *args, **kwargs):
+        """Executa pela fila e espera o commit; dentro da própria thread roda direto"""
+        if threading.current_thread() is self._thread:
+            return fn(*args, **kwargs)
+        return self.submit(fn, *args, **kwargs).result()
+
+    def _next_batch(self):
+        jobs = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(jobs) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                jobs.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return jobs
+
+    def _loop(self):
+        while True:
+            jobs = [job for job in self._next_batch() if job[3].set_running_or_notify_cancel()]
+            outcomes = []
+            try:
+                with transaction.atomic():
+                    for fn, args, kwargs, future in jobs:
+                        try:
+                            with transaction.atomic():
+                                outcomes.append((future, fn(*args, **kwargs), None))
+                        except Exception as exc:
+                            outcomes.append((future, None, exc))
+            except Exception as exc:
+                # Commit falhou: nada do lote foi gravado
+                outcomes = [(future, None, exc) for *_, future in jobs]
+            finally:
+                close_old_connections()
+
+            self.batches += 1
+            self.operations += len(jobs)
+            for future, result, exc in outcomes:
+                if exc is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(exc)
+
+
+sqlite_writer = SingleWriter(
+    batch_size=settings.SQLITE_WRITER['BATCH_SIZE'],
+    max_wait=settings.SQLITE_WRITER['MAX_WAIT']
+)
+
+
+def serialized_write(fn, *args, **kwargs):
+    """
+    Escrita autônoma (fora de transação) pela fila de escrita no perfil
+    SQLite; nos demais casos roda direto. Dentro de uma transação sempre
+    roda direto: a fila usa outra conexão e esperaria o lock desta.
+    """
+    if not settings.SQLITE_WRITER['ENABLED'] or connection.in_atomic_block:
+        return fn(*args, **kwargs)
+    return sqlite_writer.run(fn, *args, **kwargs)
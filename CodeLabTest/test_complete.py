@@ -1,10 +1,39 @@
 # CodeLabTest/tests_complete.py
 
-from django.test import TestCase
-from rest_framework.test import APITestCase, APIClient
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+from datetime import timedelta
+import os
+import tempfile
+from io import StringIO
+from django.contrib.auth import authenticate
+from django.contrib.auth.signals import user_login_failed
+from django.core.cache import cache
+from django.core.management import call_command
+from types import SimpleNamespace
+from unittest.mock import patch
+from django.utils import timezone
+from django.test import TestCase, SimpleTestCase, TransactionTestCase, RequestFactory, override_settings
+from rest_framework.test import APITestCase, APIClient, APIRequestFactory
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken, BlacklistedToken
 from rest_framework import status
 from django.urls import reverse
-from CodeLabTest.models import User, Post, Like, Comment, Notification
+from django.http import HttpResponse
+from CodeLabTest.models import User, Post, Like, Comment, Notification, Hashtag
+from CodeLabTest.authentication import CachedJWTAuthentication, token_cache, user_cache
+from CodeLabTest.tokens import BlacklistFilter, BloomFilter, RefreshToken, blacklist_filter
+from CodeLabTest.hashing import PENDING_KEY, PasswordHashExecutor
+from CodeLabTest.throttling import UserRateThrottle, SQLiteThrottleStore, CostRateThrottle, cost_meter, endpoint_name
+from CodeLabTest.checks import check_throttle_store
+from CodeLabTest.routers import ReplicaRouter, ReplicaRoutingMiddleware, STICKY_COOKIE, pinned_reads, replica_health
+from CodeLabTest.dbpool import pool_stats
+from CodeLabTest.sqlite_writer import SingleWriter
+from CodeLabTest.ids import uuid7, uuid7_datetime
+from CodeLabTest.management.commands.rebuild_like_table import Command as RebuildLikeTable
+from django.db import connection, connections, models
+from django.test.utils import isolate_apps
 import uuid
 
 class AuthenticationTests(APITestCase):
@@ -117,6 +146,7 @@ class LikeTests(APITestCase):
     """Testes de likes"""
     
     def setUp(self):
+        cache.clear()
         self.user1 = User.objects.create_user(
             username='user1',
             email='user1@example.com',
@@ -155,6 +185,21 @@ class LikeTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(self.post.likes.count(), 0)
 
+    def test_list_likes_by_post_and_user(self):
+        """Teste de listagem de likes filtrada pela chave composta e pelo índice reverso"""
+        other = Post.objects.create(author=self.user1, title='Other', content='Content')
+        Like.objects.create(user=self.user2, post=self.post)
+        Like.objects.create(user=self.user1, post=self.post)
+        Like.objects.create(user=self.user2, post=other)
+
+        response = self.client.get('/api/likes/', {'post': self.post.id})
+        self.assertEqual([like['user'] for like in response.data['results']], [self.user1.id, self.user2.id])
+        self.assertNotIn('id', response.data['results'][0])
+
+        response = self.client.get('/api/likes/', {'user': self.user2.id})
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(self.client.get(f'/api/likes/{self.post.id}/').status_code, status.HTTP_404_NOT_FOUND)
+
 
 class CommentTests(APITestCase):
     """Testes de comentários"""
@@ -323,4 +368,583 @@ class SearchTests(APITestCase):
         """Teste de sugestões"""
         response = self.client.get('/api/search/suggestions/?q=dja')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertIn('suggestions', response.data)
\ No newline at end of file
+        self.assertIn('suggestions', response.data)
+
+
+class CachedAuthenticationTests(APITestCase):
+    """Testes da autenticação JWT com cache de token e usuário"""
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        user_cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='senha@123'
+        )
+        self.access = str(RefreshToken.for_user(self.user).access_token)
+        self.auth = CachedJWTAuthentication()
+
+    def authenticate(self):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        return self.auth.authenticate(request)
+
+    def test_second_request_does_no_query(self):
+        """Teste que token e usuário em cache dispensam queries"""
+        with self.assertNumQueries(1):
+            user, _ = self.authenticate()
+        with self.assertNumQueries(0):
+            cached_user, _ = self.authenticate()
+        self.assertEqual(cached_user, user)
+        self.assertIsNot(cached_user, user)
+
+    def test_deactivation_invalidates_cache(self):
+        """Teste que salvar is_active=False derruba o usuário do cache"""
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_counter_updates_survive_profile_edit(self):
+        """Teste que contadores alterados por F() não são sobrescritos pelo usuário em cache"""
+        self.authenticate()
+        Post.objects.create(author=self.user, title='Post', content='Conteúdo')
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        response = client.patch('/api/auth/profile/update/', {'bio': 'Nova bio'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.post_count, 1)
+        self.assertEqual(self.user.bio, 'Nova bio')
+
+    def test_api_request_with_cached_auth(self):
+        """Teste de requisição autenticada pela API"""
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        response = client.get('/api/notifications/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = client.get('/api/notifications/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class TokenBlacklistTests(APITestCase):
+    """Testes do filtro de Bloom da blacklist e da limpeza de tokens"""
+
+    def setUp(self):
+        cache.clear()
+        blacklist_filter.invalidate()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='senha@123'
+        )
+
+    def test_bloom_filter(self):
+        """Teste de pertinência sem falsos negativos"""
+        bloom = BloomFilter(capacity=100)
+        for i in range(100):
+            bloom.add(f'jti-{i}')
+        self.assertTrue(all(f'jti-{i}' in bloom for i in range(100)))
+        false_positives = sum(f'outro-{i}' in bloom for i in range(1000))
+        self.assertLess(false_positives, 50)
+
+    def test_check_skips_database_when_not_blacklisted(self):
+        """Teste que um token fora da blacklist é verificado sem query"""
+        raw = str(RefreshToken.for_user(self.user))
+        blacklist_filter.might_contain('aquecimento')
+        with self.assertNumQueries(0):
+            RefreshToken(raw)
+
+    def test_rotated_token_cannot_be_reused(self):
+        """Teste que o refresh token rotacionado é rejeitado"""
+        raw = str(RefreshToken.for_user(self.user))
+        response = self.client.post('/api/auth/token/refresh/', {'refresh': raw})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('refresh', response.data)
+
+        response = self.client.post('/api/auth/token/refresh/', {'refresh': raw})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_rotation_is_seen_by_other_workers_before_sync(self):
+        """Teste que outro worker (filtro já sincronizado) rejeita o token rotacionado na hora"""
+        other_worker = BlacklistFilter(error_rate=0.01, sync_interval=3600, rebuild_interval=3600)
+        raw = str(RefreshToken.for_user(self.user))
+        self.assertFalse(other_worker.might_contain(RefreshToken(raw)['jti']))
+
+        response = self.client.post('/api/auth/token/refresh/', {'refresh': raw})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with patch('CodeLabTest.tokens.blacklist_filter', other_worker), self.assertNumQueries(1):
+            with self.assertRaises(TokenError):
+                RefreshToken(raw)
+
+    def test_purge_expired_tokens(self):
+        """Teste que tokens expirados e suas entradas na blacklist são removidos"""
+        expired = OutstandingToken.objects.create(
+            user=self.user, jti='expirado', token='x',
+            expires_at=timezone.now() - timedelta(days=1)
+        )
+        BlacklistedToken.objects.create(token=expired)
+        RefreshToken.for_user(self.user)
+
+        call_command('purge_expired_tokens', batch_size=1, stdout=StringIO())
+        self.assertEqual(OutstandingToken.objects.count(), 1)
+        self.assertEqual(BlacklistedToken.objects.count(), 0)
+
+
+class PasswordHashingTests(APITestCase):
+    """Testes do executor limitado de hashing de senhas"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='senha@123'
+        )
+        self.hasher = PasswordHashExecutor(workers=1, max_pending=1, timeout=5, retry_after=3)
+
+    def test_check_password_runs_in_executor(self):
+        """Teste de verificação de senha pelo executor"""
+        self.assertTrue(self.hasher.check_password(self.user, 'senha@123'))
+        self.assertFalse(self.hasher.check_password(self.user, 'errada'))
+        with self.hasher.offload(), patch.object(self.hasher, 'run', wraps=self.hasher.run) as run:
+            self.assertEqual(authenticate(username='testuser', password='senha@123'), self.user)
+            self.assertIsNone(authenticate(username='ninguem', password='senha@123'))
+        self.assertEqual(run.call_count, 2)
+
+    def test_model_hashing_ignores_executor(self):
+        """Teste que o modelo (admin, comandos) não depende do executor nem responde 503"""
+        self.hasher._slots.acquire()
+        with patch('CodeLabTest.serializers.password_hasher', self.hasher):
+            self.assertTrue(self.user.check_password('senha@123'))
+            self.user.set_password('outra@123')
+            self.assertTrue(self.user.check_password('outra@123'))
+
+    def test_login_rejected_when_saturated(self):
+        """Teste de 503 com Retry-After quando não há vaga no executor"""
+        self.hasher._slots.acquire()
+        with patch('CodeLabTest.serializers.password_hasher', self.hasher):
+            response = self.client.post('/api/auth/login/', {
+                'username': 'testuser',
+                'password': 'senha@123'
+            })
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '3')
+
+        self.hasher._slots.release()
+        with patch('CodeLabTest.serializers.password_hasher', self.hasher):
+            response = self.client.post('/api/auth/login/', {
+                'username': 'testuser',
+                'password': 'senha@123'
+            })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_login_rejected_when_other_workers_fill_queue(self):
+        """Teste que a fila compartilhada entre workers é consultada antes de enviar o hash"""
+        hasher = PasswordHashExecutor(workers=1, max_pending=2, timeout=5, retry_after=3)
+        cache.set(PENDING_KEY, 2)
+        with patch('CodeLabTest.serializers.password_hasher', hasher), \
+                patch.object(hasher._executor, 'submit') as submit:
+            response = self.client.post('/api/auth/login/', {
+                'username': 'testuser',
+                'password': 'senha@123'
+            })
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        submit.assert_not_called()
+        self.assertEqual(cache.get(PENDING_KEY), 2)
+
+    def test_login_uses_auth_backends_and_signals(self):
+        """Teste que o login da API passa por authenticate(): falhas disparam user_login_failed"""
+        failures = []
+
+        def on_failure(sender, credentials, request=None, **kwargs):
+            failures.append((credentials['username'], request))
+
+        user_login_failed.connect(on_failure)
+        try:
+            response = self.client.post('/api/auth/login/', {
+                'username': 'testuser',
+                'password': 'errada'
+            })
+        finally:
+            user_login_failed.disconnect(on_failure)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(failures), 1)
+        self.assertEqual(failures[0][0], 'testuser')
+        self.assertIsNotNone(failures[0][1])
+
+
+class SlidingWindowThrottleTests(APITestCase):
+    """Testes do rate limiting por janela deslizante"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='senha@123'
+        )
+        self.request = APIRequestFactory().get('/')
+        self.request.user = self.user
+
+    def make_throttle(self, now, store=None):
+        throttle_class = type('TestThrottle', (UserRateThrottle,), {'scope': 'test', 'rate': '3/min'})
+        throttle = throttle_class()
+        throttle.timer = lambda: now
+        if store:
+            throttle.get_store = lambda: store
+        return throttle
+
+    def assert_sliding_window(self, store=None):
+        start = 600.0
+        for _ in range(3):
+            self.assertTrue(self.make_throttle(start, store).allow_request(self.request, None))
+        throttle = self.make_throttle(start + 10, store)
+        self.assertFalse(throttle.allow_request(self.request, None))
+        self.assertGreater(throttle.wait(), 0)
+
+        # Metade da janela seguinte: a anterior pesa 1.5, então cabe só mais uma
+        self.assertTrue(self.make_throttle(start + 90, store).allow_request(self.request, None))
+        self.assertFalse(self.make_throttle(start + 90, store).allow_request(self.request, None))
+
+    def test_cache_store(self):
+        """Teste com o store padrão (cache do Django)"""
+        self.assert_sliding_window()
+
+    def test_sqlite_store(self):
+        """Teste com o store em arquivo SQLite compartilhado"""
+        with tempfile.TemporaryDirectory() as directory:
+            store = SQLiteThrottleStore({'PATH': os.path.join(directory, 'throttle.sqlite3')})
+            self.assert_sliding_window(store)
+            store.connection.close()
+
+    def test_deploy_check_rejects_process_local_store(self):
+        """Teste que o check de deploy recusa contadores no LocMemCache"""
+        local = {'BACKEND': 'CodeLabTest.throttling.CacheThrottleStore'}
+        with override_settings(THROTTLE_STORE=local):
+            self.assertEqual([error.id for error in check_throttle_store(None)], ['CodeLabTest.E001'])
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://'}}
+        with override_settings(THROTTLE_STORE=local, CACHES=shared):
+            self.assertEqual(check_throttle_store(None), [])
+        with override_settings(THROTTLE_STORE={'BACKEND': 'CodeLabTest.throttling.SQLiteThrottleStore'}):
+            self.assertEqual(check_throttle_store(None), [])
+
+
+class CostThrottleTests(APITestCase):
+    """Testes do rate limiting ponderado por custo"""
+
+    def setUp(self):
+        cache.clear()
+        cost_meter.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='senha@123'
+        )
+        self.request = APIRequestFactory().get('/')
+        self.request.user = self.user
+
+    def make_throttle(self):
+        throttle_class = type('TestCostThrottle', (CostRateThrottle,), {'rate': '10/min'})
+        return throttle_class()
+
+    def test_declared_costs(self):
+        """Teste de custo fixo, por action e padrão"""
+        throttle = self.make_throttle()
+        self.assertEqual(throttle.get_cost(self.request, SimpleNamespace(throttle_cost=6)), 6)
+        view = SimpleNamespace(throttle_cost={'popular': 4}, action='popular')
+        self.assertEqual(throttle.get_cost(self.request, view), 4)
+        view.action = 'list'
+        self.assertEqual(throttle.get_cost(self.request, view), 1)
+        self.assertEqual(throttle.get_cost(self.request, SimpleNamespace()), 1)
+
+    def test_expensive_requests_share_budget(self):
+        """Teste que requisições caras consomem o orçamento mais rápido"""
+        expensive = SimpleNamespace(throttle_cost=6)
+        cheap = SimpleNamespace(throttle_cost=1)
+        self.assertTrue(self.make_throttle().allow_request(self.request, expensive))
+        self.assertFalse(self.make_throttle().allow_request(self.request, expensive))
+        for _ in range(4):
+            self.assertTrue(self.make_throttle().allow_request(self.request, cheap))
+        self.assertFalse(self.make_throttle().allow_request(self.request, cheap))
+
+    def test_measured_cost(self):
+        """Teste de custo derivado do tempo médio de banco"""
+        response = self.client.get('/api/posts/popular/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNotNone(cost_meter.average('PostViewSet.popular'))
+
+        view = SimpleNamespace(throttle_cost={'popular': 'measured'}, action='popular')
+        cost_meter.record(endpoint_name(view, self.request), 0.1)
+        with self.settings(THROTTLE_COST={'UNIT_MS': 20, 'MAX_COST': 20}):
+            self.assertEqual(self.make_throttle().get_cost(self.request, view), 5)
+
+
+@override_settings(DATABASE_ROUTING={
+    'REPLICAS': ['replica_1', 'replica_2'], 'STICKY_SECONDS': 5,
+    'HEALTH_CHECK_INTERVAL': 10, 'MAX_LAG_SECONDS': 5.0,
+})
+class ReplicaRouterTests(SimpleTestCase):
+    """Testes do roteamento de leituras para réplicas (sem abrir conexões)"""
+
+    def setUp(self):
+        cache.clear()
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+        self.user = SimpleNamespace(pk=1, is_authenticated=True)
+        self.cookies = {}
+        self.healthy = {'replica_1': True, 'replica_2': True}
+        checker = patch.object(replica_health, 'check', side_effect=lambda alias: self.healthy[alias])
+        checker.start()
+        self.addCleanup(checker.stop)
+        replica_health._status.clear()
+
+    def route(self, method='get', user=None, write=False, cookies=None):
+        """Roda uma requisição pelo middleware e devolve o banco da leitura"""
+        request = getattr(self.factory, method)('/api/posts/')
+        request.COOKIES.update(cookies or self.cookies)
+        result = {}
+
+        def view(request):
+            request.user = user
+            if write:
+                self.router.db_for_write(Post)
+            result['db'] = self.router.db_for_read(Post)
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(view)(request)
+        self.cookies.update({name: morsel.value for name, morsel in response.cookies.items()})
+        return result['db']
+
+    def test_safe_reads_use_replicas(self):
+        self.assertIn(self.route(), ('replica_1', 'replica_2'))
+        self.assertEqual(self.route('post'), 'default')
+        # Fora de requisições (comandos, workers) fica no primário
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_sticky_after_write(self):
+        """Teste que o usuário lê do primário logo após escrever"""
+        self.assertEqual(self.route(user=self.user, write=True), 'default')
+        self.assertEqual(self.route(user=self.user), 'default')
+        self.assertIn(self.route(user=SimpleNamespace(pk=2, is_authenticated=True)), ('replica_1', 'replica_2'))
+
+        # A marca vale para qualquer worker que receba o cookie, e só ela
+        forged = {STICKY_COOKIE: '1'}
+        self.assertIn(self.route(user=self.user, cookies=forged), ('replica_1', 'replica_2'))
+        self.cookies.clear()
+        self.assertIn(self.route(user=self.user), ('replica_1', 'replica_2'))
+
+    def test_threads_inherit_request_routing(self):
+        """Teste que threads com contextvars.copy_context() seguem o roteamento da requisição"""
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(executor.shutdown)
+        request = self.factory.get('/api/posts/')
+        result = {}
+
+        def view(request):
+            request.user = self.user
+            result['db'] = executor.submit(contextvars.copy_context().run, self.router.db_for_read, Post).result()
+            # Sem a cópia a thread não vê a requisição e lê do primário
+            result['bare'] = executor.submit(self.router.db_for_read, Post).result()
+            return HttpResponse()
+
+        ReplicaRoutingMiddleware(view)(request)
+        self.assertIn(result['db'], ('replica_1', 'replica_2'))
+        self.assertEqual(result['bare'], 'default')
+
+        with pinned_reads('replica_2'):
+            self.assertEqual(self.router.db_for_read(Post), 'replica_2')
+
+    def test_unhealthy_replicas_are_skipped(self):
+        self.healthy['replica_1'] = False
+        self.assertEqual({self.route() for _ in range(10)}, {'replica_2'})
+
+        # Resultado da verificação reaproveitado dentro do intervalo
+        self.healthy['replica_2'] = False
+        self.assertEqual(self.route(), 'replica_2')
+        replica_health._status.clear()
+        self.assertEqual(self.route(), 'default')
+
+    def test_only_primary_is_migrated(self):
+        self.assertTrue(self.router.allow_migrate('default', 'CodeLabTest'))
+        self.assertFalse(self.router.allow_migrate('replica_1', 'CodeLabTest'))
+
+
+class DatabasePoolStatsTests(APITestCase):
+    """Testes das métricas de conexão com o banco"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password='senha@123', is_staff=True
+        )
+        self.client = APIClient()
+
+    def test_requires_admin(self):
+        user = User.objects.create_user(username='comum', email='comum@example.com', password='senha@123')
+        self.client.force_authenticate(user=user)
+        response = self.client.get('/api/internal/db-pool/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_persistent_connection_stats(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get('/api/internal/db-pool/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        default = response.data['databases'][0]
+        self.assertEqual(default['alias'], 'default')
+        self.assertIn(default['mode'], ('persistent', 'per_request'))
+
+    def test_native_pool_stats(self):
+        """Teste do cálculo a partir das estatísticas do psycopg_pool"""
+        pool = SimpleNamespace(get_stats=lambda: {
+            'pool_min': 2, 'pool_max': 10, 'pool_size': 6, 'pool_available': 2,
+            'requests_waiting': 3, 'requests_num': 40, 'requests_wait_ms': 100, 'requests_errors': 1,
+        })
+        with patch.object(connections['default'], 'pool', pool, create=True):
+            stats = pool_stats('default')
+        self.assertEqual(stats['mode'], 'pool')
+        self.assertEqual((stats['in_use'], stats['waiting'], stats['wait_ms_avg']), (4, 3, 2.5))
+
+
+class SingleWriterTests(TransactionTestCase):
+    """Testes da fila de escrita única (lotes com um commit cada)"""
+
+    def test_batches_and_isolates_failures(self):
+        writer = SingleWriter(batch_size=50, max_wait=0.2)
+
+        def fail():
+            Hashtag.objects.create(name='falhou')
+            raise ValueError('falhou')
+
+        futures = [writer.submit(Hashtag.objects.create, name=f'tag{i}') for i in range(20)]
+        failed = writer.submit(fail)
+        self.assertEqual([f.result(timeout=10).name for f in futures], [f'tag{i}' for i in range(20)])
+        with self.assertRaises(ValueError):
+            failed.result(timeout=10)
+
+        self.assertEqual(Hashtag.objects.count(), 20)
+        self.assertEqual(writer.operations, 21)
+        self.assertLessEqual(writer.batches, 2)
+
+
+
+class UUID7Tests(APITestCase):
+    """Testes das chaves primárias ordenadas no tempo (uuid7)"""
+
+    def test_uuid7_is_monotonic_and_carries_time(self):
+        before = timezone.now()
+        ids = [uuid7() for _ in range(1000)]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), 1000)
+        self.assertTrue(all(value.version == 7 and value.variant == uuid.RFC_4122 for value in ids))
+        self.assertLess(abs(uuid7_datetime(ids[0]) - before), timedelta(seconds=1))
+        self.assertIsNone(uuid7_datetime(uuid.uuid4()))
+
+    def test_new_rows_use_uuid7_alongside_legacy_ids(self):
+        user = User.objects.create_user(username='u7', email='u7@example.com', password='senha@123')
+        legacy = Post.objects.create(id=uuid.uuid4(), author=user, title='Antigo', content='x')
+        first = Post.objects.create(author=user, title='Primeiro', content='x')
+        second = Post.objects.create(author=user, title='Segundo', content='x')
+        comment = Comment.objects.create(user=user, post=first, content='x')
+        notification = Notification.objects.create(recipient=user, notification_type='like', message='x')
+
+        self.assertEqual({first.pk.version, second.pk.version, comment.pk.version, notification.pk.version}, {7})
+        self.assertLess(first.pk, second.pk)
+        self.assertEqual(Post.objects.get(pk=legacy.pk).title, 'Antigo')
+        self.client.force_authenticate(user=user)
+        self.assertEqual(self.client.get(f'/api/posts/{legacy.pk}/').status_code, status.HTTP_200_OK)
+
+
+class RebuildLikeTableTests(TransactionTestCase):
+    """Testes da conversão da tabela de likes antiga (id) para a chave composta"""
+
+    def create_legacy_table(self):
+        """Troca a tabela de likes pela versão antiga (id substituto); chamar dentro de isolate_apps"""
+        class LegacyLike(models.Model):
+            post_id = models.UUIDField()
+            user_id = models.BigIntegerField()
+            created_at = models.DateTimeField()
+
+            class Meta:
+                app_label = 'CodeLabTest'
+                db_table = Like._meta.db_table
+                unique_together = ('user_id', 'post_id')
+
+        with connection.schema_editor() as schema_editor:
+            schema_editor.delete_model(Like)
+            schema_editor.create_model(LegacyLike)
+        return LegacyLike
+
+    @isolate_apps('CodeLabTest')
+    def test_rebuilds_legacy_table_in_batches(self):
+        LegacyLike = self.create_legacy_table()
+        users = [User.objects.create_user(username=f'fan{i}', email=f'fan{i}@example.com', password='senha@123')
+                 for i in range(3)]
+        posts = [Post.objects.create(author=users[0], title=f'Post {i}', content='x') for i in range(2)]
+        LegacyLike.objects.bulk_create([
+            LegacyLike(post_id=post.pk, user_id=user.pk, created_at=timezone.now())
+            for user in users for post in posts if (user, post) != (users[1], posts[0])
+        ])
+        # O código novo já funciona sobre a tabela antiga (deploy antes da conversão)
+        Like.objects.create(user=users[1], post=posts[0])
+        self.assertEqual(posts[0].likes.count(), 3)
+        Like.objects.filter(user=users[2], post=posts[1]).delete()
+
+        out = StringIO()
+        call_command('rebuild_like_table', batch_size=2, stdout=out)
+        self.assertIn('swapped in', out.getvalue())
+
+        with connection.cursor() as cursor:
+            columns = {c.name for c in connection.introspection.get_table_description(cursor, Like._meta.db_table)}
+            constraints = connection.introspection.get_constraints(cursor, Like._meta.db_table)
+        self.assertNotIn('id', columns)
+        self.assertEqual(
+            {c['columns'][0] for c in constraints.values() if c['foreign_key']}, {'post_id', 'user_id'}
+        )
+        tables = connection.introspection.table_names()
+        self.assertNotIn(f'{Like._meta.db_table}_new', tables)
+        self.assertNotIn(f'{Like._meta.db_table}_old', tables)
+        self.assertEqual(Like.objects.count(), 5)
+        self.assertEqual(list(users[0].likes.order_by('post_id').values_list('post', flat=True)),
+                         sorted(post.pk for post in posts))
+
+        call_command('rebuild_like_table', stdout=StringIO())
+        posts[0].delete()
+        self.assertEqual(Like.objects.count(), 2)
+
+    @isolate_apps('CodeLabTest')
+    def test_swap_applies_only_changes_since_backfill(self):
+        """Teste que a passada travada aplica inserções e remoções feitas durante a cópia, sem varrer a tabela"""
+        LegacyLike = self.create_legacy_table()
+        users = [User.objects.create_user(username=f'fan{i}', email=f'fan{i}@example.com', password='senha@123')
+                 for i in range(3)]
+        post = Post.objects.create(author=users[0], title='Post', content='x')
+        for pk, user in enumerate(users[:2], start=10):
+            LegacyLike.objects.create(pk=pk, post_id=post.pk, user_id=user.pk, created_at=timezone.now())
+
+        swap = RebuildLikeTable.swap
+
+        def swap_after_writes(command, *args):
+            # Escritas entre a cópia e a troca: um like removido, um removido e refeito, um novo
+            # com id abaixo do maior copiado (id reservado antes, commit depois da cópia)
+            LegacyLike.objects.filter(user_id=users[0].pk).delete()
+            LegacyLike.objects.filter(user_id=users[1].pk).delete()
+            LegacyLike.objects.create(post_id=post.pk, user_id=users[1].pk, created_at=timezone.now())
+            LegacyLike.objects.create(pk=1, post_id=post.pk, user_id=users[2].pk, created_at=timezone.now())
+            with patch.object(RebuildLikeTable, 'prune_rows', side_effect=AssertionError('full scan')):
+                return swap(command, *args)
+
+        with patch.object(RebuildLikeTable, 'swap', swap_after_writes):
+            call_command('rebuild_like_table', batch_size=1, stdout=StringIO())
+
+        self.assertEqual(set(post.likes.values_list('user_id', flat=True)), {users[1].pk, users[2].pk})
+        tables = connection.introspection.table_names()
+        self.assertNotIn(f'{Like._meta.db_table}_changes', tables)
+        # Sem o trigger, apagar da tabela nova não depende do log removido
+        post.delete()
+        self.assertFalse(Like.objects.exists())
@@ -0,0 +1,508 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest.mock import patch
+from PIL import Image
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase, APIClient
+from rest_framework import status
+from CodeLabTest.models import User, Post, MediaBlob, UploadSession
+from CodeLabTest.images import apply_result, get_pool, process_image, strip_metadata
+from CodeLabTest.media import blob_name
+from CodeLabTest import uploads
+from CodeLabTest.uploads import part_name
+
+
+def make_jpeg(size=(800, 600), orientation=6, name='foto.jpg'):
+    """JPEG com EXIF de orientação (6 = girar 90°) e um campo de câmera"""
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    exif[0x010F] = 'Camera Teste'
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, 'JPEG', exif=exif)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+def stored_content(content):
+    """O conteúdo como fica gravado no blob: sem EXIF (strip_metadata no upload)"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'foto.jpg')
+        with open(path, 'wb') as f:
+            f.write(content)
+        strip_metadata(path)
+        with open(path, 'rb') as f:
+            return f.read()
+
+
+class MediaTestCase(APITestCase):
+    """MEDIA_ROOT temporário e processamento síncrono"""
+
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        overrides = override_settings(
+            MEDIA_ROOT=self.media_root,
+            IMAGE_PROCESSING={'WORKERS': 1, 'SYNC': True}
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='senha@123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create_post(self, image=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/posts/', {
+                'title': 'Com imagem',
+                'content': 'Conteúdo',
+                'image': image or make_jpeg()
+            }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return Post.objects.get(pk=response.data['id'])
+
+
+class ImagePipelineTests(MediaTestCase):
+    """Testes do processamento de imagens (versões, placeholder, EXIF)"""
+
+    def test_upload_generates_renditions(self):
+        """Teste de dimensões (já rotacionadas), versões e placeholder"""
+        post = self.create_post()
+        self.assertEqual((post.image_width, post.image_height), (600, 800))
+        self.assertEqual(set(post.image_renditions['webp']), {'320', '600'})
+        self.assertTrue(post.image_placeholder.startswith('data:image/webp;base64,'))
+        for name in post.image_renditions['jpeg'].values():
+            self.assertTrue(os.path.isfile(os.path.join(self.media_root, name)))
+
+        response = self.client.get(f'/api/posts/{post.id}/')
+        self.assertIn('320w', response.data['image_srcset']['webp'])
+        self.assertEqual(response.data['image_width'], 600)
+
+    def test_exif_is_stripped(self):
+        """Teste que o EXIF sai no upload, antes do hash, e o processamento não regrava o original"""
+        post = Post.objects.create(author=self.user, title='Foto', content='x',
+                                   image=SimpleUploadedFile('foto.jpg', make_jpeg().read()))
+        with open(post.image.path, 'rb') as f:
+            content = f.read()
+        self.assertEqual(post.image.name, blob_name(hashlib.sha256(content).hexdigest(), '.jpg'))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(len(image.getexif()), 0)
+            self.assertEqual(image.size, (600, 800))
+
+        process_image(self.media_root, post.image.name, (64,))
+        with open(post.image.path, 'rb') as f:
+            self.assertEqual(f.read(), content)
+
+    def test_replacing_image_deletes_old_renditions(self):
+        """Teste que trocar a imagem remove as versões antigas"""
+        post = self.create_post()
+        old_files = [
+            os.path.join(self.media_root, name) for name in post.image_renditions['webp'].values()
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            post.image = make_jpeg(size=(400, 300), orientation=1)
+            post.save()
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (400, 300))
+        self.assertFalse(any(os.path.exists(path) for path in old_files))
+
+    def test_delete_image_updates_only_image_fields(self):
+        """Teste que remover a imagem grava só a imagem e os metadados"""
+        post = self.create_post()
+        Post.objects.filter(pk=post.pk).update(title='Alterado em outro lugar')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.delete(f'/api/posts/{post.id}/delete-image/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        updates = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "CodeLabTest_post"')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('"title"', updates[0])
+
+        post.refresh_from_db()
+        self.assertEqual(post.title, 'Alterado em outro lugar')
+        self.assertFalse(post.image)
+        self.assertEqual((post.image_width, post.image_height), (None, None))
+        self.assertEqual((post.image_placeholder, post.image_renditions), ('', {}))
+
+    def test_process_pool_worker(self):
+        """Teste do processamento no pool de processos"""
+        name = 'posts/pool.jpg'
+        os.makedirs(os.path.join(self.media_root, 'posts'), exist_ok=True)
+        with open(os.path.join(self.media_root, name), 'wb') as f:
+            f.write(make_jpeg(size=(100, 50), orientation=1).read())
+
+        result = get_pool().submit(process_image, self.media_root, name, (64, 128)).result(timeout=60)
+        self.assertEqual((result['width'], result['height']), (100, 50))
+        self.assertEqual(set(result['renditions']['jpeg']), {'64', '100'})
+
+
+class ContentAddressedMediaTests(MediaTestCase):
+    """Testes da deduplicação por conteúdo e contagem de referências"""
+
+    def setUp(self):
+        super().setUp()
+        self.photo = make_jpeg().read()
+
+    def upload(self, name='foto.jpg'):
+        return self.create_post(SimpleUploadedFile(name, self.photo, content_type='image/jpeg'))
+
+    def test_same_content_is_stored_once(self):
+        """Teste que o mesmo arquivo enviado duas vezes vira um único blob"""
+        first, second = self.upload(), self.upload('outra.jpg')
+        self.assertEqual(first.image.name, second.image.name)
+        stored = stored_content(self.photo)
+        digest = hashlib.sha256(stored).hexdigest()
+        self.assertEqual(first.image.name, blob_name(digest, '.jpg'))
+        self.assertTrue(first.image.name.startswith(f'blobs/{digest[:2]}/{digest[2:4]}/'))
+        blob = MediaBlob.objects.get()
+        self.assertEqual(blob.refcount, 2)
+        self.assertEqual(blob.size, len(stored))
+        self.assertEqual(second.image_renditions, first.image_renditions)
+
+    def test_deleting_reference_keeps_shared_file(self):
+        """Teste que o arquivo só é apagado sem referências"""
+        first, second = self.upload(), self.upload()
+        path = first.image.path
+        renditions = [
+            os.path.join(self.media_root, name) for name in first.image_renditions['webp'].values()
+        ]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/posts/{first.id}/')
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(MediaBlob.objects.get().refcount, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/posts/{second.id}/delete-image/')
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(any(os.path.exists(name) for name in renditions))
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def test_reupload_before_purge_keeps_file(self):
+        """Teste que um upload do mesmo conteúdo antes da remoção dos arquivos os preserva"""
+        post = self.upload()
+        path = post.image.path
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.delete(f'/api/posts/{post.id}/delete-image/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Executa a liberação (purge_blob) e segura a remoção dos arquivos
+        with self.captureOnCommitCallbacks() as file_callbacks:
+            for callback in callbacks:
+                callback()
+        self.assertFalse(MediaBlob.objects.exists())
+        self.assertTrue(os.path.exists(path))
+
+        second = self.upload()
+        self.assertEqual(second.image.path, path)
+        for callback in file_callbacks:
+            callback()
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(MediaBlob.objects.get().refcount, 1)
+
+    def test_cascade_releases_references(self):
+        """Teste que remover o usuário libera as imagens dos posts em cascata"""
+        post = self.upload()
+        path = post.image.path
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(MediaBlob.objects.exists())
+
+    def write_file(self, name, content):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def test_migrate_media_layout(self):
+        """Teste da migração de arquivos antigos e blobs sem subdiretórios"""
+        legacy = Post.objects.create(author=self.user, title='Antigo', content='x', image='posts/1/antigo.jpg')
+        legacy_path = self.write_file(legacy.image.name, self.photo)
+        apply_result(Post, legacy.pk, 'image', legacy.image.name,
+                     process_image(self.media_root, legacy.image.name, (64,)))
+        legacy.refresh_from_db()
+        legacy_rendition = os.path.join(self.media_root, legacy.image_renditions['webp']['64'])
+        # O arquivo antigo ainda tem EXIF: sai ao passar para o armazenamento por conteúdo
+        digest = hashlib.sha256(stored_content(self.photo)).hexdigest()
+
+        other = make_jpeg(size=(300, 200), orientation=1).read()
+        other_digest = hashlib.sha256(other).hexdigest()
+        flat_name = f'blobs/{other_digest}.jpg'
+        flat_path = self.write_file(flat_name, other)
+        MediaBlob.objects.create(sha256=other_digest, name=flat_name, size=len(other), refcount=1)
+        flat = Post.objects.create(author=self.user, title='Plano', content='x', image=flat_name)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('migrate_media_layout', batch_size=1, stdout=io.StringIO())
+
+        legacy.refresh_from_db()
+        flat.refresh_from_db()
+        self.assertEqual(legacy.image.name, blob_name(digest, '.jpg'))
+        self.assertEqual(flat.image.name, blob_name(other_digest, '.jpg'))
+        self.assertTrue(os.path.isfile(legacy.image.path))
+        self.assertTrue(os.path.isfile(flat.image.path))
+        self.assertTrue(os.path.isfile(os.path.join(self.media_root, legacy.image_renditions['webp']['64'])))
+        self.assertFalse(any(os.path.exists(path) for path in (legacy_path, legacy_rendition, flat_path)))
+        self.assertEqual(
+            MediaBlob.objects.get(pk=other_digest).name, flat.image.name
+        )
+        self.assertEqual(MediaBlob.objects.get(name=legacy.image.name).metadata['image']['width'], 600)
+
+        # Rodar de novo não muda nada
+        output = io.StringIO()
+        call_command('migrate_media_layout', stdout=output)
+        self.assertIn('0 blobs sharded, 0 legacy files moved', output.getvalue())
+
+    def test_collect_orphan_media(self):
+        """Teste da coleta de arquivos sem referência, com carência"""
+        post = self.upload()
+        referenced = [post.image.path] + [
+            os.path.join(self.media_root, name)
+            for sizes in post.image_renditions.values() for name in sizes.values()
+        ]
+        orphans = [
+            self.write_file('blobs/00/00/' + '0' * 64 + '.jpg', b'x'),
+            self.write_file('posts/1/antigo.jpg', b'x'),
+            self.write_file('avatars/user_9/antigo_w64.webp', b'x'),
+        ]
+        recent = self.write_file('tmp/upload.jpg', b'x')
+        old = 1_000_000_000
+        for path in referenced + orphans:
+            os.utime(path, (old, old))
+
+        output = io.StringIO()
+        call_command('collect_orphan_media', dry_run=True, stdout=output)
+        self.assertIn('4 unreferenced files found, 3 would be deleted', output.getvalue())
+        self.assertTrue(all(os.path.exists(path) for path in orphans))
+
+        call_command('collect_orphan_media', batch_size=2, stdout=io.StringIO())
+        self.assertFalse(any(os.path.exists(path) for path in orphans))
+        self.assertTrue(all(os.path.exists(path) for path in referenced + [recent]))
+
+
+    def test_collect_purges_unreferenced_blobs(self):
+        """Teste que blobs sem referências só deixam de contar e são apagados depois da carência"""
+        post = self.upload()
+        path, name = post.image.path, post.image.name
+        old = 1_000_000_000
+        os.utime(path, (old, old))
+        # Delete cujo purge após o commit não rodou: a linha fica com refcount 0
+        post.delete()
+        blob = MediaBlob.objects.get(name=name)
+        self.assertEqual(blob.refcount, 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('collect_orphan_media', stdout=io.StringIO())
+        self.assertTrue(os.path.exists(path))
+
+        MediaBlob.objects.filter(name=name).update(released_at=timezone.now() - timedelta(days=2))
+        output = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('collect_orphan_media', stdout=output)
+        self.assertIn('1 unreferenced blobs deleted', output.getvalue())
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+        self.assertFalse(os.path.exists(path))
+
+
+class MediaServingTests(MediaTestCase):
+    """Testes da entrega de mídia (Range, ETag, cache, sendfile)"""
+
+    def setUp(self):
+        super().setUp()
+        self.post = self.create_post()
+        self.url = f'/media/{self.post.image.name}'
+        with open(self.post.image.path, 'rb') as f:
+            self.content = f.read()
+
+    def test_full_response(self):
+        """Teste do arquivo inteiro com cabeçalhos de cache"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_not_modified(self):
+        """Teste de If-None-Match com o ETag"""
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_range(self):
+        """Teste de Range, sufixo, If-Range desatualizado e intervalo inválido"""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b''.join(response.streaming_content), self.content[10:20])
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.content)}')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-5')
+        self.assertEqual(b''.join(response.streaming_content), self.content[-5:])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"velho"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+
+    def test_proxy_offload(self):
+        """Teste de X-Accel-Redirect e X-Sendfile"""
+        serving = {'SENDFILE': 'x-accel-redirect', 'ACCEL_PREFIX': '/protected/', 'MAX_AGE': 60}
+        with self.settings(MEDIA_SERVING=serving):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected/{self.post.image.name}')
+        self.assertEqual(response.content, b'')
+
+        with self.settings(MEDIA_SERVING={**serving, 'SENDFILE': 'x-sendfile'}):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'], self.post.image.path)
+
+    def test_unserved_paths(self):
+        """Teste que tmp/ e caminhos fora do MEDIA_ROOT dão 404"""
+        os.makedirs(os.path.join(self.media_root, 'tmp'), exist_ok=True)
+        with open(os.path.join(self.media_root, 'tmp', 'x.jpg'), 'wb') as f:
+            f.write(b'x')
+        for url in ('/media/tmp/x.jpg', '/media/posts/../../etc/passwd', '/media/blobs/nada.jpg'):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ChunkedUploadTests(MediaTestCase):
+    """Testes do upload retomável em partes"""
+
+    def setUp(self):
+        super().setUp()
+        self.post = Post.objects.create(author=self.user, title='Post', content='Conteúdo')
+        self.photo = make_jpeg().read()
+
+    def start(self, **data):
+        data = {'target': 'post_image', 'post': self.post.id, 'filename': 'foto.jpg',
+                'size': len(self.photo), **data}
+        return self.client.post('/api/uploads/', data, format='json')
+
+    def send(self, session_id, offset, data):
+        return self.client.patch(
+            f'/api/uploads/{session_id}/', data,
+            content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    def test_resumable_post_image(self):
+        """Teste do envio em duas partes, retomada pelo offset e finalização"""
+        session_id = self.start().data['id']
+        half = len(self.photo) // 2
+        self.assertEqual(self.send(session_id, 0, self.photo[:half]).data['offset'], half)
+
+        response = self.client.get(f'/api/uploads/{session_id}/')
+        self.assertEqual(response['Upload-Offset'], str(half))
+
+        response = self.send(session_id, 0, self.photo[:half])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['offset'], half)
+
+        self.assertEqual(
+            self.client.post(f'/api/uploads/{session_id}/finalize/').status_code, status.HTTP_409_CONFLICT
+        )
+        self.send(session_id, half, self.photo[half:])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/uploads/{session_id}/finalize/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.image.name, blob_name(hashlib.sha256(stored_content(self.photo)).hexdigest(), '.jpg'))
+        self.assertEqual(self.post.image_width, 600)
+        self.assertFalse(os.listdir(os.path.join(self.media_root, 'tmp', 'uploads')))
+        self.assertEqual(self.client.get(f'/api/uploads/{session_id}/').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_avatar(self):
+        """Teste do upload do avatar em uma parte"""
+        session_id = self.start(target='avatar', post=None).data['id']
+        self.send(session_id, 0, self.photo)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/uploads/{session_id}/finalize/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.avatar.name.startswith('blobs/'))
+
+    def test_missing_part_restarts_upload(self):
+        """Teste que sem o arquivo temporário o offset volta a zero com 409"""
+        session_id = self.start().data['id']
+        half = len(self.photo) // 2
+        self.send(session_id, 0, self.photo[:half])
+        os.remove(os.path.join(self.media_root, part_name(session_id)))
+
+        response = self.send(session_id, half, self.photo[half:])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response['Upload-Offset'], '0')
+        self.assertEqual(self.client.get(f'/api/uploads/{session_id}/')['Upload-Offset'], '0')
+
+        self.assertEqual(self.send(session_id, 0, self.photo).data['offset'], len(self.photo))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/api/uploads/{session_id}/finalize/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_concurrent_part_loses_compare_and_swap(self):
+        """Teste que a parte que termina depois de outra no mesmo offset recebe 409 e não avança o offset"""
+        session_id = self.start().data['id']
+        write_part = uploads._write_part
+
+        def write_then_lose(path, offset, stream, length):
+            written = write_part(path, offset, stream, length)
+            # Outra requisição confirmou a mesma parte enquanto esta gravava
+            UploadSession.objects.filter(pk=session_id).update(offset=offset + written)
+            return written
+
+        with patch.object(uploads, '_write_part', write_then_lose):
+            response = self.send(session_id, 0, self.photo[:100])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response['Upload-Offset'], '100')
+        # O trecho disputado foi descartado: a próxima parte recomeça do zero
+        response = self.send(session_id, 100, self.photo[100:])
+        self.assertEqual(response['Upload-Offset'], '0')
+        self.assertEqual(self.send(session_id, 0, self.photo).data['offset'], len(self.photo))
+
+    def test_orphan_collection_keeps_active_parts(self):
+        """Teste que a coleta de órfãos não apaga o temporário de um upload em andamento"""
+        session_id = self.start().data['id']
+        self.send(session_id, 0, self.photo[:100])
+        path = os.path.join(self.media_root, part_name(session_id))
+        old = 1_000_000_000
+        os.utime(path, (old, old))
+
+        call_command('collect_orphan_media', grace_hours=0, stdout=io.StringIO())
+        self.assertTrue(os.path.exists(path))
+
+    def test_invalid_content_is_rejected(self):
+        """Teste que o conteúdo é validado na finalização"""
+        session_id = self.start(size=10).data['id']
+        self.send(session_id, 0, b'nao-imagem')
+        response = self.client.post(f'/api/uploads/{session_id}/finalize/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', response.data)
+        self.post.refresh_from_db()
+        self.assertFalse(self.post.image)
+
+    def test_session_validation(self):
+        """Teste de post de outro usuário, tamanho e parte além do tamanho"""
+        other = User.objects.create_user(username='outro', email='outro@example.com', password='senha@123')
+        other_post = Post.objects.create(author=other, title='Outro', content='x')
+        self.assertEqual(self.start(post=other_post.id).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.start(size=6 * 1024 * 1024).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.start(filename='x.gif').status_code, status.HTTP_400_BAD_REQUEST)
+
+        session_id = self.start(size=4).data['id']
+        self.assertEqual(self.send(session_id, 0, b'12345').status_code, status.HTTP_400_BAD_REQUEST)
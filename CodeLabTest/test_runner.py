@@ -0,0 +1,24 @@
+# CodeLabTest/test_runner.py
+
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Testes com os contadores de rate limiting no cache padrão: os setUp
+    zeram o estado com cache.clear(), e o SQLiteThrottleStore (padrão fora
+    do DEBUG) gravaria no throttle.sqlite3 do projeto e acumularia entre testes
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._throttle_store = override_settings(THROTTLE_STORE={
+            'BACKEND': 'CodeLabTest.throttling.CacheThrottleStore',
+            'OPTIONS': {},
+        })
+        self._throttle_store.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._throttle_store.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,391 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from django.core.cache import cache
+from django.test import TransactionTestCase
+from rest_framework.test import APITestCase, APIClient
+from rest_framework import status
+from CodeLabTest.models import User, Post, Comment, Like, Hashtag, PostHashtag, HashtagBucket
+from CodeLabTest.hashtags import extract_hashtags, rollup_trending
+from CodeLabTest.search import GlobalSearchView, AdvancedPostSearchView, search_cache, make_cache_key
+from CodeLabTest import fuzzy
+
+
+class HashtagTests(APITestCase):
+    """Testes de extração e busca de hashtags"""
+
+    def setUp(self):
+        cache.clear()
+        search_cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='senha@123'
+        )
+        self.client = APIClient()
+
+    def test_extract_hashtags(self):
+        """Teste de extração (minúsculas, sem duplicatas, sem falsos positivos)"""
+        tags = extract_hashtags('Aprendendo #Python', 'mais #python e #django, não a#b')
+        self.assertEqual(tags, ['python', 'django'])
+
+    def test_post_save_syncs_hashtags(self):
+        """Teste de sincronização no create/update/delete do post"""
+        post = Post.objects.create(author=self.user, title='Post', content='#python #django')
+        self.assertEqual(
+            set(post.post_hashtags.values_list('hashtag__name', flat=True)),
+            {'python', 'django'}
+        )
+
+        post.content = 'agora só #django'
+        post.save()
+        self.assertEqual(
+            list(post.post_hashtags.values_list('hashtag__name', flat=True)),
+            ['django']
+        )
+
+        post.delete()
+        self.assertEqual(PostHashtag.objects.count(), 0)
+        self.assertTrue(Hashtag.objects.filter(name='django').exists())
+
+    def test_hashtag_search_exact_tag(self):
+        """Teste que #python não encontra #pythonista"""
+        Post.objects.create(author=self.user, title='Um', content='Sobre #python')
+        Post.objects.create(author=self.user, title='Dois', content='Sou #pythonista')
+
+        response = self.client.get('/api/search/hashtags/?tag=%23Python')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['title'] for p in response.data['results']], ['Um'])
+        self.assertIn('next', response.data)
+
+    def test_hashtag_search_requires_tag(self):
+        """Teste de tag obrigatória"""
+        response = self.client.get('/api/search/hashtags/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TrendingHashtagTests(APITestCase):
+    """Testes de hashtags em alta"""
+
+    def setUp(self):
+        cache.clear()
+        search_cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='senha@123'
+        )
+        self.client = APIClient()
+
+    def test_post_creation_increments_bucket(self):
+        """Teste que criar posts incrementa o bucket da hashtag"""
+        Post.objects.create(author=self.user, title='Um', content='#django')
+        Post.objects.create(author=self.user, title='Dois', content='#django #python')
+        counts = HashtagBucket.objects.filter(hashtag__name='django').values_list('count', flat=True)
+        self.assertEqual(sum(counts), 2)
+
+    def test_trending_endpoint(self):
+        """Teste do ranking servido após o rollup"""
+        for i in range(3):
+            Post.objects.create(author=self.user, title=f'Post {i}', content='#django')
+        Post.objects.create(author=self.user, title='Outro', content='#python')
+        rollup_trending()
+
+        response = self.client.get('/api/search/hashtags/trending/?window=1h')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0], {'tag': 'django', 'count': 3})
+
+    def test_trending_invalid_window(self):
+        """Teste de janela inválida"""
+        response = self.client.get('/api/search/hashtags/trending/?window=2h')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class GlobalSearchTests(APITestCase):
+    """Testes da busca global com contagem limitada"""
+
+    def setUp(self):
+        cache.clear()
+        search_cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='senha@123'
+        )
+        for i in range(5):
+            Post.objects.create(author=self.user, title=f'Django {i}', content='Conteúdo')
+        self.client = APIClient()
+
+    def test_count_is_capped(self):
+        """Teste que a contagem para no limite configurado"""
+        with patch.object(GlobalSearchView, 'count_cap', 3):
+            response = self.client.get('/api/search/?q=django&type=posts')
+        posts = response.data['results']['posts']
+        self.assertEqual(posts['count'], 3)
+        self.assertTrue(posts['count_capped'])
+        self.assertFalse(posts['timed_out'])
+
+    def test_count_below_cap(self):
+        """Teste de contagem exata abaixo do limite"""
+        response = self.client.get('/api/search/?q=django')
+        self.assertEqual(response.data['results']['posts']['count'], 5)
+        self.assertFalse(response.data['total_capped'])
+        self.assertEqual(set(response.data['results']), {'posts', 'users', 'comments'})
+
+    def test_advanced_search_counts_are_not_multiplied(self):
+        """Teste que likes e comentários do mesmo post não se multiplicam no filtro e na ordenação"""
+        fans = [User.objects.create_user(username=f'fan{i}', email=f'fan{i}@example.com', password='senha@123')
+                for i in range(3)]
+        commented, liked = Post.objects.filter(title__in=['Django 0', 'Django 1']).order_by('title')
+        for fan in fans[:2]:
+            Like.objects.create(user=fan, post=commented)
+        for fan in fans:
+            Comment.objects.create(user=fan, post=commented, content='Boa')
+            Like.objects.create(user=fan, post=liked)
+
+        response = self.client.get('/api/search/posts/?q=django&min_likes=3')
+        self.assertEqual([post['id'] for post in response.data['results']], [str(liked.id)])
+
+        response = self.client.get('/api/search/posts/?q=django&order_by=-like_count')
+        self.assertEqual([post['id'] for post in response.data['results'][:2]], [str(liked.id), str(commented.id)])
+
+
+class ConcurrentGlobalSearchTests(TransactionTestCase):
+    """Testes da busca global rodando as sub-buscas em threads"""
+
+    def setUp(self):
+        cache.clear()
+        search_cache.clear()
+        self.user = User.objects.create_user(
+            username='djangofan',
+            email='fan@example.com',
+            password='senha@123'
+        )
+        Post.objects.create(author=self.user, title='Django Tutorial', content='Learn Django')
+        self.client = APIClient()
+
+    def test_sections_run_concurrently(self):
+        """Teste que os resultados das threads são combinados"""
+        response = self.client.get('/api/search/?q=django')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results']['posts']['count'], 1)
+        self.assertEqual(response.data['results']['users']['count'], 1)
+        self.assertEqual(response.data['total_results'], 2)
+
+    def run_slow_sections(self, delays, workers, **attributes):
+        """run_sections com sub-buscas que demoram `delays[nome]` segundos, num pool próprio"""
+        executor = ThreadPoolExecutor(max_workers=workers)
+        self.addCleanup(executor.shutdown)
+        ran = []
+
+        def slow_section(view, name, query):
+            ran.append(name)
+            time.sleep(delays[name])
+            return {'count': 1, 'count_capped': False, 'timed_out': False, 'ids': []}
+
+        with patch.object(GlobalSearchView, 'run_section', slow_section), \
+                patch.multiple(GlobalSearchView, executor=executor, **attributes):
+            return GlobalSearchView().run_sections('django', list(delays)), ran
+
+    def test_budget_starts_when_section_runs(self):
+        """Teste que a espera na fila do pool não conta no orçamento de cada sub-busca"""
+        found, _ = self.run_slow_sections(
+            {'posts': 0.2, 'users': 0.2, 'comments': 0.2}, workers=1, time_budget=0.5, queue_timeout=5
+        )
+        self.assertFalse(any(section['timed_out'] for section in found.values()))
+
+    def test_slow_section_times_out(self):
+        """Teste que só a sub-busca acima do orçamento volta vazia e marcada"""
+        found, _ = self.run_slow_sections(
+            {'posts': 0.01, 'users': 1, 'comments': 0.01}, workers=3, time_budget=0.2, queue_timeout=5
+        )
+        self.assertTrue(found['users']['timed_out'])
+        self.assertEqual(found['users']['ids'], [])
+        self.assertFalse(found['posts']['timed_out'] or found['comments']['timed_out'])
+
+    def test_queued_section_is_cancelled(self):
+        """Teste que a sub-busca que não sai da fila a tempo é cancelada sem rodar"""
+        found, ran = self.run_slow_sections(
+            {'posts': 0.5, 'users': 0.01}, workers=1, time_budget=2, queue_timeout=0.1
+        )
+        self.assertFalse(found['posts']['timed_out'])
+        self.assertTrue(found['users']['timed_out'])
+        self.assertEqual(ran, ['posts'])
+
+
+class SearchCacheTests(APITestCase):
+    """Testes do cache de resultados de busca"""
+
+    def setUp(self):
+        cache.clear()
+        search_cache.clear()
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='senha@123'
+        )
+        self.other = User.objects.create_user(
+            username='other',
+            email='other@example.com',
+            password='senha@123'
+        )
+        self.post = Post.objects.create(author=self.user, title='Django Cache', content='Conteúdo')
+        self.client = APIClient()
+
+    def test_cache_key_normalization(self):
+        """Teste que caixa, espaços e ordem dos parâmetros não mudam a chave"""
+        self.assertEqual(
+            make_cache_key('posts', {'q': '  Django   CACHE', 'author': '1', 'page': '2'}),
+            make_cache_key('posts', {'author': '1', 'q': 'django cache'})
+        )
+        self.assertNotEqual(
+            make_cache_key('posts', {'q': 'café'}),
+            make_cache_key('posts', {'q': 'cafe'})
+        )
+
+    def test_repeated_query_hits_cache(self):
+        """Teste que a segunda busca normalizada é servida do cache"""
+        self.client.get('/api/search/posts/?q=django')
+        self.client.get('/api/search/posts/?q=DJANGO')
+        stats = search_cache.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+
+    def test_is_liked_is_per_user(self):
+        """Teste que is_liked é calculado por requisição mesmo com cache"""
+        self.client.force_authenticate(user=self.user)
+        self.client.post(f'/api/posts/{self.post.id}/like/')
+        response = self.client.get('/api/search/?q=django&type=posts')
+        self.assertTrue(response.data['results']['posts']['results'][0]['is_liked'])
+
+        self.client.force_authenticate(user=self.other)
+        response = self.client.get('/api/search/?q=django&type=posts')
+        self.assertFalse(response.data['results']['posts']['results'][0]['is_liked'])
+        self.assertEqual(search_cache.stats()['hits'], 1)
+
+    def test_capped_results_are_flagged(self):
+        """Teste que a lista limitada a max_results é sinalizada"""
+        Post.objects.create(author=self.user, title='Django Again', content='x')
+        with patch.object(AdvancedPostSearchView, 'max_results', 1):
+            response = self.client.get('/api/search/posts/?q=django')
+        self.assertEqual(response.data['count'], 1)
+        self.assertTrue(response.data['count_capped'])
+        response = self.client.get('/api/search/posts/?q=again')
+        self.assertFalse(response.data['count_capped'])
+
+    def test_cached_hashtag_links_follow_request_host(self):
+        """Teste que os links do cursor em cache usam o host de cada requisição"""
+        for i in range(25):
+            Post.objects.create(author=self.user, title=f'Post {i}', content='#django')
+        first = self.client.get('/api/search/hashtags/?tag=django', HTTP_HOST='localhost')
+        second = self.client.get('/api/search/hashtags/?tag=django', HTTP_HOST='testserver')
+        self.assertTrue(first.data['next'].startswith('http://localhost/'))
+        self.assertTrue(second.data['next'].startswith('http://testserver/'))
+        self.assertEqual(search_cache.stats()['hits'], 1)
+        following = self.client.get(second.data['next'], HTTP_HOST='testserver')
+        self.assertEqual(len(following.data['results']), 5)
+
+    def test_stats_requires_admin(self):
+        """Teste que as estatísticas são restritas a admins"""
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get('/api/search/cache-stats/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class FuzzySearchTests(APITestCase):
+    """Testes da busca aproximada de usuários e posts"""
+
+    def setUp(self):
+        cache.clear()
+        search_cache.clear()
+        self.john = User.objects.create_user(
+            username='johnsmith',
+            email='john@example.com',
+            password='senha@123',
+            first_name='John',
+            last_name='Smith'
+        )
+        User.objects.create_user(
+            username='maria',
+            email='maria@example.com',
+            password='senha@123',
+            first_name='Maria',
+            last_name='José'
+        )
+        Post.objects.create(author=self.john, title='Tutorial de Django', content='Conteúdo')
+        self.client = APIClient()
+
+    def test_user_search_tolerates_typos(self):
+        """Teste que 'jonh smtih' encontra johnsmith"""
+        users = fuzzy.search_users(User.objects.all(), 'jonh smtih')
+        self.assertEqual(list(users)[0], self.john)
+
+    def test_accents_are_folded(self):
+        """Teste que 'jose' encontra 'José'"""
+        users = fuzzy.search_users(User.objects.all(), 'jose')
+        self.assertEqual([u.username for u in users], ['maria'])
+
+    def test_user_filter_uses_fuzzy_search(self):
+        """Teste do filtro search do diretório de usuários"""
+        response = self.client.get('/api/users/?search=smiht')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([u['username'] for u in response.data['results']], ['johnsmith'])
+
+    def test_global_search_post_typo(self):
+        """Teste de busca global com erro de digitação no título"""
+        response = self.client.get('/api/search/?q=djnago&type=posts')
+        self.assertEqual(response.data['results']['posts']['count'], 1)
+
+    def test_index_updates_single_documents(self):
+        """Teste que salvar/apagar atualiza só o documento, sem recarregar o índice"""
+        fuzzy.user_index.invalidate()
+        fuzzy.search_users(User.objects.all(), 'john')
+        with patch.object(fuzzy.user_index, 'loader', side_effect=AssertionError('recarregou')):
+            self.john.username = 'jonathan'
+            self.john.save()
+            self.john.save(update_fields=['post_count'])
+            self.assertEqual([u.username for u in fuzzy.search_users(User.objects.all(), 'jonathan')],
+                             ['jonathan'])
+            self.assertEqual(list(fuzzy.search_users(User.objects.all(), 'johnsmith')), [])
+            self.john.delete()
+            self.assertNotIn(self.john.pk, fuzzy.user_index.search('jonathan', 10, 0.6))
+
+    def test_reload_does_not_block_searches(self):
+        """Teste que a recarga roda fora da trava: buscas usam a carga anterior e escritas no meio não se perdem"""
+        documents = [(1, 'johnsmith')]
+        loading, release = threading.Event(), threading.Event()
+
+        def slow_loader():
+            rows = list(documents)
+            if index.loaded:
+                loading.set()
+                release.wait(5)
+            index.loaded = True
+            return rows
+
+        index = fuzzy.NgramIndex(slow_loader, ttl=3600)
+        index.loaded = False
+        self.assertEqual(index.search('johnsmith', 10, 0.6), [1])
+
+        index.invalidate()
+        documents.append((2, 'maria'))
+        reload = threading.Thread(target=index.search, args=('maria', 10, 0.6))
+        reload.start()
+        self.assertTrue(loading.wait(5))
+        # Durante a recarga: resposta imediata com a carga anterior
+        self.assertEqual(index.search('maria', 10, 0.6), [])
+        index.update(3, 'joana')
+        self.assertEqual(index.search('joana', 10, 0.6), [3])
+        release.set()
+        reload.join(5)
+
+        self.assertEqual(index.search('maria', 10, 0.6), [2])
+        self.assertEqual(index.search('joana', 10, 0.6), [3])
+
+    def test_index_sees_new_users(self):
+        """Teste que o índice em memória recebe os usuários salvos"""
+        fuzzy.search_users(User.objects.all(), 'john')
+        User.objects.create_user(username='johnny', email='johnny@example.com', password='senha@123')
+        users = fuzzy.search_users(User.objects.all(), 'johnny')
+        self.assertEqual(users[0].username, 'johnny')
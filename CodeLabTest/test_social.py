@@ -0,0 +1,324 @@
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase, APIClient
+from rest_framework import status
+from CodeLabTest.models import User, Follow, Post, Comment, Like, Mention, Notification, UserSuggestion, SuggestionRefresh
+from CodeLabTest.recommendations import compute_suggestions, refresh_suggestions
+from CodeLabTest.mentions import extract_mentions, process_mentions
+
+
+class MentionTests(APITestCase):
+    """Testes de menções @username"""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username='author',
+            email='author@example.com',
+            password='senha@123'
+        )
+        self.mentioned = User.objects.create_user(
+            username='maria',
+            email='maria@example.com',
+            password='senha@123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.author)
+
+    def test_extract_mentions(self):
+        """Teste de extração (sem duplicatas, sem e-mails, sem pontuação final)"""
+        names = extract_mentions('Oi @maria e @joao.', 'de novo @maria, fale com a@b.com')
+        self.assertEqual(names, ['maria', 'joao'])
+
+    def test_post_mention_creates_notification(self):
+        """Teste que criar post com menção notifica o usuário"""
+        response = self.client.post('/api/posts/', {'title': 'Olá', 'content': 'Veja isso @maria'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        notification = Notification.objects.get(notification_type='mention')
+        self.assertEqual(notification.recipient, self.mentioned)
+        self.assertEqual(notification.sender, self.author)
+        self.assertEqual(Mention.objects.filter(mentioned_user=self.mentioned).count(), 1)
+
+    def test_comment_mention_and_edit_do_not_duplicate(self):
+        """Teste que editar um comentário não repete a notificação"""
+        post = Post.objects.create(author=self.author, title='Post', content='Conteúdo')
+        comment = Comment.objects.create(user=self.author, post=post, content='@maria olha')
+        comment.content = '@maria olha de novo'
+        comment.save()
+        self.assertEqual(Notification.objects.filter(notification_type='mention').count(), 1)
+        self.assertEqual(Mention.objects.get().comment, comment)
+
+    def test_edit_removes_dropped_mentions(self):
+        """Teste que menções retiradas do texto na edição são apagadas"""
+        post = Post.objects.create(author=self.author, title='Post', content='@maria olha')
+        comment = Comment.objects.create(user=self.author, post=post, content='@maria também')
+        post.content = 'sem menção'
+        post.save()
+        self.assertFalse(Mention.objects.filter(comment__isnull=True).exists())
+        self.assertEqual(Mention.objects.get().comment, comment)
+
+    def test_self_and_unknown_mentions_are_ignored(self):
+        """Teste que menções a si mesmo e a usuários inexistentes são ignoradas"""
+        Post.objects.create(author=self.author, title='Post', content='@author @ninguem')
+        self.assertFalse(Mention.objects.exists())
+
+    def test_many_mentions_constant_queries(self):
+        """Teste que mencionar 20 usuários custa as mesmas 3 queries que 1"""
+        post = Post.objects.create(author=self.author, title='Post', content='Conteúdo')
+        users = User.objects.bulk_create([
+            User(username=f'user{i}', email=f'user{i}@example.com') for i in range(20)
+        ])
+        text = ' '.join(f'@{user.username}' for user in users)
+        with self.assertNumQueries(3):
+            mentions = process_mentions(self.author, post, text)
+        self.assertEqual(len(mentions), 20)
+
+
+class ActivityCounterTests(APITestCase):
+    """Testes dos contadores de atividade armazenados no usuário"""
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(
+            username='author',
+            email='author@example.com',
+            password='senha@123'
+        )
+        self.fan = User.objects.create_user(
+            username='fan',
+            email='fan@example.com',
+            password='senha@123'
+        )
+        self.client = APIClient()
+
+    def test_counters_follow_writes(self):
+        """Teste que posts, comentários e likes atualizam os contadores"""
+        post = Post.objects.create(author=self.author, title='Post', content='Conteúdo')
+        Comment.objects.create(user=self.fan, post=post, content='Legal')
+        Like.objects.create(user=self.fan, post=post)
+
+        self.author.refresh_from_db()
+        self.fan.refresh_from_db()
+        self.assertEqual(self.author.post_count, 1)
+        self.assertEqual(self.author.likes_received_count, 1)
+        self.assertEqual(self.fan.comment_count, 1)
+        self.assertEqual(self.fan.likes_given_count, 1)
+
+    def test_cascade_delete_decrements(self):
+        """Teste que apagar um post decrementa os contadores dos dependentes"""
+        post = Post.objects.create(author=self.author, title='Post', content='Conteúdo')
+        Comment.objects.create(user=self.fan, post=post, content='Legal')
+        Like.objects.create(user=self.fan, post=post)
+        post.delete()
+
+        self.author.refresh_from_db()
+        self.fan.refresh_from_db()
+        self.assertEqual(self.author.post_count, 0)
+        self.assertEqual(self.author.likes_received_count, 0)
+        self.assertEqual(self.fan.comment_count, 0)
+        self.assertEqual(self.fan.likes_given_count, 0)
+
+    def test_cascade_delete_groups_counter_updates(self):
+        """Teste que a cascata desconta likes e follows em UPDATEs agrupados, sem queries por like"""
+        fans = [User.objects.create_user(username=f'fan{i}', email=f'fan{i}@example.com', password='senha@123')
+                for i in range(4)]
+        posts = [Post.objects.create(author=self.author, title=f'Post {i}', content='x') for i in range(2)]
+        for fan in fans:
+            Follow.objects.create(follower=fan, following=self.author)
+            Like.objects.create(user=fan, post=posts[0])
+        Like.objects.create(user=fans[0], post=posts[1])
+
+        def delete_queries(post):
+            with CaptureQueriesContext(connection) as queries:
+                post.delete()
+            return len(queries)
+
+        # Quatro likes custam o mesmo que um
+        self.assertEqual(delete_queries(posts[0]), delete_queries(posts[1]))
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.likes_received_count, 0)
+        self.assertEqual(self.author.post_count, 0)
+        fans = User.objects.filter(pk__in=[fan.pk for fan in fans])
+        self.assertEqual(set(fans.values_list('likes_given_count', flat=True)), {0})
+
+        self.author.delete()
+        self.assertEqual(set(fans.values_list('following_count', flat=True)), {0})
+
+    def test_user_directory_reads_stored_counters(self):
+        """Teste da listagem de usuários ordenada por atividade"""
+        for i in range(3):
+            Post.objects.create(author=self.author, title=f'Post {i}', content='Conteúdo')
+        Comment.objects.create(user=self.fan, post=Post.objects.first(), content='Legal')
+
+        response = self.client.get('/api/users/?ordering=-posts')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        first = response.data['results'][0]
+        self.assertEqual(first['username'], 'author')
+        self.assertEqual(first['post_count'], 3)
+        self.assertEqual(first['comment_count'], 0)
+
+    def test_recount_command(self):
+        """Teste que o comando de recontagem corrige contadores divergentes"""
+        Post.objects.create(author=self.author, title='Post', content='Conteúdo')
+        Follow.objects.create(follower=self.fan, following=self.author)
+        User.objects.filter(pk=self.author.pk).update(post_count=42, follower_count=7)
+        User.objects.filter(pk=self.fan.pk).update(following_count=0)
+        call_command('recount_user_activity', stdout=StringIO())
+        self.author.refresh_from_db()
+        self.fan.refresh_from_db()
+        self.assertEqual(self.author.post_count, 1)
+        self.assertEqual(self.author.follower_count, 1)
+        self.assertEqual(self.fan.following_count, 1)
+
+
+class FollowTests(APITestCase):
+    """Testes do grafo de seguidores"""
+
+    def setUp(self):
+        cache.clear()
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='senha@123')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', password='senha@123')
+        self.carol = User.objects.create_user(username='carol', email='carol@example.com', password='senha@123')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.alice)
+
+    def test_follow_and_unfollow(self):
+        """Teste de seguir/deixar de seguir com contadores e notificação"""
+        response = self.client.post(f'/api/users/{self.bob.id}/follow/')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.bob.refresh_from_db()
+        self.assertEqual(self.bob.follower_count, 1)
+        self.assertTrue(Notification.objects.filter(notification_type='follow', recipient=self.bob).exists())
+
+        response = self.client.post(f'/api/users/{self.bob.id}/follow/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.delete(f'/api/users/{self.bob.id}/unfollow/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.bob.refresh_from_db()
+        self.alice.refresh_from_db()
+        self.assertEqual(self.bob.follower_count, 0)
+        self.assertEqual(self.alice.following_count, 0)
+
+    def test_cannot_follow_self(self):
+        """Teste que não é possível seguir a si mesmo"""
+        response = self.client.post(f'/api/users/{self.alice.id}/follow/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_followers_list_is_keyset_paginated(self):
+        """Teste da lista de seguidores com cursor"""
+        Follow.objects.create(follower=self.bob, following=self.alice)
+        Follow.objects.create(follower=self.carol, following=self.alice)
+        response = self.client.get(f'/api/users/{self.alice.id}/followers/?page_size=1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([u['username'] for u in response.data['results']], ['bob'])
+        self.assertIsNotNone(response.data['next'])
+
+    def test_is_following_is_batched(self):
+        """Teste que is_following da listagem usa uma única query"""
+        Follow.objects.create(follower=self.alice, following=self.bob)
+        response = self.client.get('/api/users/?ordering=username')
+        flags = {u['username']: u['is_following'] for u in response.data['results']}
+        self.assertEqual(flags, {'alice': False, 'bob': True, 'carol': False})
+        self.assertEqual(Follow.followed_ids(self.alice, [self.bob.pk, self.carol.pk]), {self.bob.pk})
+
+    def test_mutual_follows(self):
+        """Teste de seguidores mútuos pelos dois lados do grafo"""
+        Follow.objects.create(follower=self.alice, following=self.bob)
+        Follow.objects.create(follower=self.bob, following=self.alice)
+        Follow.objects.create(follower=self.alice, following=self.carol)
+        self.alice.refresh_from_db()
+        self.assertEqual(list(Follow.mutual(self.alice)), [self.bob])
+        self.bob.refresh_from_db()
+        self.assertEqual(list(Follow.mutual(self.bob)), [self.alice])
+
+        response = self.client.get(f'/api/users/{self.alice.id}/mutual/')
+        self.assertEqual([u['username'] for u in response.data['results']], ['bob'])
+
+
+class SuggestionTests(APITestCase):
+    """Testes das sugestões "quem seguir" """
+
+    def setUp(self):
+        cache.clear()
+        self.users = {
+            name: User.objects.create_user(username=name, email=f'{name}@example.com', password='senha@123')
+            for name in ('alice', 'bob', 'carol', 'dave', 'erin')
+        }
+        self.posts = {
+            name: Post.objects.create(author=user, title=f'Post de {name}', content='Conteúdo')
+            for name, user in self.users.items()
+        }
+        self.client = APIClient()
+
+    def like(self, user, author):
+        Like.objects.create(user=self.users[user], post=self.posts[author])
+
+    def test_co_engaged_author_is_suggested(self):
+        """Teste que quem curte carol como bob curte recebe dave como sugestão"""
+        self.like('bob', 'carol')
+        self.like('bob', 'dave')
+        self.like('alice', 'carol')
+        compute_suggestions()
+
+        self.client.force_authenticate(user=self.users['alice'])
+        response = self.client.get(f'/api/users/{self.users["alice"].id}/suggestions/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        usernames = [u['username'] for u in response.data['results']]
+        self.assertEqual(usernames[0], 'dave')
+        self.assertNotIn('alice', usernames)
+        self.assertIn('score', response.data['results'][0])
+
+    def test_followed_users_are_excluded(self):
+        """Teste que autores já seguidos não são sugeridos"""
+        self.like('bob', 'carol')
+        self.like('bob', 'dave')
+        self.like('alice', 'carol')
+        Follow.objects.create(follower=self.users['alice'], following=self.users['dave'])
+        compute_suggestions()
+        self.assertFalse(
+            UserSuggestion.objects.filter(user=self.users['alice'], suggested=self.users['dave']).exists()
+        )
+
+    def test_incremental_refresh_only_recomputes_active_users(self):
+        """Teste que a execução incremental só regrava usuários ativos"""
+        self.like('bob', 'carol')
+        self.like('bob', 'dave')
+        self.like('alice', 'carol')
+        self.assertEqual(refresh_suggestions(), 2)
+
+        self.like('erin', 'carol')
+        self.assertEqual(refresh_suggestions(), 1)
+        self.assertTrue(
+            UserSuggestion.objects.filter(user=self.users['erin'], suggested=self.users['dave']).exists()
+        )
+
+    def test_suggestions_are_private(self):
+        """Teste que só o próprio usuário lê as suas sugestões"""
+        url = f'/api/users/{self.users["alice"].id}/suggestions/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.force_authenticate(user=self.users['bob'])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_incremental_refresh_handles_removed_likes(self):
+        """Teste que um like removido marca o usuário para a próxima execução incremental"""
+        self.like('bob', 'carol')
+        self.like('bob', 'dave')
+        self.like('alice', 'carol')
+        refresh_suggestions()
+        self.assertTrue(
+            UserSuggestion.objects.filter(user=self.users['alice'], suggested=self.users['dave']).exists()
+        )
+
+        Like.objects.filter(user=self.users['alice'], post=self.posts['carol']).delete()
+        refresh_suggestions()
+        self.assertFalse(
+            UserSuggestion.objects.filter(user=self.users['alice'], suggested=self.users['dave']).exists()
+        )
+        self.assertFalse(SuggestionRefresh.objects.exists())
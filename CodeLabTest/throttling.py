@@ -1,6 +1,241 @@
 # CodeLabTest/throttling.py
 
-from rest_framework.throttling import UserRateThrottle, AnonRateThrottle
+import math
+import os
+import sqlite3
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache as default_cache
+from django.core.signals import setting_changed
+from django.db import connection
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework import throttling
+
+
+class CacheThrottleStore:
+    """
+    Contadores no cache padrão do Django (add + incr). É atômico e
+    compartilhado entre processos com Redis/Memcached; com LocMemCache
+    fica restrito ao processo.
+    """
+
+    def __init__(self, options=None):
+        self.cache = default_cache
+
+    def hit(self, key, window, amount, ttl):
+        """Soma amount ao contador da janela atual. Retorna (anterior, atual)"""
+        current_key = f'{key}:{window}'
+        self.cache.add(current_key, 0, ttl)
+        try:
+            current = self.cache.incr(current_key, amount)
+        except ValueError:
+            # Chave expirou/foi despejada entre o add e o incr
+            self.cache.set(current_key, amount, ttl)
+            current = amount
+        return self.cache.get(f'{key}:{window - 1}', 0), current
+
+    def undo(self, key, window, amount):
+        try:
+            self.cache.decr(f'{key}:{window}', amount)
+        except ValueError:
+            pass
+
+
+class SQLiteThrottleStore:
+    """
+    Contadores num arquivo SQLite (WAL), compartilhados entre os workers da
+    mesma máquina sem precisar de Redis. Um UPSERT ... RETURNING por
+    requisição, atômico no banco.
+    """
+
+    CLEANUP_INTERVAL = 60  # segundos
+
+    def __init__(self, options=None):
+        options = options or {}
+        self.path = str(options.get('PATH') or os.path.join(settings.BASE_DIR, 'throttle.sqlite3'))
+        self._local = threading.local()
+        self._cleaned_at = 0
+
+    @property
+    def connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS throttle ('
+                'key TEXT NOT NULL, window INTEGER NOT NULL, count INTEGER NOT NULL, '
+                'expires REAL NOT NULL, PRIMARY KEY (key, window)) WITHOUT ROWID'
+            )
+            self._local.connection = connection
+        return connection
+
+    def hit(self, key, window, amount, ttl):
+        now = time.time()
+        connection = self.connection
+        current, = connection.execute(
+            'INSERT INTO throttle (key, window, count, expires) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (key, window) DO UPDATE SET count = count + excluded.count '
+            'RETURNING count',
+            (key, window, amount, now + ttl)
+        ).fetchone()
+        row = connection.execute(
+            'SELECT count FROM throttle WHERE key = ? AND window = ?', (key, window - 1)
+        ).fetchone()
+        if now - self._cleaned_at > self.CLEANUP_INTERVAL:
+            self._cleaned_at = now
+            connection.execute('DELETE FROM throttle WHERE expires < ?', (now,))
+        return (row[0] if row else 0), current
+
+    def undo(self, key, window, amount):
+        self.connection.execute(
+            'UPDATE throttle SET count = count - ? WHERE key = ? AND window = ?',
+            (amount, key, window)
+        )
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+@receiver(setting_changed)
+def reset_throttle_store(setting, **kwargs):
+    # override_settings(THROTTLE_STORE=...) passa a valer na próxima requisição
+    global _store
+    if setting == 'THROTTLE_STORE':
+        _store = None
+
+
+def get_throttle_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                config = settings.THROTTLE_STORE
+                _store = import_string(config['BACKEND'])(config.get('OPTIONS'))
+    return _store
+
+
+class SlidingWindowRateThrottle(throttling.SimpleRateThrottle):
+    """
+    Janela deslizante aproximada com estado O(1) por chave: dois contadores
+    (janela fixa atual e anterior), e a anterior pesa proporcionalmente ao
+    quanto dela ainda cai dentro da janela deslizante. O incremento é atômico
+    no store configurado em THROTTLE_STORE; requisições recusadas são desfeitas.
+    """
+
+    def get_store(self):
+        return get_throttle_store()
+
+    def get_cost(self, request, view):
+        return 1
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        self.now = self.timer()
+        self.cost = self.get_cost(request, view)
+        window, elapsed = divmod(self.now, self.duration)
+        self.window = int(window)
+        self.elapsed = elapsed / self.duration
+
+        store = self.get_store()
+        self.previous, self.current = store.hit(self.key, self.window, self.cost, self.duration * 2)
+        if self.previous * (1 - self.elapsed) + self.current > self.num_requests:
+            store.undo(self.key, self.window, self.cost)
+            self.current -= self.cost
+            return self.throttle_failure()
+        return True
+
+    def wait(self):
+        """Segundos até a estimativa abrir espaço para o custo desta requisição"""
+        limit = self.num_requests - self.cost
+        if self.current <= limit:
+            # Basta a janela anterior "escorrer" o suficiente
+            needed = 1 - (limit - self.current) / self.previous if self.previous else 0
+            return max(0.0, (needed - self.elapsed) * self.duration)
+        # Só na próxima janela, quando a atual vira a anterior
+        needed = 1 - limit / self.current if limit > 0 else 1
+        return (1 - self.elapsed + needed) * self.duration
+
+
+class UserRateThrottle(SlidingWindowRateThrottle, throttling.UserRateThrottle):
+    pass
+
+
+class AnonRateThrottle(SlidingWindowRateThrottle, throttling.AnonRateThrottle):
+    pass
+
+
+class CostMeter:
+    """
+    Tempo médio de banco por endpoint (média móvel exponencial), por processo
+    """
+
+    def __init__(self, alpha=0.2):
+        self.alpha = alpha
+        self._averages = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, seconds):
+        with self._lock:
+            average = self._averages.get(endpoint)
+            self._averages[endpoint] = seconds if average is None else (
+                self.alpha * seconds + (1 - self.alpha) * average
+            )
+
+    def average(self, endpoint):
+        return self._averages.get(endpoint)
+
+    def clear(self):
+        with self._lock:
+            self._averages.clear()
+
+
+cost_meter = CostMeter()
+
+
+def endpoint_name(view, request):
+    """'PostViewSet.popular' em viewsets; 'GlobalSearchView.get' nas demais views"""
+    return f'{view.__class__.__name__}.{getattr(view, "action", None) or request.method.lower()}'
+
+
+class DBTimer:
+    """execute_wrapper que soma o tempo gasto em queries"""
+
+    def __init__(self):
+        self.elapsed = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.elapsed += time.perf_counter() - started
+
+
+class MeasuredCostMixin:
+    """
+    Mixin de view que mede o tempo de banco de cada requisição e alimenta
+    o cost_meter (usado por throttle_cost = 'measured')
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        timer = DBTimer()
+        with connection.execute_wrapper(timer):
+            response = super().dispatch(request, *args, **kwargs)
+        cost_meter.record(endpoint_name(self, request), timer.elapsed)
+        return response
+
+
 
 class BurstRateThrottle(UserRateThrottle):
     """
@@ -42,6 +277,15 @@ class CommentCreateThrottle(UserRateThrottle):
     scope = 'comment_create'
     rate = '30/hour'
 
+class UploadChunkThrottle(UserRateThrottle):
+    """
+    Limite para partes de uploads retomáveis (no lugar dos limites gerais,
+    para um arquivo em várias partes não esgotar o burst)
+    300 partes por hora
+    """
+    scope = 'upload_chunk'
+    rate = '300/hour'
+
 class LoginThrottle(AnonRateThrottle):
     """
     Limite para tentativas de login
@@ -56,4 +300,31 @@ class RegistrationThrottle(AnonRateThrottle):
     3 registros por hora por IP
     """
     scope = 'registration'
-    rate = '3/hour'
\ No newline at end of file
+    rate = '3/hour'
+
+class CostRateThrottle(UserRateThrottle):
+    """
+    Orçamento compartilhado em unidades de custo
+    1000 unidades por hora
+
+    Cada view declara throttle_cost: um número, um dict por action
+    ({'popular': 5, 'default': 1}) ou 'measured' para derivar o custo do
+    tempo médio de banco medido pelo MeasuredCostMixin. Sem declaração custa 1.
+    """
+    scope = 'cost'
+    rate = '1000/hour'
+
+    def get_cost(self, request, view):
+        cost = getattr(view, 'throttle_cost', 1)
+        if isinstance(cost, dict):
+            cost = cost.get(getattr(view, 'action', None), cost.get('default', 1))
+        if cost == 'measured':
+            return self.measured_cost(endpoint_name(view, request))
+        return cost
+
+    def measured_cost(self, endpoint):
+        average = cost_meter.average(endpoint)
+        if average is None:
+            return 1
+        config = settings.THROTTLE_COST
+        return min(config['MAX_COST'], max(1, math.ceil(average * 1000 / config['UNIT_MS'])))
@@ -0,0 +1,153 @@
+# CodeLabTest/tokens.py
+
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt import serializers as jwt_serializers
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken as BaseRefreshToken
+
+
+class BloomFilter:
+    """
+    Filtro de Bloom simples: "talvez contém" ou "certamente não contém".
+    As k posições saem de dois hashes de um único blake2b (double hashing).
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class BlacklistFilter:
+    """
+    Filtro de Bloom dos jti na blacklist, na frente de BlacklistedToken.
+
+    Tokens colocados na blacklist por este processo entram no filtro na hora;
+    os dos demais workers são sincronizados a cada SYNC_INTERVAL segundos
+    (uma query pelos recém-adicionados). Até lá, quem não tem o jti no filtro
+    consulta o cache padrão, onde publish() deixa cada entrada nova por esse
+    intervalo: um refresh token rotacionado não é aceito de novo por outro
+    worker. O filtro é reconstruído do zero a cada REBUILD_INTERVAL,
+    descartando tokens expirados e redimensionando os bits.
+    """
+
+    # Folga na sincronização para linhas gravadas com relógio um pouco atrás
+    SYNC_SKEW = timedelta(seconds=5)
+    CACHE_PREFIX = 'token-blacklist:'
+
+    def __init__(self, error_rate, sync_interval, rebuild_interval):
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self.rebuild_interval = rebuild_interval
+        self._lock = threading.Lock()
+        self._filter = None
+        self._built_at = 0
+        self._synced_at = 0
+        self._synced_until = None
+
+    def invalidate(self):
+        with self._lock:
+            self._filter = None
+
+    def _rebuild(self):
+        now = timezone.now()
+        jtis = list(
+            BlacklistedToken.objects.filter(
+                token__expires_at__gt=now
+            ).values_list('token__jti', flat=True).iterator(chunk_size=5000)
+        )
+        bloom = BloomFilter(capacity=len(jtis) * 2 + 1000, error_rate=self.error_rate)
+        for jti in jtis:
+            bloom.add(jti)
+        self._filter = bloom
+        self._built_at = self._synced_at = time.monotonic()
+        self._synced_until = now
+
+    def _sync(self):
+        now = timezone.now()
+        for jti in BlacklistedToken.objects.filter(
+            blacklisted_at__gte=self._synced_until - self.SYNC_SKEW
+        ).values_list('token__jti', flat=True):
+            self._filter.add(jti)
+        self._synced_at = time.monotonic()
+        self._synced_until = now
+
+    def _refresh(self):
+        elapsed = time.monotonic()
+        if self._filter is None or elapsed - self._built_at >= self.rebuild_interval:
+            self._rebuild()
+        elif elapsed - self._synced_at >= self.sync_interval:
+            self._sync()
+
+    def might_contain(self, jti):
+        with self._lock:
+            self._refresh()
+            if jti in self._filter:
+                return True
+        # Na blacklist há menos de SYNC_INTERVAL, por outro worker
+        return cache.get(self.CACHE_PREFIX + jti) is not None
+
+    def add(self, jti):
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(jti)
+
+    def publish(self, jti):
+        """Entrada nova: no filtro local e, até os outros workers sincronizarem, no cache"""
+        self.add(jti)
+        cache.set(self.CACHE_PREFIX + jti, True, self.sync_interval + self.SYNC_SKEW.total_seconds())
+
+
+blacklist_filter = BlacklistFilter(
+    error_rate=settings.TOKEN_BLACKLIST_FILTER['ERROR_RATE'],
+    sync_interval=settings.TOKEN_BLACKLIST_FILTER['SYNC_INTERVAL'],
+    rebuild_interval=settings.TOKEN_BLACKLIST_FILTER['REBUILD_INTERVAL']
+)
+
+
+class RefreshToken(BaseRefreshToken):
+    """
+    RefreshToken que consulta o filtro de Bloom antes da tabela de blacklist:
+    o caso comum (token fora da blacklist) não vai ao banco. A rotação publica
+    o jti antigo antes de a resposta sair (blacklist() roda na validação).
+    """
+
+    def check_blacklist(self):
+        jti = self.payload[api_settings.JTI_CLAIM]
+        if not blacklist_filter.might_contain(jti):
+            return
+        if BlacklistedToken.objects.filter(token__jti=jti).exists():
+            raise TokenError(_('Token is blacklisted'))
+
+    def blacklist(self):
+        blacklisted = super().blacklist()
+        blacklist_filter.publish(self.payload[api_settings.JTI_CLAIM])
+        return blacklisted
+
+
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    token_class = RefreshToken
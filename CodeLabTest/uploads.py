@@ -0,0 +1,125 @@
+# CodeLabTest/uploads.py
+
+import os
+from datetime import timedelta
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from django.http import UnreadablePostError
+from django.utils import timezone
+from CodeLabTest.models import UploadSession
+
+# Tamanho máximo do arquivo final por destino (os mesmos limites dos serializers)
+TARGET_MAX_SIZE = {
+    'post_image': 5 * 1024 * 1024,
+    'avatar': 2 * 1024 * 1024,
+}
+
+READ_SIZE = 64 * 1024
+
+
+class OffsetMismatch(Exception):
+    """A parte não começa onde o upload parou; o cliente deve retomar de `offset`"""
+
+    def __init__(self, offset):
+        super().__init__(offset)
+        self.offset = offset
+
+
+def part_name(pk):
+    """Nome do arquivo temporário relativo ao MEDIA_ROOT: tmp/uploads/<id>.part"""
+    return f'tmp/uploads/{pk}.part'
+
+
+def part_path(session):
+    """
+    Caminho do arquivo temporário da sessão. O collect_orphan_media preserva
+    os das sessões existentes e apaga os de sessões removidas ou expiradas
+    """
+    return os.path.join(settings.MEDIA_ROOT, part_name(session.pk))
+
+
+def active_sessions(user):
+    cutoff = timezone.now() - timedelta(seconds=settings.CHUNKED_UPLOADS['TTL'])
+    return UploadSession.objects.filter(user=user, updated_at__gte=cutoff)
+
+
+def expired_sessions():
+    cutoff = timezone.now() - timedelta(seconds=settings.CHUNKED_UPLOADS['TTL'])
+    return UploadSession.objects.filter(updated_at__lt=cutoff)
+
+
+def write_chunk(session, offset, stream, length):
+    """
+    Grava `length` bytes do corpo da requisição a partir de `offset`, lendo
+    aos poucos direto para o disco, fora de transação: nenhuma trava do
+    banco (nem conexão do pool) fica presa durante a transferência. O novo
+    offset só é gravado se o da sessão ainda for `offset` (compare-and-swap);
+    se outra parte chegou antes, o trecho escrito é descartado e o cliente
+    retoma do offset atual. Se a conexão cair no meio, o que chegou é
+    mantido e o novo offset é devolvido do mesmo jeito. Se o arquivo
+    temporário não tem os `offset` bytes já confirmados (apagado, outro
+    servidor), o offset volta a zero e o cliente recomeça.
+    """
+    session.refresh_from_db(fields=['offset'])
+    if offset != session.offset:
+        raise OffsetMismatch(session.offset)
+
+    path = part_path(session)
+    if offset and (not os.path.exists(path) or os.path.getsize(path) < offset):
+        _swap_offset(session, offset, 0)
+        raise OffsetMismatch(0)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    written = _write_part(path, offset, stream, length)
+    if not _swap_offset(session, offset, offset + written):
+        # Duas partes no mesmo trecho: os bytes a partir de `offset` podem
+        # misturar as duas. Corta no último offset confirmado por esta; se a
+        # outra já tinha avançado, a próxima parte dela cai na volta a zero
+        with open(path, 'r+b') as part:
+            part.truncate(offset)
+        session.refresh_from_db(fields=['offset'])
+        raise OffsetMismatch(session.offset)
+    return session
+
+
+def _swap_offset(session, expected, offset):
+    """UPDATE ... WHERE offset = expected; False se outra requisição mudou o offset antes"""
+    now = timezone.now()
+    swapped = UploadSession.objects.filter(pk=session.pk, offset=expected).update(offset=offset, updated_at=now)
+    if swapped:
+        session.offset, session.updated_at = offset, now
+    return bool(swapped)
+
+
+def _write_part(path, offset, stream, length):
+    written = 0
+    with open(path, 'r+b' if offset else 'wb') as part:
+        part.seek(offset)
+        try:
+            while written < length:
+                data = stream.read(min(READ_SIZE, length - written))
+                if not data:
+                    break
+                part.write(data)
+                written += len(data)
+        except (UnreadablePostError, OSError):
+            pass
+        part.truncate()
+    return written
+
+
+def finished_file(session):
+    """O arquivo completo como upload comum, para os serializers validarem e salvarem"""
+    return UploadedFile(
+        file=open(part_path(session), 'rb'),
+        name=session.filename,
+        size=session.size
+    )
+
+
+def discard(session):
+    """Remove a sessão e o arquivo temporário"""
+    path = part_path(session)
+    session.delete()
+    transaction.on_commit(lambda: os.path.exists(path) and os.remove(path))
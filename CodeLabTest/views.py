@@ -1,25 +1,32 @@
-from rest_framework import viewsets, status, generics, parsers
+from rest_framework import viewsets, mixins, status, generics, parsers
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAuthenticatedOrReadOnly
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
 from django.db.models import Count, Q
 from django_filters import rest_framework as filters_backend
 from CodeLabTest.pagination import StandardResultsSetPagination # Certifique-se de que esta importação existe
-from CodeLabTest.models import User, Post, Like, Comment, Notification
+from CodeLabTest.models import User, Follow, Post, Like, Comment, Notification, UserSuggestion
+from CodeLabTest.uploads import OffsetMismatch, active_sessions, discard, finished_file, write_chunk
+from CodeLabTest.recommendations import SUGGESTIONS_PER_USER
+from CodeLabTest.tokens import RefreshToken
+from CodeLabTest.hashing import password_hasher
 from CodeLabTest.serializers import (
     UserSerializer, PostSerializer, LikeSerializer, 
     CommentSerializer, CommentReplySerializer,
     UserRegistrationSerializer, UserLoginSerializer,
     UserUpdateSerializer, ChangePasswordSerializer,
-    AvatarUploadSerializer, NotificationSerializer
+    AvatarUploadSerializer, NotificationSerializer, UploadSessionSerializer
 )
-from CodeLabTest.pagination import StandardResultsSetPagination, PostCursorPagination
-from CodeLabTest.filters import PostFilter, CommentFilter, UserFilter
+from CodeLabTest.pagination import (
+    StandardResultsSetPagination, PostCursorPagination,
+    FollowerCursorPagination, FollowingCursorPagination, UserCursorPagination
+)
+from CodeLabTest.filters import PostFilter, LikeFilter, CommentFilter, UserFilter
 from CodeLabTest.throttling import (
     LoginThrottle, RegistrationThrottle,
-    PostCreateThrottle, CommentCreateThrottle
+    PostCreateThrottle, CommentCreateThrottle, UploadChunkThrottle, MeasuredCostMixin
 )
 
 from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiParameter, OpenApiExample
@@ -167,7 +174,7 @@ class LoginView(APIView):
     throttle_classes = [LoginThrottle]
     
     def post(self, request):
-        serializer = UserLoginSerializer(data=request.data)
+        serializer = UserLoginSerializer(data=request.data, context={'request': request})
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data['user']
         refresh = RefreshToken.for_user(user)
@@ -240,10 +247,7 @@ class UploadAvatarView(APIView):
         )
         
         if serializer.is_valid():
-            # Deletar avatar antigo se existir
-            if request.user.avatar:
-                request.user.avatar.delete(save=False)
-            
+            # O avatar antigo é liberado no save (CodeLabTest.media)
             serializer.save()
             
             return Response({
@@ -255,7 +259,8 @@ class UploadAvatarView(APIView):
     
     def delete(self, request):
         if request.user.avatar:
-            request.user.avatar.delete(save=True)
+            request.user.avatar = None
+            request.user.save(update_fields=['avatar'])
             return Response({
                 'message': 'Avatar removido com sucesso'
             }, status=status.HTTP_200_OK)
@@ -272,8 +277,8 @@ class ChangePasswordView(APIView):
         serializer.is_valid(raise_exception=True)
         
         user = request.user
-        user.set_password(serializer.validated_data['new_password'])
-        user.save()
+        password_hasher.set_password(user, serializer.validated_data['new_password'])
+        user.save(update_fields=['password'])
         
         return Response({
             'message': 'Senha alterada com sucesso'
@@ -294,12 +299,9 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
     
     def get_queryset(self):
         """
-        Adiciona contadores de posts e comentários
+        Contadores de posts, comentários e likes já vêm armazenados no User
         """
-        return User.objects.annotate(
-            post_count=Count('posts'),
-            comment_count=Count('comments')
-        )
+        return User.objects.all()
     
     def get_serializer_context(self):
         return {'request': self.request}
@@ -322,14 +324,117 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
         
         serializer = PostSerializer(paginated_posts, many=True, context={'request': request})
         return paginator.get_paginated_response(serializer.data)
+    
+    @action(detail=True, methods=['post'], url_path='follow', permission_classes=[IsAuthenticated])
+    def follow(self, request, pk=None):
+        user = self.get_object()
+        
+        if user == request.user:
+            return Response({
+                'error': 'Você não pode seguir a si mesmo'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        follow, created = Follow.objects.get_or_create(follower=request.user, following=user)
+        
+        if created:
+            Notification.create_follow_notification(follow)
+            return Response({
+                'message': f'Você agora segue {user.username}'
+            }, status=status.HTTP_201_CREATED)
+        return Response({
+            'message': f'Você já segue {user.username}'
+        }, status=status.HTTP_200_OK)
+    
+    @action(detail=True, methods=['delete'], url_path='unfollow', permission_classes=[IsAuthenticated])
+    def unfollow(self, request, pk=None):
+        user = self.get_object()
+        deleted, _ = Follow.objects.filter(follower=request.user, following=user).delete()
+        
+        if deleted:
+            return Response({
+                'message': f'Você deixou de seguir {user.username}'
+            }, status=status.HTTP_200_OK)
+        return Response({
+            'message': f'Você não segue {user.username}'
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    @action(detail=True, methods=['get'], url_path='followers')
+    def followers(self, request, pk=None):
+        """
+        Seguidores do usuário (keyset pagination pelo índice (following, follower))
+        """
+        user = self.get_object()
+        follows = Follow.objects.filter(following=user).select_related('follower')
+        
+        paginator = FollowerCursorPagination()
+        page = paginator.paginate_queryset(follows, request, view=self)
+        serializer = UserSerializer([f.follower for f in page], many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
+    
+    @action(detail=True, methods=['get'], url_path='following')
+    def following(self, request, pk=None):
+        """
+        Quem o usuário segue (keyset pagination pela chave primária)
+        """
+        user = self.get_object()
+        follows = Follow.objects.filter(follower=user).select_related('following')
+        
+        paginator = FollowingCursorPagination()
+        page = paginator.paginate_queryset(follows, request, view=self)
+        serializer = UserSerializer([f.following for f in page], many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
+    
+    @action(detail=True, methods=['get'], url_path='mutual')
+    def mutual(self, request, pk=None):
+        """
+        Usuários que seguem e são seguidos pelo usuário
+        """
+        user = self.get_object()
+        
+        paginator = UserCursorPagination()
+        page = paginator.paginate_queryset(Follow.mutual(user), request, view=self)
+        serializer = UserSerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
+    
+    @action(detail=True, methods=['get'], url_path='suggestions', permission_classes=[IsAuthenticated])
+    def suggestions(self, request, pk=None):
+        """
+        Sugestões "quem seguir" pré-calculadas por compute_user_suggestions
+        (uma leitura pelo índice (user, -score), sem quem já é seguido).
+        Revelam com quem o usuário interage: só ele (ou staff) pode ler
+        """
+        user = self.get_object()
+        if user != request.user and not request.user.is_staff:
+            return Response({
+                'error': 'Você não pode ver sugestões de outros usuários'
+            }, status=status.HTTP_403_FORBIDDEN)
+        suggestions = list(
+            UserSuggestion.objects.filter(user=user)
+            .exclude(suggested__followers__follower=user)
+            .select_related('suggested')
+            .order_by('-score')[:SUGGESTIONS_PER_USER]
+        )
+        
+        serializer = UserSerializer(
+            [s.suggested for s in suggestions], many=True, context={'request': request}
+        )
+        return Response({
+            'results': [
+                {**data, 'score': round(s.score, 4)}
+                for s, data in zip(suggestions, serializer.data)
+            ],
+            'computed_at': suggestions[0].computed_at if suggestions else None
+        })
 
 # ==================== POSTS ====================
 
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(MeasuredCostMixin, viewsets.ModelViewSet):
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     parser_classes = [parsers.MultiPartParser, parsers.FormParser, parsers.JSONParser]
     pagination_class = StandardResultsSetPagination
+    # Rankings agregam likes de todos os posts: custo medido pelo tempo de banco
+    throttle_cost = {'popular': 'measured', 'trending': 'measured'}
     
     def get_queryset(self):
         return Post.objects.annotate(
@@ -419,10 +524,7 @@ class PostViewSet(viewsets.ModelViewSet):
                 'error': 'Nenhuma imagem foi enviada'
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Deletar imagem antiga se existir
-        if post.image:
-            post.image.delete(save=False)
-        
+        # A imagem antiga é liberada no save (CodeLabTest.media)
         serializer = self.get_serializer(post, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         serializer.save()
@@ -442,7 +544,8 @@ class PostViewSet(viewsets.ModelViewSet):
             }, status=status.HTTP_403_FORBIDDEN)
         
         if post.image:
-            post.image.delete(save=True)
+            post.image = None
+            post.save(update_fields=['image'])
             return Response({
                 'message': 'Imagem removida com sucesso'
             }, status=status.HTTP_200_OK)
@@ -517,7 +620,8 @@ class PostViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'], url_path='likes')
     def get_likes(self, request, pk=None):
         post = self.get_object()
-        likes = post.likes.select_related('user').all()
+        # Faixa da chave primária (post, user), já na ordem do índice
+        likes = post.likes.select_related('user').order_by('user_id')
         serializer = LikeSerializer(likes, many=True)
         return Response({
             'count': likes.count(),
@@ -662,11 +766,146 @@ class CommentViewSet(viewsets.ModelViewSet):
 
 # ==================== LIKES ====================
 
-class LikeViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = Like.objects.select_related('user', 'post').all()
+class LikeViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Lista de likes (?post=, ?user=), ordenada pelo índice que atende o
+    filtro: (post, user) da chave primária ou o reverso (user, post).
+    Likes não têm id próprio, então não há detalhe por id.
+    """
+    queryset = Like.objects.select_related('user', 'post')
     serializer_class = LikeSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     pagination_class = StandardResultsSetPagination
+    filter_backends = [filters_backend.DjangoFilterBackend]
+    filterset_class = LikeFilter
+
+    def get_queryset(self):
+        if 'post' in self.request.query_params:
+            return super().get_queryset().order_by('post_id', 'user_id')
+        return super().get_queryset().order_by('user_id', 'post_id')
+
+# ==================== UPLOADS EM PARTES ====================
+
+@extend_schema_view(
+    create=extend_schema(
+        summary='Iniciar Upload',
+        description='Cria uma sessão de upload em partes para imagem de post ou avatar',
+        tags=['Uploads']
+    ),
+    retrieve=extend_schema(
+        summary='Estado do Upload',
+        description='Offset atual (também no cabeçalho Upload-Offset) para retomar o envio',
+        tags=['Uploads']
+    ),
+    partial_update=extend_schema(
+        summary='Enviar Parte',
+        description='Corpo com os bytes da parte (application/offset+octet-stream) e '
+                    'cabeçalho Upload-Offset igual ao offset atual',
+        tags=['Uploads']
+    ),
+    destroy=extend_schema(
+        summary='Cancelar Upload',
+        tags=['Uploads']
+    )
+)
+class UploadSessionViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Upload retomável: cada parte é uma requisição curta gravada direto no
+    disco; se a conexão cair, o cliente consulta o offset e continua dali
+    """
+    serializer_class = UploadSessionSerializer
+    permission_classes = [IsAuthenticated]
+    http_method_names = ['get', 'head', 'post', 'patch', 'delete']
+
+    def get_queryset(self):
+        return active_sessions(self.request.user).select_related('post')
+
+    def get_throttles(self):
+        """
+        Partes têm limite próprio
+        """
+        if self.action == 'partial_update':
+            return [UploadChunkThrottle()]
+        return super().get_throttles()
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+
+    def retrieve(self, request, *args, **kwargs):
+        session = self.get_object()
+        return Response(self.get_serializer(session).data, headers={'Upload-Offset': str(session.offset)})
+
+    def partial_update(self, request, pk=None):
+        session = self.get_object()
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.headers.get('Content-Length') or 0)
+        except (KeyError, ValueError):
+            return Response({
+                'error': 'Cabeçalho Upload-Offset é obrigatório'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if length > settings.CHUNKED_UPLOADS['CHUNK_MAX_SIZE']:
+            return Response({
+                'error': 'Parte maior que o permitido',
+                'max_size': settings.CHUNKED_UPLOADS['CHUNK_MAX_SIZE']
+            }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        if offset + length > session.size:
+            return Response({
+                'error': 'A parte ultrapassa o tamanho declarado do arquivo'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            session = write_chunk(session, offset, request.stream, length)
+        except OffsetMismatch as exc:
+            return Response({
+                'error': 'Offset diferente do esperado',
+                'offset': exc.offset
+            }, status=status.HTTP_409_CONFLICT, headers={'Upload-Offset': str(exc.offset)})
+
+        return Response(self.get_serializer(session).data, headers={'Upload-Offset': str(session.offset)})
+
+    def destroy(self, request, pk=None):
+        discard(self.get_object())
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @extend_schema(
+        summary='Finalizar Upload',
+        description='Valida o arquivo completo e o grava na imagem do post ou no avatar',
+        tags=['Uploads']
+    )
+    @action(detail=True, methods=['post'])
+    def finalize(self, request, pk=None):
+        session = self.get_object()
+        if session.offset != session.size:
+            return Response({
+                'error': 'Upload incompleto',
+                'offset': session.offset
+            }, status=status.HTTP_409_CONFLICT, headers={'Upload-Offset': str(session.offset)})
+
+        context = {'request': request}
+        with finished_file(session) as file:
+            if session.target == 'avatar':
+                serializer = AvatarUploadSerializer(request.user, data={'avatar': file}, partial=True)
+            else:
+                serializer = PostSerializer(session.post, data={'image': file}, partial=True, context=context)
+            # O conteúdo só é validado aqui (tipo real da imagem, tamanho)
+            valid = serializer.is_valid()
+            if valid:
+                serializer.save()
+        discard(session)
+
+        if not valid:
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        if session.target == 'avatar':
+            return Response({
+                'message': 'Avatar atualizado com sucesso',
+                'user': UserSerializer(request.user, context=context).data
+            }, status=status.HTTP_200_OK)
+        return Response({
+            'message': 'Imagem atualizada com sucesso',
+            'post': serializer.data
+        }, status=status.HTTP_200_OK)
 
 # ==================== NOTIFICAÇÕES ====================
 
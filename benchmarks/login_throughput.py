@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""
+Benchmark do hashing de senha no login: inline (como antes) x executor limitado.
+
+Simula N clientes fazendo login em paralelo (verificação PBKDF2 com o hasher
+configurado) enquanto uma thread "leitora" faz trabalho barato e mede a
+própria latência, que é o que sofre quando os logins ocupam todos os workers.
+Uso: python benchmarks/login_throughput.py [--clients 16] [--seconds 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'setup.settings')
+
+import django
+django.setup()
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from CodeLabTest.hashing import PasswordHashExecutor, PasswordHashingBusy
+
+PASSWORD = 'senha@123'
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run(verify, clients, seconds):
+    encoded = hashers.make_password(PASSWORD)
+    stop = threading.Event()
+    login_latencies = []
+    reader_latencies = []
+    rejected = [0]
+    lock = threading.Lock()
+
+    def client():
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                verify(PASSWORD, encoded)
+            except PasswordHashingBusy:
+                with lock:
+                    rejected[0] += 1
+                time.sleep(0.01)
+                continue
+            with lock:
+                login_latencies.append(time.perf_counter() - started)
+
+    def reader():
+        while not stop.is_set():
+            started = time.perf_counter()
+            sum(range(2000))
+            reader_latencies.append(time.perf_counter() - started)
+            time.sleep(0.001)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    threads.append(threading.Thread(target=reader))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return {
+        'logins/s': len(login_latencies) / seconds,
+        'login p50 (ms)': statistics.median(login_latencies) * 1000 if login_latencies else 0.0,
+        'login p99 (ms)': percentile(login_latencies, 99) * 1000,
+        'rejeitados (503)': rejected[0],
+        'leitura p99 (ms)': percentile(reader_latencies, 99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    config = settings.PASSWORD_HASHING
+    pooled = PasswordHashExecutor(
+        workers=config['WORKERS'],
+        max_pending=config['MAX_PENDING'],
+        timeout=config['TIMEOUT'],
+        retry_after=config['RETRY_AFTER']
+    )
+    modes = {
+        'inline': hashers.verify_password,
+        f"executor ({config['WORKERS']} workers, {config['MAX_PENDING']} em voo)": pooled.verify_password,
+    }
+
+    print(f'{args.clients} clientes, {args.seconds}s por modo, hasher {hashers.get_hasher().algorithm}\n')
+    for name, verify in modes.items():
+        result = run(verify, args.clients, args.seconds)
+        print(name)
+        for key, value in result.items():
+            print(f'  {key:<18} {value:.1f}' if isinstance(value, float) else f'  {key:<18} {value}')
+        print()
+
+
+if __name__ == '__main__':
+    main()
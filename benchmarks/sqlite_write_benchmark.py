@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+"""
+Benchmark de escrita concorrente no banco configurado: N threads gravando
+direto (um commit por operação, disputando o lock) x pela fila de escrita
+única (lotes com um commit cada), com uma fração de leituras no meio.
+
+Com --processes N cada modo roda em N processos ao mesmo tempo, como N
+workers do gunicorn: cada processo tem a própria fila, então são N
+escritores disputando o lock do SQLite (a fila só agrupa dentro do processo).
+
+Rode uma vez para cada configuração e compare:
+  DATABASE_ENGINE=sqlite3 DATABASE_SQLITE_TUNING=False  (SQLite padrão)
+  DATABASE_ENGINE=sqlite3                               (perfil ajustado)
+  DATABASE_ENGINE=postgresql                            (PostgreSQL)
+Grava hashtags 'bench-*' no banco configurado (precisa das migrações
+aplicadas) e as remove no final.
+Uso: python benchmarks/sqlite_write_benchmark.py [--threads 8] [--processes 1] [--seconds 5] [--read-ratio 0.5] [--max-wait 0]
+"""
+import argparse
+import itertools
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'setup.settings')
+
+import django
+django.setup()
+
+from django.db import OperationalError, close_old_connections, connection
+from CodeLabTest.models import Hashtag
+from CodeLabTest.sqlite_writer import SingleWriter
+
+PREFIX = 'bench-'
+
+# Nomes únicos entre os modos (as linhas só são removidas no final)
+counter = itertools.count()
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run(write, threads, seconds, read_ratio):
+    stop = threading.Event()
+    write_latencies, read_latencies = [], []
+    errors = [0]
+    lock = threading.Lock()
+
+    def worker():
+        while not stop.is_set():
+            started = time.perf_counter()
+            try:
+                if random.random() < read_ratio:
+                    Hashtag.objects.filter(name__startswith=PREFIX).order_by('-id').first()
+                    latencies = read_latencies
+                else:
+                    write(f'{PREFIX}{next(counter)}')
+                    latencies = write_latencies
+            except OperationalError:
+                # "database is locked" no SQLite sem ajuste
+                with lock:
+                    errors[0] += 1
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - started)
+        close_old_connections()
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in pool:
+        thread.join()
+    return write_latencies, read_latencies, errors[0]
+
+
+def run_processes(make_write, processes, threads, seconds, read_ratio):
+    """
+    run() em `processes` processos ao mesmo tempo (fork: cada um herda o
+    Django configurado e abre a própria conexão e a própria fila). Junta as
+    latências e devolve também (operações, commits) somados das filas.
+    """
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    connection.close()
+
+    def child():
+        # Nomes únicos entre processos e modos: contagem própria prefixada pelo pid
+        global counter
+        counter = (f'{os.getpid()}-{n}' for n in itertools.count())
+        write, writer = make_write()
+        results.put((*run(write, threads, seconds, read_ratio), writer.operations, writer.batches))
+
+    pool = [context.Process(target=child) for _ in range(processes)]
+    for process in pool:
+        process.start()
+    collected = [results.get() for _ in pool]
+    for process in pool:
+        process.join()
+
+    write_latencies = [value for result in collected for value in result[0]]
+    read_latencies = [value for result in collected for value in result[1]]
+    errors = sum(result[2] for result in collected)
+    operations = sum(result[3] for result in collected)
+    batches = sum(result[4] for result in collected)
+    return (write_latencies, read_latencies, errors), (operations, batches)
+
+
+def report(name, seconds, write_latencies, read_latencies, errors):
+    print(
+        f'{name:<22} {len(write_latencies) / seconds:>9,.0f} escritas/s '
+        f'{len(read_latencies) / seconds:>9,.0f} leituras/s '
+        f'p50 {statistics.median(write_latencies or [0]) * 1000:>7.2f} ms '
+        f'p99 {percentile(write_latencies, 99) * 1000:>7.2f} ms '
+        f'erros {errors}'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8, help='Threads por processo')
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--read-ratio', type=float, default=0.5)
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument('--max-wait', type=float, default=0)
+    args = parser.parse_args()
+
+    options = connection.settings_dict.get('OPTIONS', {})
+    print(f"{connection.vendor} {connection.settings_dict['NAME']} {options.get('init_command', '')}")
+    print(
+        f'{args.processes} processo(s) x {args.threads} threads, '
+        f'{args.read_ratio:.0%} leituras, {args.seconds}s por modo\n'
+    )
+
+    def direct():
+        return (lambda name: Hashtag.objects.create(name=name)), SingleWriter(args.batch_size, args.max_wait)
+
+    def queued():
+        writer = SingleWriter(batch_size=args.batch_size, max_wait=args.max_wait)
+        return (lambda name: writer.run(Hashtag.objects.create, name=name)), writer
+
+    modes = {'direto': direct, 'fila de escrita única': queued}
+    try:
+        for name, make_write in modes.items():
+            if args.processes > 1:
+                latencies, (operations, batches) = run_processes(
+                    make_write, args.processes, args.threads, args.seconds, args.read_ratio
+                )
+            else:
+                write, writer = make_write()
+                latencies = run(write, args.threads, args.seconds, args.read_ratio)
+                operations, batches = writer.operations, writer.batches
+            report(name, args.seconds, *latencies)
+        print(f'\nfila: {operations} operações em {batches} commits ({args.processes} fila(s))')
+    finally:
+        Hashtag.objects.filter(name__startswith=PREFIX).delete()
+
+
+if __name__ == '__main__':
+    main()
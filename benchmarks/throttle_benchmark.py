@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark do rate limiting: lista de timestamps do DRF x janela
+deslizante O(1) (cache do Django e arquivo SQLite).
+
+O custo da lista cresce com o número de requisições dentro da janela, então
+o benchmark mede allow_request com o histórico já cheio até --history.
+Uso: python benchmarks/throttle_benchmark.py [--requests 20000] [--history 1000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'setup.settings')
+
+import django
+django.setup()
+
+from types import SimpleNamespace
+from django.core.cache import cache
+from rest_framework import throttling as drf_throttling
+from CodeLabTest.throttling import UserRateThrottle, CacheThrottleStore, SQLiteThrottleStore
+
+RATE = '1000000/hour'
+
+
+def make_request(user_id):
+    return SimpleNamespace(
+        user=SimpleNamespace(pk=user_id, is_authenticated=True),
+        META={'REMOTE_ADDR': '127.0.0.1'}
+    )
+
+
+def bench(name, throttle_class, requests, history, users):
+    cache.clear()
+    throttle = throttle_class()
+    reqs = [make_request(i) for i in range(users)]
+    for i in range(history * users):
+        throttle.allow_request(reqs[i % users], None)
+
+    started = time.perf_counter()
+    for i in range(requests):
+        throttle.allow_request(reqs[i % users], None)
+    elapsed = time.perf_counter() - started
+    print(f'{name:<28} {requests / elapsed:>12,.0f} req/s {elapsed / requests * 1e6:>10.1f} µs/req')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--history', type=int, default=1000)
+    parser.add_argument('--users', type=int, default=10)
+    args = parser.parse_args()
+
+    attrs = {'scope': 'bench', 'rate': RATE}
+    classes = {
+        'DRF (lista de timestamps)': type('DRFThrottle', (drf_throttling.UserRateThrottle,), attrs),
+        'janela deslizante (cache)': type('CacheThrottle', (UserRateThrottle,), {
+            **attrs, 'get_store': lambda self, store=CacheThrottleStore(): store
+        }),
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        sqlite_store = SQLiteThrottleStore({'PATH': os.path.join(directory, 'throttle.sqlite3')})
+        classes['janela deslizante (SQLite)'] = type('SQLiteThrottle', (UserRateThrottle,), {
+            **attrs, 'get_store': lambda self: sqlite_store
+        })
+
+        print(f'{args.users} usuários, histórico de {args.history} requisições por usuário\n')
+        for name, throttle_class in classes.items():
+            bench(name, throttle_class, args.requests, args.history, args.users)
+        sqlite_store.connection.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -7,8 +7,8 @@ from io import StringIO
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'setup.settings')
 django.setup()
 
-from django.test.runner import DiscoverRunner
 from django.test import TestCase
+from CodeLabTest.test_runner import TestRunner
 
 class Colors:
     HEADER = '\033[95m'
@@ -81,7 +81,7 @@ class FormattedTestResult(unittest.TestResult):
         exc_type, exc_value, exc_tb = err
         return f"{exc_type.__name__}: {str(exc_value)[:200]}"
 
-class FormattedTestRunner(DiscoverRunner):
+class FormattedTestRunner(TestRunner):
     """Test Runner customizado"""
     
     def __init__(self, *args, **kwargs):
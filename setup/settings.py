@@ -4,6 +4,8 @@ Django settings with media file support
 
 from pathlib import Path
 from datetime import timedelta
+from importlib.util import find_spec
+import copy
 import environ
 import os
 
@@ -44,6 +46,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'CodeLabTest.routers.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -80,6 +83,79 @@ DATABASES = {
     }
 }
 
+# Conexões: com psycopg 3 + psycopg_pool usa o pool nativo do Django (cada
+# worker mantém até MAX_SIZE conexões; quem passa disso espera até TIMEOUT);
+# com psycopg2 ou SQLite a conexão fica aberta por CONN_MAX_AGE segundos.
+# Em ambos os casos a conexão é verificada antes de ser reaproveitada
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+if (env('DATABASE_ENGINE') == 'postgresql' and env.bool('DATABASE_POOL', default=True)
+        and find_spec('psycopg') and find_spec('psycopg_pool')):
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': env.int('DATABASE_POOL_MIN_SIZE', default=2),
+            'max_size': env.int('DATABASE_POOL_MAX_SIZE', default=10),
+            'timeout': env.float('DATABASE_POOL_TIMEOUT', default=10.0),  # segundos
+        },
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = env.int('DATABASE_CONN_MAX_AGE', default=60)
+
+# Perfil SQLite para produção em um só servidor: WAL (leitores não bloqueiam o
+# escritor), synchronous=NORMAL (seguro com WAL), mmap e cache maiores e espera
+# pelo lock em vez de "database is locked". BEGIN IMMEDIATE pega o lock de
+# escrita no início da transação, sem o upgrade que falha na hora; vale para
+# todo atomic(), inclusive os só de leitura, que então esperam os escritores
+# (não use atomic() para leituras neste perfil)
+SQLITE_TUNING = env.bool('DATABASE_SQLITE_TUNING', default=True)
+if env('DATABASE_ENGINE') == 'sqlite3' and SQLITE_TUNING:
+    DATABASES['default']['OPTIONS'] = {
+        'timeout': env.int('DATABASE_SQLITE_BUSY_TIMEOUT', default=20),  # segundos
+        'transaction_mode': 'IMMEDIATE',
+        'init_command': (
+            'PRAGMA journal_mode=WAL;'
+            'PRAGMA synchronous=NORMAL;'
+            f"PRAGMA mmap_size={env.int('DATABASE_SQLITE_MMAP_SIZE', default=256 * 1024 * 1024)};"
+            f"PRAGMA cache_size=-{env.int('DATABASE_SQLITE_CACHE_KB', default=64 * 1024)};"
+            'PRAGMA temp_store=MEMORY;'
+        ),
+    }
+
+# Fila de escrita única (CodeLabTest.sqlite_writer) para escritas autônomas
+# (processamento de imagens, limpeza de mídia) no perfil SQLite: uma thread
+# por processo (N workers = N escritores disputando o lock; ver README)
+# grava até BATCH_SIZE operações por commit (o que chegou
+# enquanto o lote anterior era gravado), esperando até MAX_WAIT segundos
+# por mais operações (0: não espera)
+SQLITE_WRITER = {
+    'ENABLED': env('DATABASE_ENGINE') == 'sqlite3' and SQLITE_TUNING,
+    'BATCH_SIZE': env.int('DATABASE_SQLITE_WRITER_BATCH_SIZE', default=64),
+    'MAX_WAIT': env.float('DATABASE_SQLITE_WRITER_MAX_WAIT', default=0.0),
+}
+
+# Réplicas de leitura (CodeLabTest.routers): lista de host[:porta] no PostgreSQL
+# ou de arquivos no SQLite, com o mesmo usuário/senha/banco do primário
+for index, replica in enumerate(env.list('DATABASE_REPLICAS', default=[]), start=1):
+    config = {**copy.deepcopy(DATABASES['default']), 'TEST': {'MIRROR': 'default'}}
+    if env('DATABASE_ENGINE') == 'sqlite3':
+        config['NAME'] = replica
+    else:
+        host, _, port = replica.partition(':')
+        config.update(HOST=host, PORT=port or config['PORT'])
+    DATABASES[f'replica_{index}'] = config
+
+DATABASE_ROUTERS = ['CodeLabTest.routers.ReplicaRouter']
+
+# Leituras em réplicas: após uma escrita, o usuário lê do primário por
+# STICKY_SECONDS (cookie assinado devolvido pelo cliente, válido em qualquer
+# worker). Réplicas com atraso acima de MAX_LAG_SECONDS ou sem
+# resposta saem da rotação até a próxima verificação
+DATABASE_ROUTING = {
+    'REPLICAS': [alias for alias in DATABASES if alias != 'default'],
+    'STICKY_SECONDS': env.int('DATABASE_STICKY_SECONDS', default=5),
+    'HEALTH_CHECK_INTERVAL': env.int('DATABASE_HEALTH_CHECK_INTERVAL', default=10),  # segundos
+    'MAX_LAG_SECONDS': env.float('DATABASE_MAX_LAG_SECONDS', default=5.0),
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -115,7 +191,7 @@ AUTH_USER_MODEL = 'CodeLabTest.User'
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'CodeLabTest.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
@@ -126,18 +202,134 @@ REST_FRAMEWORK = {
         'DEFAULT_THROTTLE_CLASSES': [
         'CodeLabTest.throttling.BurstRateThrottle',
         'CodeLabTest.throttling.SustainedRateThrottle',
+        'CodeLabTest.throttling.CostRateThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'burst': '5/min',
         'sustained': '100/hour',
         'daily': '1000/day',
+        'cost': '1000/hour',
         'post_create': '10/hour',
         'comment_create': '30/hour',
+        'upload_chunk': '300/hour',
         'login': '5/hour',
         'registration': '3/hour',
     },
 }
 
+# Cache de resultados de busca (por processo): ids e contagens por consulta normalizada
+SEARCH_CACHE = {
+    'MAX_ENTRIES': env.int('SEARCH_CACHE_MAX_ENTRIES', default=2048),
+    'TTL': env.int('SEARCH_CACHE_TTL', default=60),  # segundos
+}
+
+# Busca global: sub-buscas em paralelo, cada uma com uma conexão própria.
+# O total de threads (por processo, somando todas as buscas) fica em um
+# quarto do pool para não esgotar as conexões das demais requisições.
+# QUEUE_TIMEOUT: espera máxima de uma sub-busca na fila do pool (o orçamento
+# de tempo dela só começa quando ela começa a rodar)
+_pool = DATABASES['default'].get('OPTIONS', {}).get('pool')
+GLOBAL_SEARCH = {
+    'MAX_WORKERS': env.int(
+        'GLOBAL_SEARCH_MAX_WORKERS',
+        default=max(1, min(3, _pool['max_size'] // 4)) if _pool else 3
+    ),
+    'QUEUE_TIMEOUT': env.float('GLOBAL_SEARCH_QUEUE_TIMEOUT', default=2.0),  # segundos
+}
+
+# Busca aproximada: top-k por consulta, similaridade mínima (word_similarity
+# do pg_trgm no PostgreSQL; nota do índice em memória nos demais bancos)
+FUZZY_SEARCH = {
+    'TOP_K': env.int('FUZZY_SEARCH_TOP_K', default=200),
+    'PG_THRESHOLD': env.float('FUZZY_SEARCH_PG_THRESHOLD', default=0.3),
+    'INDEX_THRESHOLD': env.float('FUZZY_SEARCH_INDEX_THRESHOLD', default=0.6),
+    'INDEX_TTL': env.int('FUZZY_SEARCH_INDEX_TTL', default=300),  # segundos
+}
+
+# Cache da autenticação JWT: tokens verificados (TTL nunca passa do exp)
+# e usuários por user_id (TTL curto; invalidado ao salvar o usuário)
+JWT_AUTH_CACHE = {
+    'TOKEN_MAX_ENTRIES': env.int('JWT_AUTH_CACHE_TOKEN_MAX_ENTRIES', default=10000),
+    'TOKEN_TTL': env.int('JWT_AUTH_CACHE_TOKEN_TTL', default=300),  # segundos
+    'USER_MAX_ENTRIES': env.int('JWT_AUTH_CACHE_USER_MAX_ENTRIES', default=10000),
+    'USER_TTL': env.int('JWT_AUTH_CACHE_USER_TTL', default=30),  # segundos
+}
+
+# Cache padrão: Redis/Memcached via CACHE_URL (ex.: "rediscache://127.0.0.1:6379/1");
+# sem ele é o LocMemCache, local a cada processo
+CACHES = {'default': env.cache_url_config(env.str('CACHE_URL', default='') or 'locmemcache://')}
+LOCAL_CACHE_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+# Armazenamento dos contadores de rate limiting (janela deslizante, O(1) por chave).
+# CacheThrottleStore usa o cache padrão (compartilhado com Redis/Memcached);
+# SQLiteThrottleStore compartilha entre workers da mesma máquina via arquivo.
+# Sem cache compartilhado o padrão fora do DEBUG é o SQLite: com LocMemCache
+# cada worker teria os próprios contadores (limite efetivo N vezes maior)
+THROTTLE_STORE = {
+    'BACKEND': env.str('THROTTLE_STORE_BACKEND', default=(
+        'CodeLabTest.throttling.CacheThrottleStore'
+        if env.bool('DJANGO_DEBUG', default=False) or CACHES['default']['BACKEND'] not in LOCAL_CACHE_BACKENDS
+        else 'CodeLabTest.throttling.SQLiteThrottleStore'
+    )),
+    'OPTIONS': {
+        'PATH': env.str('THROTTLE_STORE_PATH', default=str(BASE_DIR / 'throttle.sqlite3')),
+    },
+}
+
+# Testes sempre com CacheThrottleStore (ver CodeLabTest.test_runner)
+TEST_RUNNER = 'CodeLabTest.test_runner.TestRunner'
+
+# Custo de views com throttle_cost = 'measured': 1 unidade a cada UNIT_MS
+# de tempo médio de banco, limitado a MAX_COST
+THROTTLE_COST = {
+    'UNIT_MS': env.int('THROTTLE_COST_UNIT_MS', default=20),
+    'MAX_COST': env.int('THROTTLE_COST_MAX', default=20),
+}
+
+# Processamento de imagens (versões WebP/JPEG, placeholder; o EXIF sai já no upload)
+# num pool de processos; SYNC roda no próprio processo (testes/desenvolvimento)
+IMAGE_PROCESSING = {
+    'WORKERS': env.int('IMAGE_PROCESSING_WORKERS', default=2),
+    'SYNC': env.bool('IMAGE_PROCESSING_SYNC', default=False),
+}
+
+# Entrega de mídia (CodeLabTest.media.serve_media). SENDFILE delega a transferência
+# ao proxy: 'x-accel-redirect' (nginx, location internal em ACCEL_PREFIX apontando
+# para o MEDIA_ROOT) ou 'x-sendfile' (Apache/lighttpd); vazio usa FileResponse.
+# MAX_AGE vale para arquivos fora de blobs/ (os blobs são imutáveis)
+MEDIA_SERVING = {
+    'SENDFILE': env.str('MEDIA_SERVING_SENDFILE', default=''),
+    'ACCEL_PREFIX': env.str('MEDIA_SERVING_ACCEL_PREFIX', default='/protected-media/'),
+    'MAX_AGE': env.int('MEDIA_SERVING_MAX_AGE', default=3600),  # segundos
+}
+
+# Uploads em partes (CodeLabTest.uploads): tamanho máximo de cada PATCH e
+# tempo sem atividade até a sessão expirar (o arquivo temporário vai junto)
+CHUNKED_UPLOADS = {
+    'CHUNK_MAX_SIZE': env.int('CHUNKED_UPLOADS_CHUNK_MAX_SIZE', default=2 * 1024 * 1024),
+    'TTL': env.int('CHUNKED_UPLOADS_TTL', default=24 * 3600),  # segundos
+}
+
+# Executor dedicado para hashing de senhas (login, cadastro, troca de senha).
+# Acima de MAX_PENDING em voo somando os workers (contados no cache padrão;
+# com LocMemCache, por processo), ou após TIMEOUT, responde 503 com Retry-After
+PASSWORD_HASHING = {
+    'WORKERS': env.int('PASSWORD_HASHING_WORKERS', default=max(1, (os.cpu_count() or 2) // 2)),
+    'MAX_PENDING': env.int('PASSWORD_HASHING_MAX_PENDING', default=32),
+    'TIMEOUT': env.float('PASSWORD_HASHING_TIMEOUT', default=5.0),  # segundos
+    'RETRY_AFTER': env.int('PASSWORD_HASHING_RETRY_AFTER', default=1),  # segundos
+}
+
+# Filtro de Bloom na frente da blacklist de refresh tokens
+TOKEN_BLACKLIST_FILTER = {
+    'ERROR_RATE': env.float('TOKEN_BLACKLIST_FILTER_ERROR_RATE', default=0.01),
+    'SYNC_INTERVAL': env.int('TOKEN_BLACKLIST_FILTER_SYNC_INTERVAL', default=2),  # segundos
+    'REBUILD_INTERVAL': env.int('TOKEN_BLACKLIST_FILTER_REBUILD_INTERVAL', default=600),  # segundos
+}
+
 # JWT Configuration
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),
@@ -161,6 +353,8 @@ SIMPLE_JWT = {
     'TOKEN_TYPE_CLAIM': 'token_type',
     
     'JTI_CLAIM': 'jti',
+
+    'TOKEN_REFRESH_SERIALIZER': 'CodeLabTest.tokens.TokenRefreshSerializer',
 }
 
 SPECTACULAR_SETTINGS = {
@@ -203,6 +397,7 @@ SPECTACULAR_SETTINGS = {
         {'name': 'Comments', 'description': 'Sistema de comentários'},
         {'name': 'Likes', 'description': 'Sistema de likes'},
         {'name': 'Notifications', 'description': 'Notificações'},
+        {'name': 'Uploads', 'description': 'Upload retomável em partes'},
         {'name': 'Search', 'description': 'Busca e filtros'},
     ],
     
@@ -8,12 +8,16 @@ from CodeLabTest.views import (
     UserViewSet, PostViewSet, LikeViewSet, CommentViewSet,
     RegisterView, LoginView, LogoutView, ProfileView,
     UpdateProfileView, ChangePasswordView, UploadAvatarView,
-    NotificationViewSet
+    NotificationViewSet, UploadSessionViewSet
 )
 
+from CodeLabTest.media import serve_media
+from CodeLabTest.dbpool import DatabasePoolStatsView
+
 from CodeLabTest.search import (
     GlobalSearchView, AdvancedPostSearchView,
-    HashtagSearchView, SuggestionsView
+    HashtagSearchView, TrendingHashtagsView, SuggestionsView,
+    SearchCacheStatsView
 )
 
 from drf_spectacular.views import (
@@ -28,6 +32,7 @@ router.register(r'posts', PostViewSet, basename='post')
 router.register(r'likes', LikeViewSet, basename='like')
 router.register(r'comments', CommentViewSet, basename='comment')
 router.register(r'notifications', NotificationViewSet, basename='notification')
+router.register(r'uploads', UploadSessionViewSet, basename='upload')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -51,15 +56,22 @@ urlpatterns = [
     path('api/search/', GlobalSearchView.as_view(), name='global_search'),
     path('api/search/posts/', AdvancedPostSearchView.as_view(), name='search_posts'),
     path('api/search/hashtags/', HashtagSearchView.as_view(), name='search_hashtags'),
+    path('api/search/hashtags/trending/', TrendingHashtagsView.as_view(), name='trending_hashtags'),
     path('api/search/suggestions/', SuggestionsView.as_view(), name='search_suggestions'),  
+    path('api/search/cache-stats/', SearchCacheStatsView.as_view(), name='search_cache_stats'),
+
+    # Métricas internas
+    path('api/internal/db-pool/', DatabasePoolStatsView.as_view(), name='db_pool_stats'),
 
     #Documentação
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
     path('api/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
+
+    # Mídia (também em produção; com proxy configurado, via X-Accel-Redirect/X-Sendfile)
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:path>", serve_media, name='media'),
 ]
 
-# Servir arquivos de mídia em desenvolvimento
+# Servir arquivos estáticos em desenvolvimento
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
\ No newline at end of file